@@ -0,0 +1,291 @@
+# analysis_operations.py
+#
+# Reads and retention for analysis_logs, one row per resume x job analysis.
+# Rows are appended with insertion.insert_analysis_logs_bulk().
+#
+# analysis_results is JSON; its "score" and "missing_skills" fields are
+# exposed as indexed generated columns plus the analysis_log_missing_skills
+# side table (migration 7 in create_tables.py), so the filters below never
+# parse JSON row by row.
+#
+# Retention has two stages:
+#   * compress_old_payloads() moves the full JSON of old rows, zlib-compressed,
+#     into payload_z and keeps only the indexed fields in analysis_results.
+#     get_analysis_logs() decompresses transparently.
+#   * rollup_old_logs() folds very old rows into per-job, per-day summary rows
+#     in analysis_log_rollups, deletes them, and returns the freed pages to
+#     the filesystem a step at a time with PRAGMA incremental_vacuum.
+
+import json
+import sqlite3
+import zlib
+
+from db_connection import get_db_connection
+from instrumentation import instrument_module
+from sharding import shard_module
+
+DEFAULT_LIMIT = 100
+DEFAULT_BATCH_SIZE = 1000
+COMPRESSION_LEVEL = 6
+VACUUM_STEP_PAGES = 500
+
+
+def _decode(row):
+    """Turn a row into a dict with analysis_results parsed (and decompressed)."""
+    log = dict(row)
+    payload_z = log.pop("payload_z", None)
+    text = zlib.decompress(payload_z).decode() if payload_z is not None else log["analysis_results"]
+    try:
+        log["analysis_results"] = json.loads(text) if text is not None else None
+    except ValueError:
+        log["analysis_results"] = text  # free-form rows written before migration 7
+    return log
+
+
+# ==================== QUERIES ====================
+
+def get_analysis_logs(resume_id=None, job_id=None, min_score=None, max_score=None,
+                      missing_skill=None, order_by="recent", limit=DEFAULT_LIMIT):
+    """
+    Find analysis logs by resume, job, score range and/or a missing skill.
+
+    Args:
+        order_by (str): "recent" (newest first) or "score" (best first).
+        missing_skill (str): Only logs whose missing_skills contain it (case-insensitive).
+
+    Returns:
+        list: dicts with id, resume_id, job_id, score, missing_skill_count,
+        analyzed_at and the parsed analysis_results.
+    """
+    where, params = [], []
+    if resume_id is not None:
+        where.append("resume_id = ?")
+        params.append(resume_id)
+    if job_id is not None:
+        where.append("job_id = ?")
+        params.append(job_id)
+    if min_score is not None:
+        where.append("score >= ?")
+        params.append(min_score)
+    if max_score is not None:
+        where.append("score <= ?")
+        params.append(max_score)
+    if missing_skill is not None:
+        where.append("id IN (SELECT log_id FROM analysis_log_missing_skills WHERE skill = ?)")
+        params.append(missing_skill.strip().lower())
+    order = "score DESC, id DESC" if order_by == "score" else "id DESC"
+    sql = f'''
+    SELECT id, resume_id, job_id, score, missing_skill_count, analyzed_at, analysis_results, payload_z
+    FROM analysis_logs
+    {"WHERE " + " AND ".join(where) if where else ""}
+    ORDER BY {order}
+    LIMIT ?
+    '''
+    conn = get_db_connection()
+    try:
+        return [_decode(row) for row in conn.execute(sql, params + [limit])]
+    finally:
+        conn.close()
+
+
+def top_missing_skills(job_id=None, limit=20):
+    """Most frequently missing skills, overall or for one job: [(skill, count), ...]."""
+    conn = get_db_connection(row_factory=None)
+    try:
+        if job_id is None:
+            rows = conn.execute('''
+            SELECT skill, count(*) AS n FROM analysis_log_missing_skills
+            GROUP BY skill ORDER BY n DESC, skill LIMIT ?
+            ''', (limit,))
+        else:
+            rows = conn.execute('''
+            SELECT s.skill, count(*) AS n
+            FROM analysis_logs l JOIN analysis_log_missing_skills s ON s.log_id = l.id
+            WHERE l.job_id = ?
+            GROUP BY s.skill ORDER BY n DESC, s.skill LIMIT ?
+            ''', (job_id, limit))
+        return rows.fetchall()
+    finally:
+        conn.close()
+
+
+def get_analysis_rollups(job_id=None):
+    """Per-day summaries of rolled-up logs, with avg_score computed."""
+    conn = get_db_connection()
+    try:
+        sql = 'SELECT * FROM analysis_log_rollups'
+        params = ()
+        if job_id is not None:
+            sql += ' WHERE job_id = ?'
+            params = (job_id,)
+        rollups = []
+        for row in conn.execute(sql + ' ORDER BY job_id, day', params):
+            rollup = dict(row)
+            rollup["avg_score"] = rollup["score_sum"] / rollup["scored"] if rollup["scored"] else None
+            rollups.append(rollup)
+        return rollups
+    finally:
+        conn.close()
+
+
+# ==================== RETENTION ====================
+
+def _slim(text):
+    """The indexed fields of an analysis, kept uncompressed for the generated columns."""
+    try:
+        results = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(results, dict):
+        return None
+    slim = {key: results[key] for key in ("score", "missing_skills") if key in results}
+    return json.dumps(slim, separators=(',', ':'))
+
+
+def compress_old_payloads(older_than_days=30, batch_size=DEFAULT_BATCH_SIZE, level=COMPRESSION_LEVEL):
+    """
+    zlib-compress the payloads of logs older than `older_than_days`.
+
+    Runs one short transaction per batch. Rows whose payload would not get
+    smaller are left as they are.
+
+    Returns:
+        dict: {"success", "compressed", "bytes_before", "bytes_after"}.
+    """
+    conn = get_db_connection(row_factory=None)
+    compressed = bytes_before = bytes_after = 0
+    last_id = 0
+    try:
+        while True:
+            rows = conn.execute('''
+            SELECT id, analysis_results FROM analysis_logs
+            WHERE id > ? AND analyzed_at < datetime('now', ?) AND payload_z IS NULL
+              AND analysis_results IS NOT NULL
+            ORDER BY id LIMIT ?
+            ''', (last_id, f'-{int(older_than_days)} days', batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = []
+            for log_id, text in rows:
+                raw = text.encode()
+                payload_z = zlib.compress(raw, level)
+                slim = _slim(text)
+                after = len(payload_z) + len(slim or '')
+                if after < len(raw):
+                    updates.append((payload_z, slim, log_id))
+                    bytes_before += len(raw)
+                    bytes_after += after
+            if updates:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    'UPDATE analysis_logs SET payload_z = ?, analysis_results = ? WHERE id = ?', updates)
+                conn.commit()
+                compressed += len(updates)
+        return {"success": True, "compressed": compressed,
+                "bytes_before": bytes_before, "bytes_after": bytes_after}
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {"success": False, "message": f"Database error compressing analysis logs: {e}"}
+    finally:
+        conn.close()
+
+
+def rollup_old_logs(older_than_days=365, batch_size=DEFAULT_BATCH_SIZE * 10, reclaim=True):
+    """
+    Fold logs older than `older_than_days` into analysis_log_rollups and delete them.
+
+    Each batch is aggregated and deleted in one transaction, so a crash never
+    counts a log twice or loses it. Rollup rows are additive: re-running
+    merges into the existing (job_id, day) summaries.
+
+    Returns:
+        dict: {"success", "rolled_up": logs deleted, "pages_reclaimed"}.
+    """
+    conn = get_db_connection(row_factory=None)
+    rolled_up = 0
+    try:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_ids (id INTEGER PRIMARY KEY)")
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM rollup_ids")
+            batch = conn.execute('''
+            INSERT INTO rollup_ids (id)
+            SELECT id FROM analysis_logs WHERE analyzed_at < datetime('now', ?) LIMIT ?
+            ''', (f'-{int(older_than_days)} days', batch_size)).rowcount
+            if batch == 0:
+                conn.rollback()
+                break
+            conn.execute('''
+            INSERT INTO analysis_log_rollups (job_id, day, n, scored, score_sum, score_min, score_max)
+            SELECT ifnull(job_id, 0), date(analyzed_at), count(*), count(s), total(s), min(s), max(s)
+            FROM (SELECT job_id, analyzed_at,
+                         CASE WHEN typeof(score) IN ('integer', 'real') THEN score END AS s
+                  FROM analysis_logs WHERE id IN (SELECT id FROM rollup_ids))
+            WHERE true
+            GROUP BY 1, 2
+            ON CONFLICT (job_id, day) DO UPDATE SET
+                n = n + excluded.n,
+                scored = scored + excluded.scored,
+                score_sum = score_sum + excluded.score_sum,
+                score_min = min(ifnull(score_min, excluded.score_min), ifnull(excluded.score_min, score_min)),
+                score_max = max(ifnull(score_max, excluded.score_max), ifnull(excluded.score_max, score_max))
+            ''')
+            conn.execute('DELETE FROM analysis_logs WHERE id IN (SELECT id FROM rollup_ids)')
+            conn.execute("DELETE FROM rollup_ids")
+            conn.commit()
+            rolled_up += batch
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {"success": False, "message": f"Database error rolling up analysis logs: {e}"}
+    finally:
+        conn.close()
+    pages = reclaim_space() if reclaim and rolled_up else 0
+    return {"success": True, "rolled_up": rolled_up, "pages_reclaimed": pages}
+
+
+def reclaim_space(max_pages=None, step=VACUUM_STEP_PAGES) -> int:
+    """
+    Return free pages to the filesystem with PRAGMA incremental_vacuum.
+
+    Works `step` pages at a time, each step its own short write, so other
+    writers are never blocked for long. Needs auto_vacuum = INCREMENTAL
+    (set by migration 7).
+
+    Returns:
+        int: pages reclaimed.
+    """
+    conn = get_db_connection(row_factory=None)
+    reclaimed = 0
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("❌ auto_vacuum is not INCREMENTAL; run migrate_database() first.")
+            return 0
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free and (max_pages is None or reclaimed < max_pages):
+            n = step if max_pages is None else min(step, max_pages - reclaimed)
+            # The pragma frees one page per step of the statement; executescript
+            # runs it to completion (execute() would stop after the first page).
+            conn.executescript(f"PRAGMA incremental_vacuum({int(n)})")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free:
+                break
+            reclaimed += free - remaining
+            free = remaining
+        return reclaimed
+    finally:
+        conn.close()
+
+
+__all__ = [
+    'get_analysis_logs',
+    'top_missing_skills',
+    'get_analysis_rollups',
+    'compress_old_payloads',
+    'rollup_old_logs',
+    'reclaim_space'
+]
+
+
+shard_module(globals())
+instrument_module(globals())
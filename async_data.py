@@ -0,0 +1,414 @@
+# async_operations.py
+#
+# asyncio facade over insertion.py, select_data.py, update_data.py,
+# delete_data.py and search_data.py.
+#
+#     from async_data import login_user, insert_resume
+#     result = await login_user("kavya@example.com", "secure_pass")
+#
+# Every coroutine calls the synchronous function of the same name, so its
+# result is exactly what the blocking API returns. Nothing runs on the
+# event loop thread:
+#   * Reads go to a thread pool and use their own pooled WAL connections,
+#     so they run in parallel with each other and with the writer.
+#   * Writes go to ONE writer thread. Single-row writes that are waiting at
+#     the same time are coalesced into one transaction: each call runs
+#     inside its own SAVEPOINT on the writer's connection, so a failing call
+#     only undoes its own changes, and the batch pays for a single commit.
+#     Callers are resumed only after that commit succeeds.
+#   * insert_user hashes the password on the reader pool before queueing the
+#     insert, so no KDF runs while a batch holds the write lock.
+#   * Writes that manage their own transactions (bulk inserts, purges) run
+#     alone on the writer thread, still serialized with the other writes.
+#   * With sharding on (sharding.py) every write runs alone, so it reaches
+#     the shard its route picks instead of the writer's catalog connection.
+
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import queue
+import sqlite3
+import threading
+
+import analysis_data
+import db_connection
+import query_cache
+import delete_data
+import insertion
+import passwords
+import search_data
+import select_data
+import sharding
+import update_data
+
+DEFAULT_READ_WORKERS = 4
+MAX_WRITE_BATCH = 256
+
+
+class _BatchConnection(sqlite3.Connection):
+    """Writer connection: the wrapped functions' commit()/close() are deferred to the batch."""
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        # Undo only the current call's work, not the whole batch.
+        if self.in_transaction:
+            self.execute("ROLLBACK TO async_op")
+
+    def _finish(self, commit=True):
+        if commit:
+            sqlite3.Connection.commit(self)
+        else:
+            sqlite3.Connection.rollback(self)
+
+    def _close_for_real(self):
+        sqlite3.Connection.close(self)
+
+
+class _WriteRequest:
+    __slots__ = ("func", "args", "kwargs", "future", "coalesce")
+
+    def __init__(self, func, args, kwargs, future, coalesce):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.coalesce = coalesce
+
+
+class AsyncDatabase:
+    """Reader thread pool plus a single group-committing writer thread."""
+
+    def __init__(self, read_workers=DEFAULT_READ_WORKERS, max_batch=MAX_WRITE_BATCH):
+        self.max_batch = max_batch
+        self._readers = concurrent.futures.ThreadPoolExecutor(
+            max_workers=read_workers, thread_name_prefix="db-reader")
+        self._queue = queue.Queue()
+        self._closed = False
+        self._closed_reason = "The async database is closed"
+        self._lock = threading.Lock()  # orders write() against close()
+        self._stats = {"write_batches": 0, "coalesced_writes": 0, "exclusive_writes": 0}
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
+
+    # -------------------- public API --------------------
+
+    async def read(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(func, *args, **kwargs))
+
+    async def write(self, func, *args, coalesce=True, **kwargs):
+        if coalesce and sharding.get_shards() is not None:
+            # A batch shares one bound connection to the catalog, which would
+            # bypass shard routing; run each write alone through its route.
+            coalesce = False
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(self._closed_reason)
+            self._queue.put(_WriteRequest(func, args, kwargs, future, coalesce))
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def close(self):
+        """Finish queued writes, then stop the writer and reader threads."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
+
+    # -------------------- writer thread --------------------
+
+    def _connect(self):
+        pool = db_connection.get_pool()
+        conn = sqlite3.connect(pool.db_path, factory=_BatchConnection, check_same_thread=False,
+                               timeout=pool.pragmas.get("busy_timeout", 5000) / 1000.0)
+        db_connection.apply_pragmas(conn, pool.pragmas)
+        return conn
+
+    def _writer_loop(self):
+        conn, backlog, batch = None, collections.deque(), []
+        error = RuntimeError("The async database is closed")
+        try:
+            conn = self._connect()
+            while True:
+                request = backlog.popleft() if backlog else self._queue.get()
+                if request is None:
+                    break
+                if not request.coalesce:
+                    self._stats["exclusive_writes"] += 1
+                    self._run_alone(request)
+                    continue
+                batch = [request]
+                while len(batch) < self.max_batch:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None or not nxt.coalesce:
+                        backlog.append(nxt)  # keep ordering: run after this batch
+                        break
+                    batch.append(nxt)
+                self._run_batch(conn, batch)
+        except BaseException as e:
+            error = RuntimeError(f"The async database writer stopped: {type(e).__name__}: {e}")
+            error.__cause__ = e
+        finally:
+            # Refuse new writes, then fail whatever is still waiting so no
+            # caller awaits a future that will never resolve.
+            with self._lock:
+                self._closed = True
+                self._closed_reason = str(error)
+            pending = list(batch) + list(backlog)
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for request in pending:
+                if request is not None:
+                    self._fail(request, error)
+            if conn is not None:
+                conn._close_for_real()
+
+    @staticmethod
+    def _fail(request, error):
+        future = request.future
+        if future.done():
+            return
+        if future.running() or future.set_running_or_notify_cancel():
+            future.set_exception(error)
+
+    @staticmethod
+    def _run_alone(request):
+        if not request.future.set_running_or_notify_cancel():
+            return
+        try:
+            request.future.set_result(request.func(*request.args, **request.kwargs))
+        except BaseException as e:
+            request.future.set_exception(e)
+
+    def _run_batch(self, conn, batch):
+        outcomes = []
+        try:
+            # Cache invalidations by the batched calls fire after the commit.
+            with query_cache.deferred_invalidation():
+                conn.execute("BEGIN IMMEDIATE")
+                with db_connection.bind_connection(conn):
+                    for request in batch:
+                        conn.execute("SAVEPOINT async_op")
+                        try:
+                            outcomes.append((True, request.func(*request.args, **request.kwargs)))
+                        except Exception as e:
+                            conn.execute("ROLLBACK TO async_op")
+                            outcomes.append((False, e))
+                        conn.execute("RELEASE async_op")
+                conn._finish(commit=True)
+        except sqlite3.Error:
+            # The batch could not commit, so none of it was persisted; replay
+            # each call on its own through the pool so each gets the exact
+            # result (or error) it would have had synchronously.
+            if conn.in_transaction:
+                conn._finish(commit=False)
+            for request in batch:
+                self._run_alone(request)
+            return
+        self._stats["write_batches"] += 1
+        self._stats["coalesced_writes"] += len(batch)
+        for request, (ok, value) in zip(batch, outcomes):
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            if ok:
+                request.future.set_result(value)
+            else:
+                request.future.set_exception(value)
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_async_database() -> AsyncDatabase:
+    """Return the shared AsyncDatabase, starting its threads on first use."""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = AsyncDatabase()
+    return _database
+
+
+def close_async_database():
+    """Flush pending writes and stop the shared AsyncDatabase threads."""
+    global _database
+    with _database_lock:
+        if _database is not None:
+            _database.close()
+            _database = None
+
+
+def _reader(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await get_async_database().read(func, *args, **kwargs)
+    return wrapper
+
+
+def _writer(func, coalesce=True):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await get_async_database().write(func, *args, coalesce=coalesce, **kwargs)
+    return wrapper
+
+
+# ==================== READS ====================
+
+login_user = _reader(select_data.login_user)
+get_user_resumes = _reader(select_data.get_user_resumes)
+get_all_jobs = _reader(select_data.get_all_jobs)
+get_user_by_email = _reader(select_data.get_user_by_email)
+list_user_resumes = _reader(select_data.list_user_resumes)
+list_open_jobs = _reader(select_data.list_open_jobs)
+get_user_summary_by_email = _reader(select_data.get_user_summary_by_email)
+get_jobs_page = _reader(select_data.get_jobs_page)
+get_user_resumes_page = _reader(select_data.get_user_resumes_page)
+open_resume_file = _reader(select_data.open_resume_file)
+get_resume_file_view = _reader(select_data.get_resume_file_view)
+search_resumes = _reader(search_data.search_resumes)
+search_jobs = _reader(search_data.search_jobs)
+user_exists = _reader(delete_data.user_exists)
+get_top_applicants = _reader(select_data.get_top_applicants)
+get_application_counts = _reader(select_data.get_application_counts)
+get_analysis_logs = _reader(analysis_data.get_analysis_logs)
+top_missing_skills = _reader(analysis_data.top_missing_skills)
+get_analysis_rollups = _reader(analysis_data.get_analysis_rollups)
+
+# ==================== SINGLE-ROW WRITES (coalesced) ====================
+
+async def insert_user(username, email, password, role, full_name):
+    """insertion.insert_user, with the KDF run before the coalesced insert is queued."""
+    database = get_async_database()
+    try:
+        password_hash = await database.read(passwords.hash_password, password)
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}"}
+    return await database.write(insertion.insert_user_hashed, username, email, password_hash, role, full_name)
+
+
+insert_resume = _writer(insertion.insert_resume)
+insert_resume_inline = _writer(insertion.insert_resume_inline)
+insert_job = _writer(insertion.insert_job)
+insert_application = _writer(insertion.insert_application)
+insert_template = _writer(insertion.insert_template)
+insert_new_reference = _writer(insertion.insert_new_reference)
+update_user_role = _writer(update_data.update_user_role)
+update_resume_score = _writer(update_data.update_resume_score)
+update_job_status = _writer(update_data.update_job_status)
+update_application_status = _writer(update_data.update_application_status)
+update_template_score = _writer(update_data.update_template_score)
+update_reference_score = _writer(update_data.update_reference_score)
+delete_resumes_by_user_id = _writer(delete_data.delete_resumes_by_user_id)
+delete_jobs_by_user_id = _writer(delete_data.delete_jobs_by_user_id)
+delete_applications_by_user_id = _writer(delete_data.delete_applications_by_user_id)
+delete_analysis_logs_by_user_id = _writer(delete_data.delete_analysis_logs_by_user_id)
+delete_templates_by_user_id = _writer(delete_data.delete_templates_by_user_id)
+delete_reference_by_user_id = _writer(delete_data.delete_reference_by_user_id)
+delete_user_by_id = _writer(delete_data.delete_user_by_id)
+
+# ==================== SELF-TRANSACTED WRITES (run alone) ====================
+
+insert_users_bulk = _writer(insertion.insert_users_bulk, coalesce=False)
+insert_resumes_bulk = _writer(insertion.insert_resumes_bulk, coalesce=False)
+insert_jobs_bulk = _writer(insertion.insert_jobs_bulk, coalesce=False)
+insert_applications_bulk = _writer(insertion.insert_applications_bulk, coalesce=False)
+insert_templates_bulk = _writer(insertion.insert_templates_bulk, coalesce=False)
+insert_references_bulk = _writer(insertion.insert_references_bulk, coalesce=False)
+insert_analysis_logs_bulk = _writer(insertion.insert_analysis_logs_bulk, coalesce=False)
+compress_old_payloads = _writer(analysis_data.compress_old_payloads, coalesce=False)
+rollup_old_logs = _writer(analysis_data.rollup_old_logs, coalesce=False)
+purge_users = _writer(delete_data.purge_users, coalesce=False)
+delete_everything_by_user_id = _writer(delete_data.delete_everything_by_user_id, coalesce=False)
+rebuild_search_index = _writer(search_data.rebuild_search_index, coalesce=False)
+update_resume_scores_bulk = _writer(update_data.update_resume_scores_bulk, coalesce=False)
+update_application_statuses_bulk = _writer(update_data.update_application_statuses_bulk, coalesce=False)
+update_application_scores_bulk = _writer(update_data.update_application_scores_bulk, coalesce=False)
+update_template_scores_bulk = _writer(update_data.update_template_scores_bulk, coalesce=False)
+update_reference_scores_bulk = _writer(update_data.update_reference_scores_bulk, coalesce=False)
+update_job_statuses_bulk = _writer(update_data.update_job_statuses_bulk, coalesce=False)
+close_jobs_by_recruiter = _writer(update_data.close_jobs_by_recruiter, coalesce=False)
+close_jobs_posted_before = _writer(update_data.close_jobs_posted_before, coalesce=False)
+
+
+__all__ = [
+    'AsyncDatabase',
+    'get_async_database',
+    'close_async_database',
+    'login_user',
+    'get_user_resumes',
+    'get_all_jobs',
+    'get_user_by_email',
+    'list_user_resumes',
+    'list_open_jobs',
+    'get_user_summary_by_email',
+    'get_jobs_page',
+    'get_user_resumes_page',
+    'open_resume_file',
+    'get_resume_file_view',
+    'search_resumes',
+    'search_jobs',
+    'user_exists',
+    'get_top_applicants',
+    'get_application_counts',
+    'get_analysis_logs',
+    'top_missing_skills',
+    'get_analysis_rollups',
+    'insert_user',
+    'insert_resume',
+    'insert_resume_inline',
+    'insert_job',
+    'insert_application',
+    'insert_template',
+    'insert_new_reference',
+    'update_user_role',
+    'update_resume_score',
+    'update_job_status',
+    'update_application_status',
+    'update_template_score',
+    'update_reference_score',
+    'delete_resumes_by_user_id',
+    'delete_jobs_by_user_id',
+    'delete_applications_by_user_id',
+    'delete_analysis_logs_by_user_id',
+    'delete_templates_by_user_id',
+    'delete_reference_by_user_id',
+    'delete_user_by_id',
+    'insert_users_bulk',
+    'insert_resumes_bulk',
+    'insert_jobs_bulk',
+    'insert_applications_bulk',
+    'insert_templates_bulk',
+    'insert_references_bulk',
+    'insert_analysis_logs_bulk',
+    'compress_old_payloads',
+    'rollup_old_logs',
+    'purge_users',
+    'delete_everything_by_user_id',
+    'rebuild_search_index',
+    'update_resume_scores_bulk',
+    'update_application_statuses_bulk',
+    'update_application_scores_bulk',
+    'update_template_scores_bulk',
+    'update_reference_scores_bulk',
+    'update_job_statuses_bulk',
+    'close_jobs_by_recruiter',
+    'close_jobs_posted_before'
+]
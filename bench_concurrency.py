@@ -0,0 +1,108 @@
+# bench_concurrency.py
+#
+# Read/write concurrency before and after the WAL connection profiles.
+#
+#     python bench_concurrency.py [--seconds 5] [--readers 4] [--jobs 2000]
+#
+# For each configuration a fresh temporary database is seeded with open
+# jobs. Reader threads then loop over get_all_jobs() while one writer thread
+# loops over insert_job(), all through the shared pool. The script prints
+# reads/s, writes/s and "database is locked" errors per configuration, and
+# the raw numbers as JSON on the last line.
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db_connection
+from create_tables import create_database_tables
+from insertion import insert_job, insert_jobs_bulk, insert_user
+from select_data import get_all_jobs
+
+# SQLite's out-of-the-box behaviour: rollback journal, synchronous=FULL,
+# default page cache and no busy timeout.
+LEGACY_PRAGMAS = {"busy_timeout": 0, "journal_mode": "DELETE", "synchronous": "FULL"}
+
+CONFIGURATIONS = [
+    ("legacy (rollback journal)", LEGACY_PRAGMAS),
+    ("durable (WAL, FULL)", "durable"),
+    ("fast (WAL, NORMAL)", "fast"),
+]
+
+
+def _run(profile, seconds, readers, seed_jobs):
+    tmpdir = tempfile.mkdtemp(prefix="bench-concurrency-")
+    db_connection.configure_pool(db_path=os.path.join(tmpdir, "bench.db"),
+                                 size=readers + 2, profile=profile)
+    create_database_tables()
+    recruiter_id = insert_user("bench", "bench@example.com", "pw", "recruiter", "Bench")["user_id"]
+    insert_jobs_bulk((recruiter_id, f"Job {i}", "Seed job", "Python, SQL", 1) for i in range(seed_jobs))
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        reads = errors = 0
+        while not stop.is_set():
+            try:
+                get_all_jobs(columns=["id", "title"])
+                reads += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts["reads"] += reads
+            counts["read_errors"] += errors
+
+    def writer():
+        writes = errors = 0
+        while not stop.is_set():
+            result = insert_job(recruiter_id, "Bench job", "Written during the benchmark", "Python", 2)
+            if result["success"]:
+                writes += 1
+            else:
+                errors += 1
+        with lock:
+            counts["writes"] += writes
+            counts["write_errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    db_connection.get_pool().close()
+
+    return {
+        "reads_per_sec": counts["reads"] / seconds,
+        "writes_per_sec": counts["writes"] / seconds,
+        "read_errors": counts["read_errors"],
+        "write_errors": counts["write_errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=2000, help="open jobs seeded before timing")
+    args = parser.parse_args()
+
+    results = {}
+    for name, profile in CONFIGURATIONS:
+        results[name] = _run(profile, args.seconds, args.readers, args.jobs)
+        r = results[name]
+        print(f"{name:28s} reads/s={r['reads_per_sec']:9.1f}  writes/s={r['writes_per_sec']:8.1f}  "
+              f"locked: reads={r['read_errors']} writes={r['write_errors']}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+# bench_data.py
+#
+# Latency and throughput of every public function in insertion.py,
+# select_data.py, update_data.py and delete_data.py.
+#
+#     python bench_data.py [--scale 1000] [--threads 1,4] [--calls 200] [--seconds 5]
+#                          [--blob-kb 64] [--seed 1] [--only 'select_data.*']
+#                          [--output run.json] [--compare baseline.json]
+#
+# A fresh temporary database (and blob directory) is filled with synthetic
+# data: `scale` users (5% recruiters), scale/10 jobs, about 1.2 resumes per
+# student whose file sizes follow a log-normal distribution around
+# --blob-kb, 3 applications and 1 analysis log per user, and a few
+# templates and reference documents. The same --seed gives the same data.
+#
+# Each function is then called --calls times (or until --seconds runs out)
+# by 1 thread and by each other --threads count sharing the pool. The
+# arguments for every call are prepared beforehand, outside the timing
+# (deletes get freshly seeded users of their own), so only the call itself
+# is measured. Functions run in the order inserts, selects, updates,
+# deletes, and later ones see the rows earlier ones wrote.
+#
+# The query cache and the login cache are off unless --caches is given, so
+# the numbers are those of the database. Password hashing uses
+# --scrypt-n (default 1024, far below production) so that seeding 1M users
+# stays practical; bench_login.py measures the real KDF cost.
+#
+# The whole run is written as JSON (stdout's last line, or --output).
+# --compare prints the throughput change of each function against an
+# earlier run and exits with status 1 if any got slower than --tolerance.
+
+import argparse
+import contextlib
+import datetime
+import fnmatch
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import blob_store
+import db_connection
+import delete_data
+import insertion
+import passwords
+import query_cache
+import select_data
+import update_data
+from create_tables import create_database_tables
+
+MODULES = (insertion, select_data, update_data, delete_data)
+
+# Public names that are not database operations.
+NOT_TIMED = {"get_db_connection", "row_type", "ResumeBlobFile"}
+
+BULK_ROWS = 1000  # rows per call for the *_bulk functions
+PERCENTILES = (50, 95, 99)
+
+_unique = itertools.count()
+
+
+# ==================== SYNTHETIC DATA ====================
+
+class Dataset:
+    """Ids of the seeded rows, for drawing call arguments."""
+
+    def __init__(self, rng, blob_kb):
+        self.rng = rng
+        self.blob_kb = blob_kb
+        self._noise = rng.randbytes(8 * 1024 * 1024)
+        self.students, self.recruiters, self.jobs = [], [], []
+        self.resumes, self.applications, self.templates, self.references = [], [], [], []
+        self.emails = {}  # user_id -> (email, password)
+        self.resumes_of = {}
+
+    def file_size(self):
+        if self.blob_kb <= 0:
+            return 0
+        size = int(self.rng.lognormvariate(math.log(self.blob_kb * 1024), 1.0))
+        return max(256, min(size, len(self._noise)))
+
+    def file_data(self):
+        # A unique header keeps the content-addressed store from deduplicating.
+        header = f"%PDF-synthetic-{next(_unique)}\n".encode()
+        return header + self._noise[:self.file_size()]
+
+    def text(self):
+        words = self.rng.sample(SKILLS, 8) + self.rng.sample(FILLER, 12)
+        self.rng.shuffle(words)
+        return " ".join(words)
+
+    def skills(self):
+        return ", ".join(self.rng.sample(SKILLS, self.rng.randint(2, 6)))
+
+    def pick(self, ids):
+        return self.rng.choice(ids)
+
+
+SKILLS = ["python", "sql", "sqlite", "java", "go", "rust", "docker", "kubernetes", "aws", "react",
+          "typescript", "pandas", "numpy", "spark", "airflow", "linux", "git", "excel", "tableau", "c++"]
+FILLER = ["built", "designed", "led", "shipped", "improved", "reduced", "latency", "pipeline",
+          "service", "dashboard", "team", "customers", "migration", "tests", "platform", "api"]
+
+
+def _new_user(role):
+    n = next(_unique)
+    return (f"bench{n}", f"bench{n}@example.com", f"pw-{n}", role, f"Bench User {n}")
+
+
+def seed(data, scale):
+    """Fill the current database with `scale` users and their rows. Returns row counts."""
+    rng = data.rng
+    n_recruiters = max(1, scale // 20)
+    users = [_new_user("recruiter" if i < n_recruiters else "student") for i in range(scale)]
+    ids = insertion.insert_users_bulk(users)["user_ids"]
+    for user_id, user in zip(ids, users):
+        data.emails[user_id] = (user[1], user[2])
+    data.recruiters, data.students = ids[:n_recruiters], ids[n_recruiters:] or ids[:1]
+
+    jobs = ((data.pick(data.recruiters), f"Job {i}", data.text(), data.skills(), rng.randint(0, 8))
+            for i in range(max(1, scale // 10)))
+    data.jobs = insertion.insert_jobs_bulk(jobs)["job_ids"]
+
+    owners = data.students + rng.sample(data.students, len(data.students) // 5)
+    resumes = ((owner, f"resume-{i}.pdf", data.file_data(), data.text()) for i, owner in enumerate(owners))
+    data.resumes = insertion.insert_resumes_bulk(resumes)["resume_ids"]
+    for owner, resume_id in zip(owners, data.resumes):
+        data.resumes_of.setdefault(owner, []).append(resume_id)
+
+    def application():
+        student = data.pick(data.students)
+        return (data.pick(data.jobs), student, data.pick(data.resumes_of[student]), round(rng.random(), 4))
+    data.applications = insertion.insert_applications_bulk(
+        application() for _ in range(3 * scale))["application_ids"]
+
+    logs = ((data.pick(data.resumes), data.pick(data.jobs),
+             {"score": round(rng.random() * 100, 2), "missing_skills": rng.sample(SKILLS, 3)})
+            for _ in range(scale))
+    insertion.insert_analysis_logs_bulk(logs)
+
+    data.templates = insertion.insert_templates_bulk(
+        (f"Template {i}", f"templates/{i}.docx", round(rng.random() * 100, 2), data.pick(data.recruiters))
+        for i in range(max(1, scale // 100)))["template_ids"]
+    data.references = insertion.insert_references_bulk(
+        (f"Reference {i}", f"references/{i}.pdf", f"Company {i % 50}", round(rng.random() * 100, 2),
+         data.pick(data.recruiters)) for i in range(max(1, scale // 100)))["reference_ids"]
+
+    conn = db_connection.get_db_connection(row_factory=None)
+    try:
+        return {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                for table in ("users", "resumes", "jobs", "applications", "analysis_logs",
+                              "templates", "reference")}
+    finally:
+        conn.close()
+
+
+def _victims(data, n):
+    """Seed n throwaway students, each with a resume, an application and a log."""
+    users = [_new_user("student") for _ in range(n)]
+    ids = insertion.insert_users_bulk(users)["user_ids"]
+    resumes = insertion.insert_resumes_bulk(
+        (user_id, "victim.pdf", data.file_data(), data.text()) for user_id in ids)["resume_ids"]
+    insertion.insert_applications_bulk(
+        (data.pick(data.jobs), user_id, resume_id, 0.5) for user_id, resume_id in zip(ids, resumes))
+    insertion.insert_analysis_logs_bulk(
+        (resume_id, data.pick(data.jobs), {"score": 50, "missing_skills": ["go"]}) for resume_id in resumes)
+    insertion.insert_templates_bulk(("Victim template", "t.docx", 10, user_id) for user_id in ids)
+    insertion.insert_references_bulk(("Victim reference", "r.pdf", "Co", 10, user_id) for user_id in ids)
+    return ids
+
+
+# ==================== CASES ====================
+# name -> function(data, n) returning a list of n (callable, args) pairs.
+# The callable is the public function itself unless the result has to be
+# consumed (generators, file objects).
+
+def _calls(func, make_args):
+    return lambda data, n: [(func, make_args(data)) for _ in range(n)]
+
+
+def _drain(iterator):
+    for _ in iterator:
+        pass
+
+
+def _read_file(resume_id):
+    f = select_data.open_resume_file(resume_id)
+    if f is not None:
+        with f:
+            while f.read(blob_store.CHUNK_SIZE):
+                pass
+
+
+def _resume_job_ids(data):
+    student = data.pick(data.students)
+    return student, data.pick(data.resumes_of[student])
+
+
+def _pairs(ids, value):
+    return lambda data: ([(row_id, value(data)) for row_id in data.rng.sample(ids(data), min(BULK_ROWS, len(ids(data))))],)
+
+
+def _score(data):
+    return round(data.rng.random() * 100, 2)
+
+
+def _victim_calls(func, per_call=1):
+    def build(data, n):
+        ids = _victims(data, n * per_call)
+        if per_call == 1:
+            return [(func, (user_id,)) for user_id in ids]
+        return [(func, (ids[i:i + per_call],)) for i in range(0, len(ids), per_call)]
+    return build
+
+
+def _insert_user_args(data):
+    return _new_user("student")
+
+
+def _application_args(data):
+    student, resume_id = _resume_job_ids(data)
+    return (data.pick(data.jobs), student, resume_id, 0.5)
+
+
+CASES = {
+    # insertion.py
+    "insertion.insert_user": _calls(insertion.insert_user, _insert_user_args),
+    "insertion.insert_resume": _calls(
+        insertion.insert_resume, lambda d: (d.pick(d.students), "upload.pdf", d.file_data(), d.text())),
+    "insertion.insert_resume_inline": _calls(
+        insertion.insert_resume_inline, lambda d: (d.pick(d.students), "upload.pdf", d.file_data(), d.text())),
+    "insertion.insert_job": _calls(
+        insertion.insert_job, lambda d: (d.pick(d.recruiters), "Bench job", d.text(), d.skills(), 2)),
+    "insertion.insert_application": _calls(insertion.insert_application, _application_args),
+    "insertion.insert_template": _calls(
+        insertion.insert_template, lambda d: ("Bench template", "t.docx", _score(d), d.pick(d.recruiters))),
+    "insertion.insert_new_reference": _calls(
+        insertion.insert_new_reference, lambda d: ("Bench ref", "r.pdf", "Co", _score(d), d.pick(d.recruiters))),
+    "insertion.insert_users_bulk": _calls(
+        insertion.insert_users_bulk, lambda d: ([_new_user("student") for _ in range(BULK_ROWS)],)),
+    "insertion.insert_resumes_bulk": _calls(
+        insertion.insert_resumes_bulk,
+        lambda d: ([(d.pick(d.students), "bulk.pdf", d.file_data(), d.text()) for _ in range(BULK_ROWS)],)),
+    "insertion.insert_jobs_bulk": _calls(
+        insertion.insert_jobs_bulk,
+        lambda d: ([(d.pick(d.recruiters), "Bulk job", d.text(), d.skills(), 1) for _ in range(BULK_ROWS)],)),
+    "insertion.insert_applications_bulk": _calls(
+        insertion.insert_applications_bulk, lambda d: ([_application_args(d) for _ in range(BULK_ROWS)],)),
+    "insertion.insert_templates_bulk": _calls(
+        insertion.insert_templates_bulk,
+        lambda d: ([("Bulk template", "t.docx", _score(d), d.pick(d.recruiters)) for _ in range(BULK_ROWS)],)),
+    "insertion.insert_references_bulk": _calls(
+        insertion.insert_references_bulk,
+        lambda d: ([("Bulk ref", "r.pdf", "Co", _score(d), d.pick(d.recruiters)) for _ in range(BULK_ROWS)],)),
+    "insertion.insert_analysis_logs_bulk": _calls(
+        insertion.insert_analysis_logs_bulk,
+        lambda d: ([(d.pick(d.resumes), d.pick(d.jobs), {"score": _score(d), "missing_skills": ["go"]})
+                    for _ in range(BULK_ROWS)],)),
+
+    # select_data.py
+    "select_data.login_user": _calls(
+        select_data.login_user, lambda d: d.emails[d.pick(d.students)]),
+    "select_data.get_user_resumes": _calls(select_data.get_user_resumes, lambda d: (d.pick(d.students),)),
+    "select_data.get_all_jobs": _calls(select_data.get_all_jobs, lambda d: ()),
+    "select_data.get_user_by_email": _calls(
+        select_data.get_user_by_email, lambda d: (d.emails[d.pick(d.students)][0],)),
+    "select_data.list_user_resumes": _calls(select_data.list_user_resumes, lambda d: (d.pick(d.students),)),
+    "select_data.list_open_jobs": _calls(select_data.list_open_jobs, lambda d: ()),
+    "select_data.get_user_summary_by_email": _calls(
+        select_data.get_user_summary_by_email, lambda d: (d.emails[d.pick(d.students)][0],)),
+    "select_data.get_jobs_page": _calls(
+        select_data.get_jobs_page, lambda d: (50,)),
+    "select_data.get_user_resumes_page": _calls(
+        select_data.get_user_resumes_page, lambda d: (d.pick(d.students), 50)),
+    "select_data.iter_all_jobs": _calls(lambda: _drain(select_data.iter_all_jobs()), lambda d: ()),
+    "select_data.iter_user_resumes": _calls(
+        lambda user_id: _drain(select_data.iter_user_resumes(user_id)), lambda d: (d.pick(d.students),)),
+    "select_data.open_resume_file": _calls(_read_file, lambda d: (d.pick(d.resumes),)),
+    "select_data.get_resume_file_view": _calls(select_data.get_resume_file_view, lambda d: (d.pick(d.resumes),)),
+    "select_data.iter_resume_file": _calls(
+        lambda resume_id: _drain(select_data.iter_resume_file(resume_id)), lambda d: (d.pick(d.resumes),)),
+    "select_data.get_top_applicants": _calls(select_data.get_top_applicants, lambda d: (d.pick(d.jobs),)),
+    "select_data.get_application_counts": _calls(
+        select_data.get_application_counts, lambda d: (d.pick(d.jobs),)),
+
+    # update_data.py
+    "update_data.update_user_role": _calls(
+        update_data.update_user_role, lambda d: (d.pick(d.students), "student")),
+    "update_data.update_resume_score": _calls(
+        update_data.update_resume_score, lambda d: (d.pick(d.resumes), _score(d))),
+    "update_data.update_job_status": _calls(update_data.update_job_status, lambda d: (d.pick(d.jobs), "open")),
+    "update_data.update_application_status": _calls(
+        update_data.update_application_status,
+        lambda d: (d.pick(d.applications), d.rng.choice(["submitted", "reviewed", "shortlisted"]))),
+    "update_data.update_template_score": _calls(
+        update_data.update_template_score, lambda d: (d.pick(d.templates), _score(d))),
+    "update_data.update_reference_score": _calls(
+        update_data.update_reference_score, lambda d: (d.pick(d.references), _score(d))),
+    "update_data.update_resume_scores_bulk": _calls(
+        update_data.update_resume_scores_bulk, _pairs(lambda d: d.resumes, _score)),
+    "update_data.update_application_statuses_bulk": _calls(
+        update_data.update_application_statuses_bulk, _pairs(lambda d: d.applications, lambda d: "reviewed")),
+    "update_data.update_application_scores_bulk": _calls(
+        update_data.update_application_scores_bulk,
+        _pairs(lambda d: d.applications, lambda d: round(d.rng.random(), 4))),
+    "update_data.update_template_scores_bulk": _calls(
+        update_data.update_template_scores_bulk, _pairs(lambda d: d.templates, _score)),
+    "update_data.update_reference_scores_bulk": _calls(
+        update_data.update_reference_scores_bulk, _pairs(lambda d: d.references, _score)),
+    "update_data.update_job_statuses_bulk": _calls(
+        update_data.update_job_statuses_bulk,
+        lambda d: (d.rng.sample(d.jobs, min(BULK_ROWS, len(d.jobs))), "open")),
+    "update_data.close_jobs_by_recruiter": _calls(
+        update_data.close_jobs_by_recruiter, lambda d: (d.pick(d.recruiters),)),
+    "update_data.close_jobs_posted_before": _calls(
+        update_data.close_jobs_posted_before,
+        lambda d: (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=365),)),
+
+    # delete_data.py
+    "delete_data.user_exists": _calls(delete_data.user_exists, lambda d: (d.pick(d.students),)),
+    "delete_data.delete_resumes_by_user_id": _victim_calls(delete_data.delete_resumes_by_user_id),
+    "delete_data.delete_jobs_by_user_id": _victim_calls(delete_data.delete_jobs_by_user_id),
+    "delete_data.delete_applications_by_user_id": _victim_calls(delete_data.delete_applications_by_user_id),
+    "delete_data.delete_analysis_logs_by_user_id": _victim_calls(delete_data.delete_analysis_logs_by_user_id),
+    "delete_data.delete_templates_by_user_id": _victim_calls(delete_data.delete_templates_by_user_id),
+    "delete_data.delete_reference_by_user_id": _victim_calls(delete_data.delete_reference_by_user_id),
+    "delete_data.delete_user_by_id": _victim_calls(delete_data.delete_user_by_id),
+    "delete_data.purge_users": _victim_calls(delete_data.purge_users, per_call=10),
+    "delete_data.delete_everything_by_user_id": _victim_calls(delete_data.delete_everything_by_user_id),
+}
+
+
+def public_functions():
+    """Every public function of the benchmarked modules, as "module.name"."""
+    names = []
+    for module in MODULES:
+        exported = getattr(module, "__all__", None) or [
+            name for name, value in vars(module).items()
+            if callable(value) and getattr(value, "__module__", None) == module.__name__]
+        names += [f"{module.__name__}.{name}" for name in exported
+                  if not name.startswith("_") and name not in NOT_TIMED
+                  and callable(getattr(module, name))]
+    return names
+
+
+# ==================== TIMING ====================
+
+def _failed(result):
+    return isinstance(result, dict) and result.get("success") is False
+
+
+def _percentile(sorted_values, p):
+    # Nearest-rank percentile.
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def _measure(calls, threads, seconds):
+    """Run prepared calls on `threads` threads; returns latency/throughput stats."""
+    next_call = itertools.count()
+    deadline = time.perf_counter() + seconds
+    latencies, errors = [], []
+
+    def worker():
+        mine, failed = [], 0
+        while time.perf_counter() < deadline:
+            i = next(next_call)
+            if i >= len(calls):
+                break
+            func, args = calls[i]
+            started = time.perf_counter()
+            try:
+                failed += _failed(func(*args))
+            except Exception:  # counted, not fatal: the run goes on
+                failed += 1
+            mine.append(time.perf_counter() - started)
+        latencies.extend(mine)
+        errors.append(failed)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    stats = {"calls": len(latencies), "errors": sum(errors), "seconds": round(elapsed, 6),
+             "calls_per_sec": len(latencies) / elapsed if elapsed else 0.0}
+    if latencies:
+        stats["mean_ms"] = sum(latencies) / len(latencies) * 1000
+        for p in PERCENTILES:
+            stats[f"p{p}_ms"] = _percentile(latencies, p) * 1000
+        stats["max_ms"] = latencies[-1] * 1000
+    return stats
+
+
+def _quiet(func, *args):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return func(*args)
+
+
+def compare(results, baseline, tolerance):
+    """Print throughput changes against a baseline run; returns the regressed keys."""
+    regressed = []
+    for key in ("scale", "blob_kb", "calls", "only", "profile", "scrypt_n", "caches"):
+        if baseline.get("config", {}).get(key) != results["config"][key]:
+            print(f"❌ --{key.replace('_', '-')} differs from the baseline run; numbers are not comparable")
+    for name, by_threads in results["results"].items():
+        for threads, stats in by_threads.items():
+            before = baseline.get("results", {}).get(name, {}).get(threads)
+            if not before or not before.get("calls_per_sec"):
+                continue
+            change = stats["calls_per_sec"] / before["calls_per_sec"] - 1
+            flag = ""
+            if change < -tolerance:
+                regressed.append(f"{name}[{threads}]")
+                flag = "  ❌ regression"
+            print(f"{name:48s} threads={threads:<3s} {change:+7.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=int, default=1000, help="users to seed (1000 to 1000000)")
+    parser.add_argument("--threads", default="1,4", help="comma-separated thread counts")
+    parser.add_argument("--calls", type=int, default=200, help="calls per function and thread count")
+    parser.add_argument("--seconds", type=float, default=5.0, help="time limit per function and thread count")
+    parser.add_argument("--blob-kb", type=float, default=64, help="median resume file size (0 = empty files)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", help="fnmatch pattern of functions to run, e.g. 'select_data.*'")
+    parser.add_argument("--profile", default="fast", help="connection profile (durable, fast, bulk-load)")
+    parser.add_argument("--scrypt-n", type=int, default=1024, help="scrypt cost used while benchmarking")
+    parser.add_argument("--caches", action="store_true", help="keep the query and login caches on")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop for --compare")
+    args = parser.parse_args()
+
+    thread_counts = sorted({int(t) for t in args.threads.split(",")})
+    tmpdir = tempfile.mkdtemp(prefix="bench-data-")
+    db_connection.configure_pool(db_path=os.path.join(tmpdir, "bench.db"),
+                                 size=max(thread_counts) + 2, profile=args.profile)
+    blob_store.configure_blob_store(root=os.path.join(tmpdir, "blobs"))
+    passwords.SCRYPT_PARAMS["n"] = args.scrypt_n
+    passwords.AUTH_CACHE_TTL = passwords.AUTH_CACHE_TTL if args.caches else 0
+    query_cache.configure_query_cache(enabled=args.caches)
+
+    _quiet(create_database_tables)
+    data = Dataset(random.Random(args.seed), args.blob_kb)
+    started = time.perf_counter()
+    rows = _quiet(seed, data, args.scale)
+    seed_seconds = time.perf_counter() - started
+    print(f"seeded {rows} in {seed_seconds:.1f}s ({tmpdir})")
+
+    names = [name for name in public_functions() if not args.only or fnmatch.fnmatch(name, args.only)]
+    results = {
+        "config": {**{k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+                   "threads": thread_counts, "bulk_rows": BULK_ROWS, "cores": os.cpu_count(),
+                   "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                   "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")},
+        "dataset": {**rows, "seed_seconds": seed_seconds},
+        "results": {},
+        "uncovered": [name for name in names if name not in CASES],
+    }
+    for name in names:
+        if name not in CASES:
+            continue
+        for threads in thread_counts:
+            calls = _quiet(CASES[name], data, args.calls)
+            r = results["results"].setdefault(name, {})[str(threads)] = _measure(calls, threads, args.seconds)
+            if not r["calls"]:
+                continue
+            print(f"{name:48s} threads={threads:<3d} calls/s={r['calls_per_sec']:9.1f}  "
+                  f"p50={r['p50_ms']:8.2f}ms p95={r['p95_ms']:8.2f}ms p99={r['p99_ms']:8.2f}ms  "
+                  f"errors={r['errors']}")
+    if results["uncovered"]:
+        print(f"❌ no benchmark case for: {', '.join(results['uncovered'])}")
+    db_connection.get_pool().close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    regressed = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+    print(json.dumps(results))
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
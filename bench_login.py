@@ -0,0 +1,104 @@
+# bench_login.py
+#
+# login_user() throughput with the salted KDF.
+#
+#     python bench_login.py [--seconds 5] [--users 200] [--threads 1,2,4,8]
+#
+# A fresh temporary database is seeded with users. For each thread count,
+# client threads call login_user() with correct passwords for random users:
+#   * "kdf":    the verified-session cache is disabled, so every login pays
+#               for one full scrypt/PBKDF2 verification;
+#   * "cached": the cache is enabled and warm, so logins skip the KDF.
+# The hashing pool is sized to the machine's cores, so "kdf" logins/s per
+# core is the figure to tune the cost parameters against. The raw numbers
+# are printed as JSON on the last line.
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import db_connection
+import passwords
+from create_tables import create_database_tables
+from insertion import insert_users_bulk
+from select_data import login_user
+
+
+def _seed(n_users):
+    tmpdir = tempfile.mkdtemp(prefix="bench-login-")
+    db_connection.configure_pool(db_path=os.path.join(tmpdir, "bench.db"), profile="fast")
+    create_database_tables()
+    started = time.perf_counter()
+    insert_users_bulk((f"user{i}", f"user{i}@example.com", f"pw-{i}", "student", f"User {i}")
+                      for i in range(n_users))
+    return (time.perf_counter() - started) / n_users
+
+
+def _run(threads, seconds, n_users):
+    stop = threading.Event()
+    counts = {"logins": 0, "failures": 0}
+    lock = threading.Lock()
+
+    def client():
+        rng = random.Random()
+        ok = failed = 0
+        while not stop.is_set():
+            i = rng.randrange(n_users)
+            if login_user(f"user{i}@example.com", f"pw-{i}")["success"]:
+                ok += 1
+            else:
+                failed += 1
+        with lock:
+            counts["logins"] += ok
+            counts["failures"] += failed
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    cores = min(threads, passwords.get_hash_pool().workers)
+    return {
+        "logins_per_sec": counts["logins"] / seconds,
+        "logins_per_sec_per_core": counts["logins"] / seconds / cores,
+        "failures": counts["failures"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", default="1,2,4,8", help="comma-separated client thread counts")
+    args = parser.parse_args()
+
+    hash_seconds = _seed(args.users)
+    print(f"algorithm={passwords.ALGORITHM} hash pool={passwords.get_hash_pool().workers} "
+          f"{passwords.get_hash_pool().kind}(s)  bulk hashing: {hash_seconds * 1000:.1f} ms/user")
+
+    results = {"algorithm": passwords.ALGORITHM, "cores": os.cpu_count(),
+               "bulk_hash_ms_per_user": hash_seconds * 1000, "kdf": {}, "cached": {}}
+    ttl = passwords.AUTH_CACHE_TTL
+    for mode in ("kdf", "cached"):
+        passwords.AUTH_CACHE_TTL = 0 if mode == "kdf" else max(ttl, 3600)
+        passwords.clear_auth_cache()
+        if mode == "cached":
+            for i in range(args.users):  # warm the cache
+                login_user(f"user{i}@example.com", f"pw-{i}")
+        for threads in (int(t) for t in args.threads.split(",")):
+            r = results[mode][threads] = _run(threads, args.seconds, args.users)
+            print(f"{mode:6s} threads={threads:<3d} logins/s={r['logins_per_sec']:9.1f}  "
+                  f"per core={r['logins_per_sec_per_core']:9.1f}  failures={r['failures']}")
+    passwords.AUTH_CACHE_TTL = ttl
+    db_connection.get_pool().close()
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
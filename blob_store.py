@@ -0,0 +1,242 @@
+# blob_store.py
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+import db_connection
+import sharding
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB per read/write when streaming files
+# Blobs written (or re-uploaded) more recently than this are never collected:
+# insert_resume stores the file before its row commits.
+GC_GRACE_SECONDS = float(os.environ.get("RESUME_ANALYZER_BLOB_GC_GRACE", 3600))
+# release_blobs() only has to spare a concurrent re-upload of the same content.
+RELEASE_GRACE_SECONDS = 60
+
+
+class BlobStore:
+    """
+    Interface for resume file storage.
+
+    Implementations store opaque bytes under their SHA-256 hex digest, so
+    identical uploads are stored once and rows only keep the digest.
+    """
+
+    def put(self, data) -> dict:
+        """Store bytes or a binary file-like object; return hash, size and path."""
+        raise NotImplementedError
+
+    def open(self, file_hash: str):
+        """Return a readable binary file object for the blob."""
+        raise NotImplementedError
+
+    def view(self, file_hash: str) -> memoryview:
+        """Return a read-only memoryview over the blob."""
+        with self.open(file_hash) as f:
+            return memoryview(f.read())
+
+    def exists(self, file_hash: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, file_hash: str) -> bool:
+        raise NotImplementedError
+
+
+class FileBlobStore(BlobStore):
+    """
+    Content-addressed directory: <root>/<ab>/<cd>/<sha256>.
+
+    Writes stream through a temporary file in the same directory and are
+    renamed into place, so a blob is either fully present or absent.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash[:2], file_hash[2:4], file_hash)
+
+    def put(self, data) -> dict:
+        stream = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            file_hash = digest.hexdigest()
+            final_path = self.path_for(file_hash)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)  # deduplicated: same content already stored
+                os.utime(final_path)  # restart the GC grace period for the new row
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {"file_hash": file_hash, "file_size": size, "file_path": final_path}
+
+    def open(self, file_hash: str):
+        return open(self.path_for(file_hash), "rb")
+
+    def view(self, file_hash: str) -> memoryview:
+        """Memory-map the blob; pages are only read when accessed."""
+        with self.open(file_hash) as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped)
+
+    def exists(self, file_hash: str) -> bool:
+        return os.path.exists(self.path_for(file_hash))
+
+    def delete(self, file_hash: str) -> bool:
+        try:
+            os.remove(self.path_for(file_hash))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def iter_hashes(self):
+        """Yield the digest of every stored blob."""
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.startswith("."):
+                    yield name
+
+
+# ==================== MODULE-LEVEL STORE ====================
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _default_root() -> str:
+    configured = os.environ.get("RESUME_ANALYZER_BLOB_DIR")
+    if configured:
+        return configured
+    return os.path.join(os.path.dirname(os.path.abspath(db_connection.DB_PATH)), "resume_blobs")
+
+
+def get_blob_store() -> BlobStore:
+    """Return the shared blob store, creating the default one on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FileBlobStore(_default_root())
+    return _store
+
+
+def configure_blob_store(store: BlobStore = None, root: str = None) -> BlobStore:
+    """Install a custom BlobStore, or a FileBlobStore rooted at `root`."""
+    global _store
+    with _store_lock:
+        _store = store if store is not None else FileBlobStore(root or _default_root())
+    return _store
+
+
+def _delete_unreferenced(store, candidates, referenced, grace) -> int:
+    """Delete candidates not in `referenced`, sparing files written in the last `grace` seconds."""
+    cutoff = time.time() - grace
+    removed = 0
+    for file_hash in candidates:
+        if file_hash in referenced:
+            continue
+        if isinstance(store, FileBlobStore):
+            try:
+                if os.path.getmtime(store.path_for(file_hash)) > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+        if store.delete(file_hash):
+            removed += 1
+    return removed
+
+
+def _select_hashes(sql, params):
+    conn = db_connection.get_db_connection(row_factory=None)
+    try:
+        return {row[0] for row in conn.execute(sql, params)}
+    finally:
+        conn.close()
+
+
+def _referenced_hashes(sql, params=()):
+    """Hashes `sql` selects from the catalog's resumes and, when sharded, every shard's."""
+    referenced = set()
+    shards = sharding.get_shards()
+    if shards is not None:
+        for hashes in shards.fan_out(_select_hashes, sql, params):
+            referenced |= hashes
+    with db_connection.use_pool(None):
+        referenced |= _select_hashes(sql, params)
+    return referenced
+
+
+def collect_garbage(grace: float = GC_GRACE_SECONDS) -> int:
+    """
+    Delete stored blobs no longer referenced by any resume.
+
+    Args:
+        grace (float): Skip blobs written in the last `grace` seconds, whose
+            rows may not be committed yet.
+
+    Returns:
+        int: Number of blobs deleted.
+    """
+    store = get_blob_store()
+    if not isinstance(store, FileBlobStore):
+        return 0
+    # List the candidates before reading the references: a blob stored
+    # after the query is then either young or not listed at all.
+    candidates = list(store.iter_hashes())
+    referenced = _referenced_hashes("SELECT DISTINCT file_hash FROM resumes WHERE file_hash IS NOT NULL")
+    return _delete_unreferenced(store, candidates, referenced, grace)
+
+
+def release_blobs(file_hashes, grace: float = RELEASE_GRACE_SECONDS) -> int:
+    """
+    Delete the given blobs unless a resume still references them.
+
+    Called after committing a delete of resume rows. Blobs re-uploaded in
+    the last `grace` seconds may belong to a row not yet committed, so they
+    are left for collect_garbage().
+
+    Returns:
+        int: Number of blobs deleted.
+    """
+    candidates = sorted({file_hash for file_hash in file_hashes if file_hash})
+    if not candidates or db_connection.has_bound_connection():
+        # On a bound connection (async_data's batches) the delete is not
+        # committed yet and may still roll back: leave it to collect_garbage().
+        return 0
+    referenced = _referenced_hashes(
+        "SELECT DISTINCT file_hash FROM resumes WHERE file_hash IN (SELECT value FROM json_each(?))",
+        (json.dumps(candidates),))
+    return _delete_unreferenced(get_blob_store(), candidates, referenced, grace)
+
+
+__all__ = [
+    'BlobStore',
+    'FileBlobStore',
+    'get_blob_store',
+    'configure_blob_store',
+    'collect_garbage',
+    'release_blobs'
+]
@@ -1,8 +1,10 @@
 import sqlite3
 
+from db_connection import get_db_connection
+
 def create_database_tables():
     """Create all tables for Resume Analyzer application"""
-    conn = sqlite3.connect('resume_analyzer.db')
+    conn = get_db_connection(row_factory=None)
     cursor = conn.cursor()
     
     # 1. users table
@@ -111,17 +113,437 @@ def create_database_tables():
     conn.commit()
     conn.close()
     print("✅ All tables created successfully!")
+    migrate_database()
+
+# ==================== SCHEMA MIGRATIONS ====================
+# Each migration is (version, description, [statements]). PRAGMA user_version
+# records the last migration applied, so migrate_database() is safe to run on
+# every start-up and only applies what is new.
+
+# Secondary indexes, one per hot access pattern in the data modules.
+EXPECTED_INDEXES = {
+    # select_data.get_user_resumes: WHERE user_id = ? ORDER BY upload_at DESC.
+    # Kept ascending so a backwards scan yields (upload_at DESC, id DESC),
+    # the keyset order used for pagination, without a temp sort.
+    'idx_resumes_user_upload': 'CREATE INDEX IF NOT EXISTS idx_resumes_user_upload ON resumes (user_id, upload_at)',
+    # select_data.get_all_jobs: WHERE status = 'open' ORDER BY posted_on DESC (same reasoning)
+    'idx_jobs_status_posted': 'CREATE INDEX IF NOT EXISTS idx_jobs_status_posted ON jobs (status, posted_on)',
+    # delete_data: jobs by recruiter_id, also the "job_id IN (SELECT id ...)" subqueries
+    'idx_jobs_recruiter': 'CREATE INDEX IF NOT EXISTS idx_jobs_recruiter ON jobs (recruiter_id, id)',
+    # delete_data.delete_applications_by_user_id: student_id = ? OR job_id IN (...)
+    'idx_applications_student': 'CREATE INDEX IF NOT EXISTS idx_applications_student ON applications (student_id)',
+    'idx_applications_job': 'CREATE INDEX IF NOT EXISTS idx_applications_job ON applications (job_id, similarity_score DESC)',
+    # ON DELETE CASCADE from resumes
+    'idx_applications_resume': 'CREATE INDEX IF NOT EXISTS idx_applications_resume ON applications (resume_id)',
+    # delete_data.delete_analysis_logs_by_user_id: resume_id IN (...) OR job_id IN (...)
+    'idx_analysis_logs_resume': 'CREATE INDEX IF NOT EXISTS idx_analysis_logs_resume ON analysis_logs (resume_id)',
+    'idx_analysis_logs_job': 'CREATE INDEX IF NOT EXISTS idx_analysis_logs_job ON analysis_logs (job_id)',
+    # analysis_data.get_analysis_logs: job_id = ? AND score >= ? (generated column)
+    'idx_analysis_logs_job_score': 'CREATE INDEX IF NOT EXISTS idx_analysis_logs_job_score ON analysis_logs (job_id, score)',
+    # analysis_data compaction / rollup: analyzed_at < cutoff
+    'idx_analysis_logs_analyzed_at': 'CREATE INDEX IF NOT EXISTS idx_analysis_logs_analyzed_at ON analysis_logs (analyzed_at)',
+    # delete_data: templates / reference by uploaded_by
+    'idx_templates_uploaded_by': 'CREATE INDEX IF NOT EXISTS idx_templates_uploaded_by ON templates (uploaded_by)',
+    'idx_reference_uploaded_by': 'CREATE INDEX IF NOT EXISTS idx_reference_uploaded_by ON reference (uploaded_by)',
+    # blob_store deduplication: find resumes sharing a stored file
+    'idx_resumes_file_hash': 'CREATE INDEX IF NOT EXISTS idx_resumes_file_hash ON resumes (file_hash)',
+}
+
+
+def _indexes(*names):
+    return [EXPECTED_INDEXES[name] for name in names]
+
+
+def _move_resume_blobs(conn):
+    """
+    Copy every resumes.uploaded_file BLOB into the blob store and clear it.
+
+    Each BLOB is streamed through Connection.blobopen so only one chunk of
+    one file is held in memory at a time.
+    """
+    from blob_store import get_blob_store, CHUNK_SIZE
+
+    class _BlobReader:
+        def __init__(self, blob):
+            self.blob = blob
+
+        def read(self, size=CHUNK_SIZE):
+            return self.blob.read(size)
+
+    store = get_blob_store()
+    resume_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM resumes WHERE uploaded_file IS NOT NULL AND file_hash IS NULL")]
+    for resume_id in resume_ids:
+        with conn.blobopen('resumes', 'uploaded_file', resume_id, readonly=True) as blob:
+            stored = store.put(_BlobReader(blob))
+        conn.execute(
+            "UPDATE resumes SET file_hash = ?, file_size = ?, file_path = ?, uploaded_file = NULL WHERE id = ?",
+            (stored["file_hash"], stored["file_size"], stored["file_path"], resume_id))
+    if resume_ids:
+        print(f"  moved {len(resume_ids)} resume file(s) to {getattr(store, 'root', 'blob store')}")
+
+
+# Full-text search: external-content FTS5 tables over resumes.extracted_text
+# and the jobs text columns, kept in sync by triggers so every insert_*,
+# update and delete path (including bulk ones) maintains the index.
+FTS_TABLES = ['resumes_fts', 'jobs_fts']
+FTS_SHADOW_SUFFIXES = ('data', 'idx', 'content', 'docsize', 'config')
+
+FTS_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS resumes_fts USING fts5(
+        extracted_text, content='resumes', content_rowid='id', tokenize='porter unicode61')''',
+    '''CREATE TRIGGER IF NOT EXISTS resumes_fts_ai AFTER INSERT ON resumes BEGIN
+        INSERT INTO resumes_fts (rowid, extracted_text) VALUES (new.id, new.extracted_text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS resumes_fts_ad AFTER DELETE ON resumes BEGIN
+        INSERT INTO resumes_fts (resumes_fts, rowid, extracted_text) VALUES ('delete', old.id, old.extracted_text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS resumes_fts_au AFTER UPDATE OF extracted_text ON resumes BEGIN
+        INSERT INTO resumes_fts (resumes_fts, rowid, extracted_text) VALUES ('delete', old.id, old.extracted_text);
+        INSERT INTO resumes_fts (rowid, extracted_text) VALUES (new.id, new.extracted_text);
+    END''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+        title, job_description, required_skills, content='jobs', content_rowid='id', tokenize='porter unicode61')''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN
+        INSERT INTO jobs_fts (rowid, title, job_description, required_skills)
+        VALUES (new.id, new.title, new.job_description, new.required_skills);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN
+        INSERT INTO jobs_fts (jobs_fts, rowid, title, job_description, required_skills)
+        VALUES ('delete', old.id, old.title, old.job_description, old.required_skills);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF title, job_description, required_skills ON jobs BEGIN
+        INSERT INTO jobs_fts (jobs_fts, rowid, title, job_description, required_skills)
+        VALUES ('delete', old.id, old.title, old.job_description, old.required_skills);
+        INSERT INTO jobs_fts (rowid, title, job_description, required_skills)
+        VALUES (new.id, new.title, new.job_description, new.required_skills);
+    END''',
+    # Index the rows that existed before the triggers did.
+    "INSERT INTO resumes_fts (resumes_fts) VALUES ('rebuild')",
+    "INSERT INTO jobs_fts (jobs_fts) VALUES ('rebuild')",
+]
+
+# Feature cache for scoring (see features.py). Entries are keyed by
+# (entity, entity_id); triggers drop an entry when its source text changes
+# or its row is deleted, so a stale vector is never served.
+FEATURE_CACHE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS feature_cache (
+        entity TEXT NOT NULL CHECK (entity IN ('resume', 'job')),
+        entity_id INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,  -- SHA-1 of feature version + source text
+        indices BLOB NOT NULL,       -- int32 hashed feature indices
+        counts BLOB NOT NULL,        -- float32 term counts
+        skills TEXT,                 -- JSON list of normalized required skills (jobs)
+        skill_indices BLOB,          -- int32 feature indices of those skills (jobs)
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (entity, entity_id)
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS feature_cache_resume_au AFTER UPDATE OF extracted_text ON resumes BEGIN
+        DELETE FROM feature_cache WHERE entity = 'resume' AND entity_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS feature_cache_resume_ad AFTER DELETE ON resumes BEGIN
+        DELETE FROM feature_cache WHERE entity = 'resume' AND entity_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS feature_cache_job_au AFTER UPDATE OF title, job_description, required_skills ON jobs BEGIN
+        DELETE FROM feature_cache WHERE entity = 'job' AND entity_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS feature_cache_job_ad AFTER DELETE ON jobs BEGIN
+        DELETE FROM feature_cache WHERE entity = 'job' AND entity_id = old.id;
+    END''',
+]
+
+# Per-job ranked applicants and per-status application counts, maintained
+# by triggers so reads never scan applications. job_leaderboard holds the
+# LEADERBOARD_SIZE best-scored applications of each job (ties broken by
+# application id); changing the size needs a new migration that rebuilds it.
+LEADERBOARD_SIZE = 100
+
+_TRIM_LEADERBOARD = f'''DELETE FROM job_leaderboard WHERE job_id = new.job_id AND application_id IN (
+            SELECT application_id FROM job_leaderboard WHERE job_id = new.job_id
+            ORDER BY score DESC, application_id LIMIT -1 OFFSET {LEADERBOARD_SIZE});'''
+# The "need" row exists only while the board is short, and CROSS JOIN makes
+# it the outer loop, so a full board never walks the job's applications.
+_REFILL_LEADERBOARD = f'''INSERT OR IGNORE INTO job_leaderboard (job_id, score, application_id)
+            SELECT a.job_id, a.similarity_score, a.id
+            FROM (SELECT 1 WHERE (SELECT count(*) FROM (SELECT 1 FROM job_leaderboard WHERE job_id = old.job_id
+                                                       LIMIT {LEADERBOARD_SIZE})) < {LEADERBOARD_SIZE}) AS need
+            CROSS JOIN applications a
+            WHERE a.job_id = old.job_id AND a.similarity_score IS NOT NULL
+            ORDER BY a.similarity_score DESC, a.id LIMIT {LEADERBOARD_SIZE};'''
+_LEAVE_LEADERBOARD = '''DELETE FROM job_leaderboard
+            WHERE job_id = old.job_id AND score = old.similarity_score AND application_id = old.id;'''
+_ENTER_LEADERBOARD = '''INSERT OR IGNORE INTO job_leaderboard (job_id, score, application_id)
+            SELECT new.job_id, new.similarity_score, new.id
+            WHERE new.job_id IS NOT NULL AND new.similarity_score IS NOT NULL;'''
+_COUNT_IN = '''INSERT INTO job_application_counts (job_id, status, n)
+            SELECT new.job_id, ifnull(new.status, ''), 1 WHERE new.job_id IS NOT NULL
+            ON CONFLICT (job_id, status) DO UPDATE SET n = n + 1;'''
+_COUNT_OUT = '''UPDATE job_application_counts SET n = n - 1
+            WHERE job_id = old.job_id AND status = ifnull(old.status, '');
+        DELETE FROM job_application_counts
+            WHERE job_id = old.job_id AND status = ifnull(old.status, '') AND n <= 0;'''
+
+LEADERBOARD_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS job_leaderboard (
+        job_id INTEGER NOT NULL,
+        score REAL NOT NULL,
+        application_id INTEGER NOT NULL,
+        PRIMARY KEY (job_id, score DESC, application_id)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS job_application_counts (
+        job_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (job_id, status)
+    ) WITHOUT ROWID''',
+    f'''CREATE TRIGGER IF NOT EXISTS job_rankings_ai AFTER INSERT ON applications BEGIN
+        {_ENTER_LEADERBOARD}
+        {_TRIM_LEADERBOARD}
+        {_COUNT_IN}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS job_rankings_ad AFTER DELETE ON applications BEGIN
+        {_LEAVE_LEADERBOARD}
+        {_REFILL_LEADERBOARD}
+        {_COUNT_OUT}
+    END''',
+    # Leaving first and refilling from applications (which already holds the
+    # new score) keeps the board exact when a ranked score drops.
+    f'''CREATE TRIGGER IF NOT EXISTS job_rankings_au_score AFTER UPDATE OF similarity_score, job_id ON applications
+    WHEN old.similarity_score IS NOT new.similarity_score OR old.job_id IS NOT new.job_id BEGIN
+        {_LEAVE_LEADERBOARD}
+        {_REFILL_LEADERBOARD}
+        {_ENTER_LEADERBOARD}
+        {_TRIM_LEADERBOARD}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS job_rankings_au_status AFTER UPDATE OF status, job_id ON applications
+    WHEN old.status IS NOT new.status OR old.job_id IS NOT new.job_id BEGIN
+        {_COUNT_OUT}
+        {_COUNT_IN}
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS job_rankings_job_ad AFTER DELETE ON jobs BEGIN
+        DELETE FROM job_leaderboard WHERE job_id = old.id;
+        DELETE FROM job_application_counts WHERE job_id = old.id;
+    END''',
+    'DELETE FROM job_leaderboard',
+    f'''INSERT INTO job_leaderboard (job_id, score, application_id)
+        SELECT job_id, similarity_score, id FROM (
+            SELECT job_id, similarity_score, id,
+                   row_number() OVER (PARTITION BY job_id ORDER BY similarity_score DESC, id) AS rank
+            FROM applications WHERE job_id IS NOT NULL AND similarity_score IS NOT NULL)
+        WHERE rank <= {LEADERBOARD_SIZE}''',
+    'DELETE FROM job_application_counts',
+    '''INSERT INTO job_application_counts (job_id, status, n)
+        SELECT job_id, ifnull(status, ''), count(*) FROM applications
+        WHERE job_id IS NOT NULL GROUP BY job_id, ifnull(status, '')''',
+]
+
+# analysis_logs.analysis_results is JSON with (at least) "score" and
+# "missing_skills". Generated columns expose those fields for indexing;
+# missing skills also go into a side table (one row per skill, filled by
+# trigger) so "logs missing skill X" is an index lookup. Compacted rows keep
+# only those fields in analysis_results and the full JSON zlib-compressed in
+# payload_z (see analysis_data.py), so the generated columns stay valid.
+ANALYSIS_LOGS_SCHEMA = [
+    '''ALTER TABLE analysis_logs ADD COLUMN score REAL GENERATED ALWAYS AS (
+        CASE WHEN json_valid(analysis_results) THEN json_extract(analysis_results, '$.score') END) VIRTUAL''',
+    '''ALTER TABLE analysis_logs ADD COLUMN missing_skill_count INTEGER GENERATED ALWAYS AS (
+        CASE WHEN json_valid(analysis_results) THEN json_array_length(analysis_results, '$.missing_skills') END) VIRTUAL''',
+    'ALTER TABLE analysis_logs ADD COLUMN payload_z BLOB',
+    '''CREATE TABLE IF NOT EXISTS analysis_log_missing_skills (
+        skill TEXT NOT NULL,
+        log_id INTEGER NOT NULL,
+        PRIMARY KEY (skill, log_id)
+    ) WITHOUT ROWID''',
+    '''CREATE TRIGGER IF NOT EXISTS analysis_logs_skills_ai AFTER INSERT ON analysis_logs
+    WHEN json_valid(new.analysis_results) BEGIN
+        INSERT OR IGNORE INTO analysis_log_missing_skills (skill, log_id)
+            SELECT lower(trim(value)), new.id FROM json_each(new.analysis_results, '$.missing_skills')
+            WHERE type = 'text';
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS analysis_logs_skills_ad AFTER DELETE ON analysis_logs BEGIN
+        DELETE FROM analysis_log_missing_skills
+        WHERE log_id = old.id AND skill IN (
+            SELECT lower(trim(value)) FROM json_each(
+                CASE WHEN json_valid(old.analysis_results) THEN old.analysis_results ELSE '[]' END,
+                '$.missing_skills'));
+    END''',
+    '''INSERT OR IGNORE INTO analysis_log_missing_skills (skill, log_id)
+        SELECT lower(trim(j.value)), l.id FROM analysis_logs l, json_each(l.analysis_results, '$.missing_skills') j
+        WHERE j.type = 'text' AND json_valid(l.analysis_results)''',
+    '''CREATE TABLE IF NOT EXISTS analysis_log_rollups (
+        job_id INTEGER NOT NULL,   -- 0 for logs without a job
+        day TEXT NOT NULL,         -- YYYY-MM-DD of analyzed_at
+        n INTEGER NOT NULL,
+        scored INTEGER NOT NULL,   -- logs with a numeric score
+        score_sum REAL,
+        score_min REAL,
+        score_max REAL,
+        PRIMARY KEY (job_id, day)
+    ) WITHOUT ROWID''',
+    # Reclaim freed pages in small steps with PRAGMA incremental_vacuum
+    # (takes effect with the VACUUM that follows this migration).
+    'PRAGMA auto_vacuum = INCREMENTAL',
+]
+
+# Corpus statistics for scoring (see features.load_document_frequencies).
+# Every resume insert and feature_cache change bumps `generation`; the
+# stored document frequencies are current while stats_generation matches.
+FEATURE_STATS_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS feature_stats (
+        entity TEXT PRIMARY KEY CHECK (entity IN ('resume', 'job')),
+        generation INTEGER NOT NULL DEFAULT 0,
+        stats_generation INTEGER,    -- generation the frequencies were computed at
+        feature_version INTEGER,     -- features.FEATURE_VERSION they were computed with
+        n_docs INTEGER,
+        df_indices BLOB,             -- int32 feature indices with a non-zero frequency
+        df_counts BLOB               -- float32 number of documents containing each
+    )''',
+    "INSERT OR IGNORE INTO feature_stats (entity) VALUES ('resume'), ('job')",
+    '''CREATE TRIGGER IF NOT EXISTS feature_stats_resume_ai AFTER INSERT ON resumes BEGIN
+        UPDATE feature_stats SET generation = generation + 1 WHERE entity = 'resume';
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS feature_stats_cache_ai AFTER INSERT ON feature_cache BEGIN
+        UPDATE feature_stats SET generation = generation + 1 WHERE entity = new.entity;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS feature_stats_cache_ad AFTER DELETE ON feature_cache BEGIN
+        UPDATE feature_stats SET generation = generation + 1 WHERE entity = old.entity;
+    END''',
+]
+
+MIGRATIONS = [
+    (1, "secondary indexes for lookup and delete paths",
+     _indexes('idx_resumes_user_upload', 'idx_jobs_status_posted', 'idx_jobs_recruiter',
+              'idx_applications_student', 'idx_applications_job', 'idx_applications_resume',
+              'idx_analysis_logs_resume', 'idx_analysis_logs_job',
+              'idx_templates_uploaded_by', 'idx_reference_uploaded_by') + ['ANALYZE']),
+    (2, "move resume files out of resumes.uploaded_file into the blob store",
+     ['ALTER TABLE resumes ADD COLUMN file_hash TEXT',
+      'ALTER TABLE resumes ADD COLUMN file_size INTEGER']
+     + _indexes('idx_resumes_file_hash') + [_move_resume_blobs]),
+    (3, "ascending listing indexes for keyset pagination",
+     ['DROP INDEX IF EXISTS idx_resumes_user_upload',
+      'DROP INDEX IF EXISTS idx_jobs_status_posted']
+     + _indexes('idx_resumes_user_upload', 'idx_jobs_status_posted')),
+    (4, "FTS5 full-text search over resumes and jobs", FTS_SCHEMA),
+    (5, "feature cache for similarity scoring", FEATURE_CACHE_SCHEMA),
+    (6, "trigger-maintained job leaderboard and application counts", LEADERBOARD_SCHEMA),
+    (7, "indexed JSON fields, compression and rollups for analysis_logs",
+     ANALYSIS_LOGS_SCHEMA + _indexes('idx_analysis_logs_job_score', 'idx_analysis_logs_analyzed_at')),
+    (8, "corpus document frequencies for scoring", FEATURE_STATS_SCHEMA),
+    # Entries from another features.FEATURE_VERSION are ignored and recomputed.
+    (9, "feature version on cached features",
+     ['ALTER TABLE feature_cache ADD COLUMN feature_version INTEGER NOT NULL DEFAULT 0']),
+]
+
+# Migrations that free a lot of pages; the file is VACUUMed after they run.
+VACUUM_AFTER_VERSIONS = {2, 7}
+
+# Representative queries and the index each one must use.
+QUERY_PLAN_CHECKS = [
+    ("SELECT * FROM resumes WHERE user_id = 1 ORDER BY upload_at DESC", 'idx_resumes_user_upload'),
+    ("SELECT * FROM jobs WHERE status = 'open' ORDER BY posted_on DESC", 'idx_jobs_status_posted'),
+    ("SELECT id FROM resumes WHERE user_id = 1 AND (upload_at, id) < ('2000-01-01', 1) ORDER BY upload_at DESC, id DESC LIMIT 50",
+     'idx_resumes_user_upload'),
+    ("SELECT id FROM jobs WHERE status = 'open' AND (posted_on, id) < ('2000-01-01', 1) ORDER BY posted_on DESC, id DESC LIMIT 50",
+     'idx_jobs_status_posted'),
+    ("DELETE FROM jobs WHERE recruiter_id = 1", 'idx_jobs_recruiter'),
+    ("SELECT id FROM applications WHERE student_id = 1", 'idx_applications_student'),
+    ("SELECT id FROM applications WHERE job_id IN (SELECT id FROM jobs WHERE recruiter_id = 1)", 'idx_applications_job'),
+    ("SELECT id FROM applications WHERE job_id = 1 AND status = 'submitted' AND similarity_score IS NOT NULL "
+     "ORDER BY similarity_score DESC, id LIMIT 10", 'idx_applications_job'),
+    ("SELECT id FROM analysis_logs WHERE job_id = 1 AND score >= 0.5", 'idx_analysis_logs_job_score'),
+    ("SELECT id FROM analysis_logs WHERE analyzed_at < '2000-01-01'", 'idx_analysis_logs_analyzed_at'),
+    ("SELECT id FROM analysis_logs WHERE resume_id IN (SELECT id FROM resumes WHERE user_id = 1)", 'idx_analysis_logs_resume'),
+    ("SELECT id FROM analysis_logs WHERE job_id IN (SELECT id FROM jobs WHERE recruiter_id = 1)", 'idx_analysis_logs_job'),
+]
+
+
+def get_schema_version(conn) -> int:
+    """Return the last migration version applied to the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate_database():
+    """Apply every pending migration, each in its own transaction."""
+    conn = get_db_connection(row_factory=None)
+    try:
+        current = get_schema_version(conn)
+        needs_vacuum = False
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                conn.execute("BEGIN")
+                for statement in statements:
+                    # Data migrations are Python callables taking the connection.
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                # PRAGMA does not accept bound parameters; version is an int constant.
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.commit()
+                print(f"✅ Applied migration {version}: {description}")
+                needs_vacuum = needs_vacuum or version in VACUUM_AFTER_VERSIONS
+            except (sqlite3.Error, OSError) as e:
+                conn.rollback()
+                print(f"❌ Migration {version} failed: {e}")
+                return False
+        if needs_vacuum:
+            # VACUUM cannot run inside a transaction; it rebuilds the file
+            # without the pages freed by the migrations above.
+            conn.execute("VACUUM")
+            print("✅ Database vacuumed")
+    finally:
+        conn.close()
+    return explain_query_plans()
+
+
+def explain_query_plans(verbose=False):
+    """
+    Run EXPLAIN QUERY PLAN for each hot query and check it uses its index.
+
+    Returns:
+        bool: True if every query is served by the expected index.
+    """
+    conn = get_db_connection(row_factory=None)
+    all_ok = True
+    try:
+        for query, index_name in QUERY_PLAN_CHECKS:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+            details = [row[3] for row in plan]
+            uses_index = any(index_name in detail for detail in details)
+            all_ok = all_ok and uses_index
+            if verbose or not uses_index:
+                status = "✅" if uses_index else "❌"
+                print(f"  {status} {index_name}: {' | '.join(details)}")
+    finally:
+        conn.close()
+    if not all_ok:
+        print("❌ Some queries are not using their expected index.")
+    return all_ok
+
+
+def initialize_database():
+    """Create all tables and bring the schema up to the latest version."""
+    create_database_tables()
+
 
 def verify_tables():
     """Verify that all tables were created correctly"""
-    conn = sqlite3.connect('resume_analyzer.db')
+    conn = get_db_connection(row_factory=None)
     cursor = conn.cursor()
     
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
     tables = cursor.fetchall()
     
     print("\n📋 Tables in database:")
     expected_tables = ['users', 'resumes', 'jobs', 'applications', 'templates', 'reference', 'analysis_logs']
+    expected_tables += FTS_TABLES + ['feature_cache', 'feature_stats', 'job_leaderboard', 'job_application_counts',
+                        'analysis_log_missing_skills', 'analysis_log_rollups']
+    # FTS5 keeps its postings in internal shadow tables; don't list those.
+    shadow_tables = {f"{fts}_{suffix}" for fts in FTS_TABLES for suffix in FTS_SHADOW_SUFFIXES}
+    tables = [table for table in tables if table[0] not in shadow_tables]
     
     for table in tables:
         table_name = table[0]
@@ -139,10 +561,24 @@ def verify_tables():
     else:
         print(f"\n✅ All {len(expected_tables)} tables created successfully!")
     
+    # Check that every expected secondary index exists
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='index';")
+    created_indexes = {row[0] for row in cursor.fetchall()}
+    missing_indexes = set(EXPECTED_INDEXES) - created_indexes
+    
+    if missing_indexes:
+        print(f"❌ Missing indexes: {sorted(missing_indexes)}")
+    else:
+        print(f"✅ All {len(EXPECTED_INDEXES)} indexes present (schema version {get_schema_version(conn)})")
+    
     conn.close()
+    return not missing_tables and not missing_indexes
 __all__ = [
     'create_database_tables',
     'verify_tables',
     'initialize_database',
+    'migrate_database',
+    'explain_query_plans',
+    'get_schema_version',
     'get_db_connection'
 ]
@@ -0,0 +1,482 @@
+# transfer_operations.py
+#
+# Streaming JSONL import/export, one file per table.
+#
+#     python data_transfer.py export backup/            # every table
+#     python data_transfer.py import backup/ --workers 4
+#     python data_transfer.py export backup/ --tables jobs applications
+#
+# Format: <table>.jsonl, one JSON object per row, keyed by column name.
+# BLOB values are written as {"$base64": "..."}. A resumes row is followed
+# by its uploaded file as `file_chunks` lines of {"b64": "..."} (one per
+# CHUNK_SIZE bytes), so neither side ever holds a whole file in memory: on
+# export the bytes are read from the blob store (or, for rows that still
+# store them inline, through Connection.blobopen), on import they stream
+# straight into the blob store. A resume whose stored file is missing is
+# listed in the result's "missing_files" and fails the export unless
+# skip_missing_files (--skip-missing-files) accepts a backup without it.
+#
+# Memory stays bounded: rows are read in keyset batches and written as
+# they go; imports parse blocks of lines (optionally on a process pool,
+# with a bounded number of blocks in flight) and insert `batch_size` rows
+# per transaction with executemany.
+#
+# Both directions are resumable. After every committed batch the byte
+# offset (and, for exports, the last id written) is saved to a checkpoint
+# file (import progress is kept per destination database); rerunning the
+# same command continues from there. Imports keep the exported ids and use
+# INSERT OR IGNORE, so replaying a batch that committed just before an
+# interruption is harmless.
+#
+# Only the catalog is transferred: with sharding on (sharding.py) the
+# sharded tables (resumes, applications, analysis_logs) are refused.
+
+import argparse
+import base64
+import collections
+import concurrent.futures
+import json
+import os
+import sqlite3
+
+from blob_store import CHUNK_SIZE, get_blob_store
+from db_connection import get_db_connection
+from query_cache import invalidate
+from sharding import SHARDED_TABLES, ensure_unsharded
+
+# Import order respects foreign keys. Derived tables (FTS, feature cache,
+# leaderboard, skill index) are rebuilt by their triggers on import.
+TABLES = ('users', 'resumes', 'jobs', 'applications', 'templates', 'reference', 'analysis_logs')
+# resumes columns describing where the file lives; the file itself is
+# carried in the chunk lines and re-stored on import.
+RESUME_FILE_COLUMNS = ('uploaded_file', 'file_path', 'file_hash', 'file_size')
+
+DEFAULT_EXPORT_BATCH = 1000
+DEFAULT_IMPORT_BATCH = 10000
+PARSE_BLOCK_LINES = 2000
+CHECKPOINT_NAME = 'checkpoint.json'
+
+
+# ==================== CHECKPOINTS ====================
+
+def _load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_checkpoint(path, state):
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _ensure_unsharded(tables):
+    """Sharded tables live in the shard files, which are not transferred."""
+    if any(table in SHARDED_TABLES for table in tables):
+        ensure_unsharded("Import/export of resumes, applications and analysis_logs")
+
+
+def _database_file(conn):
+    """Absolute path of the database file behind `conn` ('' for in-memory)."""
+    for _, name, file in conn.execute('PRAGMA database_list'):
+        if name == 'main':
+            return os.path.abspath(file) if file else ''
+    return ''
+
+
+def _columns(conn, table):
+    # table_info omits generated columns, which must not be written.
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    if table == 'resumes':
+        columns = [c for c in columns if c not in RESUME_FILE_COLUMNS]
+    return columns
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"$base64": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "$base64" in value:
+        return base64.b64decode(value["$base64"])
+    return value
+
+
+# ==================== EXPORT ====================
+
+def _open_resume_file(conn, resume_id, file_hash):
+    """
+    Return (size, readable) for a resume's file, or (0, None) if it has none.
+
+    Raises:
+        FileNotFoundError: The row names a stored file the blob store lacks.
+    """
+    if file_hash:
+        store = get_blob_store()
+        if not store.exists(file_hash):
+            raise FileNotFoundError(f"stored file {file_hash} of resume {resume_id} is missing")
+        f = store.open(file_hash)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(0)
+        return size, f
+    try:
+        blob = conn.blobopen('resumes', 'uploaded_file', resume_id, readonly=True)
+    except sqlite3.OperationalError:  # NULL or empty inline value
+        return 0, None
+    return len(blob), blob
+
+
+def _export_result(table, path, rows, missing_files, skip_missing_files, **extra):
+    result = {"success": True, "table": table, "rows": rows, "path": path, **extra}
+    if missing_files:
+        result["missing_files"] = missing_files
+        if not skip_missing_files:
+            result["success"] = False
+            result["message"] = (f"Exported {table}, but the stored files of {len(missing_files)} resume(s) "
+                                 f"are missing (ids {missing_files[:10]}); rerun with skip_missing_files=True "
+                                 f"to accept a backup without them")
+    return result
+
+
+def export_table(table, path, batch_size=DEFAULT_EXPORT_BATCH, include_files=True, checkpoint=None,
+                 skip_missing_files=False):
+    """
+    Write every row of `table` to a JSONL file.
+
+    Args:
+        table (str): One of TABLES.
+        path (str): Output file.
+        include_files (bool): For resumes, stream each uploaded file after its row.
+        checkpoint (str): Checkpoint file; an unfinished export of the same
+            table resumes from the last saved batch.
+        skip_missing_files (bool): Accept resumes whose stored file is
+            missing from the blob store; they are exported without it.
+
+    Returns:
+        dict: {"success", "table", "rows", "path"}, plus "missing_files"
+        (resume ids) if any file was missing, in which case success is
+        False unless skip_missing_files.
+    """
+    _ensure_unsharded([table])
+    state = _load_checkpoint(checkpoint)
+    key = f"export:{table}"
+    progress = state.get(key, {})
+    if progress.get("done") and progress.get("path") == path:
+        return _export_result(table, path, progress["rows"], progress.get("missing_files", []),
+                              skip_missing_files, skipped=True)
+    resuming = progress.get("path") == path and os.path.exists(path)
+    last_id = progress.get("last_id", 0) if resuming else 0
+    rows_written = progress.get("rows", 0) if resuming else 0
+    missing_files = progress.get("missing_files", []) if resuming else []
+
+    conn = get_db_connection(row_factory=None)
+    try:
+        columns = _columns(conn, table)
+        with_files = include_files and table == 'resumes'
+        select = ", ".join(columns + (['file_hash'] if with_files else []))
+        with open(path, "r+b" if resuming else "wb") as out:
+            out.seek(progress.get("offset", 0) if resuming else 0)
+            out.truncate()
+            while True:
+                # Keyset batches: short read transactions, no OFFSET scans.
+                rows = conn.execute(f'SELECT {select} FROM {table} WHERE id > ? ORDER BY id LIMIT ?',
+                                    (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    record = {c: _encode(v) for c, v in zip(columns, row)}
+                    if with_files and not _write_resume(conn, out, record, row[-1]):
+                        missing_files.append(record["id"])
+                    elif not with_files:
+                        out.write(json.dumps(record, separators=(',', ':')).encode() + b"\n")
+                last_id = rows[-1][0]
+                rows_written += len(rows)
+                out.flush()
+                state[key] = {"path": path, "last_id": last_id, "offset": out.tell(), "rows": rows_written,
+                              "missing_files": missing_files}
+                _save_checkpoint(checkpoint, state)
+        state[key] = {"path": path, "rows": rows_written, "done": True, "missing_files": missing_files}
+        _save_checkpoint(checkpoint, state)
+        return _export_result(table, path, rows_written, missing_files, skip_missing_files)
+    except (sqlite3.Error, OSError) as e:
+        return {"success": False, "table": table, "message": f"Error exporting {table}: {e}"}
+    finally:
+        conn.close()
+
+
+def _write_resume(conn, out, record, file_hash):
+    """Write a resume row and its file chunks; False if its stored file is missing."""
+    found = True
+    try:
+        size, source = _open_resume_file(conn, record["id"], file_hash)
+    except FileNotFoundError:
+        size, source, found = 0, None, False
+    record["file_chunks"] = -(-size // CHUNK_SIZE)
+    out.write(json.dumps(record, separators=(',', ':')).encode() + b"\n")
+    if source is None:
+        return found
+    with source:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            out.write(b'{"b64":"' + base64.b64encode(chunk) + b'"}\n')
+    return True
+
+
+# ==================== IMPORT ====================
+
+def _parse_block(lines):
+    """Parse a block of JSONL lines (runs in a worker process when workers > 0)."""
+    return [{k: _decode(v) for k, v in json.loads(line).items()} for line in lines]
+
+
+def _read_blocks(f, block_lines):
+    """Yield (lines, end_offset) blocks of non-empty lines."""
+    block = []
+    while True:
+        line = f.readline()
+        if not line:
+            break
+        if line.strip():
+            block.append(line)
+        if len(block) >= block_lines:
+            yield block, f.tell()
+            block = []
+    if block:
+        yield block, f.tell()
+
+
+def _parsed_blocks(f, workers):
+    """Yield (records, end_offset), parsing up to 2 * workers blocks ahead."""
+    blocks = _read_blocks(f, PARSE_BLOCK_LINES)
+    if not workers:
+        for lines, offset in blocks:
+            yield _parse_block(lines), offset
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = collections.deque()
+        for lines, offset in blocks:
+            in_flight.append((pool.submit(_parse_block, lines), offset))
+            if len(in_flight) >= 2 * workers:
+                future, end = in_flight.popleft()
+                yield future.result(), end
+        while in_flight:
+            future, end = in_flight.popleft()
+            yield future.result(), end
+
+
+class _ChunkReader:
+    """File-like view over the next `count` {"b64": ...} lines of an import file."""
+
+    def __init__(self, f, count):
+        self._f = f
+        self._remaining = count
+        self._buffer = b""
+
+    def read(self, size=-1):
+        while self._remaining and (size < 0 or len(self._buffer) < size):
+            line = self._f.readline()
+            if not line:
+                raise ValueError("Import file ends inside a resume's file chunks")
+            self._buffer += base64.b64decode(json.loads(line)["b64"])
+            self._remaining -= 1
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _resume_records(f, include_files):
+    """Yield ([record], end_offset) for resumes, storing each file as it streams past."""
+    store = get_blob_store()
+    while True:
+        line = f.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        record = _parse_block([line])[0]
+        chunks = record.pop("file_chunks", 0)
+        if chunks:
+            reader = _ChunkReader(f, chunks)
+            if include_files:
+                record.update(store.put(reader))
+            else:
+                while reader.read(CHUNK_SIZE):
+                    pass
+        yield [record], f.tell()
+
+
+def _insert_batch(conn, table, records, keep_ids):
+    """Insert records (grouped by column set) in the current transaction."""
+    groups = collections.defaultdict(list)
+    for record in records:
+        if not keep_ids:
+            record.pop("id", None)
+        columns = tuple(record)
+        groups[columns].append(tuple(record.values()))
+    inserted = 0
+    for columns, rows in groups.items():
+        sql = (f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        cursor = conn.executemany(sql, rows)
+        inserted += cursor.rowcount
+    return inserted
+
+
+def import_table(table, path, batch_size=DEFAULT_IMPORT_BATCH, workers=0, keep_ids=True,
+                 include_files=True, checkpoint=None):
+    """
+    Load a JSONL file written by export_table() into `table`.
+
+    Args:
+        workers (int): Worker processes for JSON parsing (0 parses inline).
+            Resumes are always parsed inline, as their file chunks stream.
+        keep_ids (bool): Keep exported ids (needed for references between
+            tables, and for replays after a resume to be no-ops).
+        checkpoint (str): Checkpoint file; an unfinished import of the same
+            file into the same database resumes after the last committed batch.
+
+    Returns:
+        dict: {"success", "table", "rows": lines read, "inserted"}.
+    """
+    _ensure_unsharded([table])
+    conn = get_db_connection(row_factory=None)
+    try:
+        # Progress is per destination database: the same export can be
+        # imported into several databases.
+        state = _load_checkpoint(checkpoint)
+        key = f"import:{table}:{_database_file(conn)}"
+        progress = state.get(key, {}) if state.get(key, {}).get("path") == path else {}
+        if progress.get("done"):
+            return {"success": True, "table": table, "rows": progress["rows"],
+                    "inserted": progress["inserted"], "skipped": True}
+        rows_read = progress.get("rows", 0)
+        inserted = progress.get("inserted", 0)
+
+        with open(path, "rb") as f:
+            f.seek(progress.get("offset", 0))
+            if table == 'resumes':
+                records = _resume_records(f, include_files)
+            else:
+                records = _parsed_blocks(f, workers)
+            batch, offset = [], progress.get("offset", 0)
+            for block, end in records:
+                batch.extend(block)
+                offset = end
+                if len(batch) >= batch_size:
+                    inserted += _commit_batch(conn, table, batch, keep_ids)
+                    rows_read += len(batch)
+                    batch = []
+                    state[key] = {"path": path, "offset": offset, "rows": rows_read, "inserted": inserted}
+                    _save_checkpoint(checkpoint, state)
+            if batch:
+                inserted += _commit_batch(conn, table, batch, keep_ids)
+                rows_read += len(batch)
+        state[key] = {"path": path, "rows": rows_read, "inserted": inserted, "done": True}
+        _save_checkpoint(checkpoint, state)
+        return {"success": True, "table": table, "rows": rows_read, "inserted": inserted}
+    except (sqlite3.Error, OSError, ValueError) as e:
+        return {"success": False, "table": table, "message": f"Error importing {table}: {e}"}
+    finally:
+        conn.close()
+        invalidate(f"table:{table}")
+
+
+def _commit_batch(conn, table, batch, keep_ids):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        inserted = _insert_batch(conn, table, batch, keep_ids)
+        conn.commit()
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# ==================== WHOLE DATABASE ====================
+
+def export_database(directory, tables=TABLES, include_files=True, resume=True, skip_missing_files=False):
+    """Export each table to <directory>/<table>.jsonl; returns per-table results."""
+    _ensure_unsharded(tables)
+    os.makedirs(directory, exist_ok=True)
+    checkpoint = os.path.join(directory, CHECKPOINT_NAME)
+    if not resume and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    results = {}
+    for table in tables:
+        results[table] = export_table(table, os.path.join(directory, f"{table}.jsonl"),
+                                      include_files=include_files, checkpoint=checkpoint,
+                                      skip_missing_files=skip_missing_files)
+        if not results[table]["success"]:
+            break
+    return results
+
+
+def import_database(directory, tables=TABLES, workers=0, include_files=True, resume=True):
+    """Import <directory>/<table>.jsonl for each table present; returns per-table results."""
+    _ensure_unsharded(tables)
+    checkpoint = os.path.join(directory, CHECKPOINT_NAME)
+    state = _load_checkpoint(checkpoint)
+    if not resume:
+        state = {k: v for k, v in state.items() if not k.startswith("import:")}
+        _save_checkpoint(checkpoint, state)
+    results = {}
+    for table in tables:
+        path = os.path.join(directory, f"{table}.jsonl")
+        if not os.path.exists(path):
+            continue
+        results[table] = import_table(table, path, workers=workers, include_files=include_files,
+                                      checkpoint=checkpoint)
+        if not results[table]["success"]:
+            break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming JSONL import/export of resume_analyzer.db")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("directory")
+    parser.add_argument("--tables", nargs="+", default=list(TABLES), choices=TABLES)
+    parser.add_argument("--workers", type=int, default=0, help="parse processes for import")
+    parser.add_argument("--no-files", action="store_true", help="skip resume file contents")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--skip-missing-files", action="store_true",
+                        help="export resumes whose stored file is missing, without it")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        results = export_database(args.directory, args.tables, not args.no_files, not args.restart,
+                                  args.skip_missing_files)
+    else:
+        results = import_database(args.directory, args.tables, args.workers, not args.no_files, not args.restart)
+    for table, result in results.items():
+        if result["success"]:
+            print(f"✅ {table}: {result['rows']} rows" + (" (already done)" if result.get("skipped") else "")
+                  + (f", {len(result['missing_files'])} missing file(s) skipped" if result.get("missing_files") else ""))
+        else:
+            print(f"❌ {result['message']}")
+
+
+__all__ = [
+    'TABLES',
+    'export_table',
+    'import_table',
+    'export_database',
+    'import_database'
+]
+
+
+if __name__ == "__main__":
+    main()
+
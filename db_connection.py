@@ -0,0 +1,503 @@
+# db_connection.py
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+# Default database file. Override with the RESUME_ANALYZER_DB environment
+# variable or by calling configure_pool(db_path=...) before the first query.
+DB_PATH = os.environ.get("RESUME_ANALYZER_DB", "resume_analyzer.db")
+DEFAULT_POOL_SIZE = int(os.environ.get("RESUME_ANALYZER_POOL_SIZE", "5"))
+DEFAULT_POOL_TIMEOUT = 30.0
+
+# ==================== CONNECTION PROFILES ====================
+# PRAGMAs applied to every new connection. All profiles use WAL so readers
+# never block the writer (and vice versa); they differ in how much
+# durability they trade for speed:
+#   durable   - synchronous=FULL: a committed transaction survives power loss.
+#   fast      - synchronous=NORMAL: never corrupts, but the last commits
+#               before a power cut may roll back. Bigger cache and mmap.
+#   bulk-load - synchronous=OFF and no auto-checkpoint, for one-off imports;
+#               call checkpoint("TRUNCATE") when the load is done.
+PROFILES = {
+    "durable": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,        # KiB (16 MB)
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,  # pages
+    },
+    "fast": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+    },
+    "bulk-load": {
+        "busy_timeout": 30000,
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 0,
+    },
+}
+DB_PROFILE = os.environ.get("RESUME_ANALYZER_DB_PROFILE", "durable")
+
+
+def resolve_pragmas(profile) -> dict:
+    """Return the PRAGMA dict for a profile name, or a dict passed as-is."""
+    if isinstance(profile, dict):
+        return dict(profile)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown connection profile {profile!r}; choose from {sorted(PROFILES)}")
+    return dict(PROFILES[profile])
+
+
+def apply_pragmas(conn, pragmas: dict):
+    """Run PRAGMA name = value for each entry (busy_timeout first)."""
+    # busy_timeout goes first so switching journal_mode waits for locks.
+    for name in sorted(pragmas, key=lambda n: n != "busy_timeout"):
+        value = pragmas[name]
+        # PRAGMA values cannot be bound parameters; they come from PROFILES
+        # or the caller's own dict, never from user input.
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection owned by a ConnectionPool; handed out wrapped in a ConnectionLease."""
+
+    _pool = None
+
+    def _close_for_real(self):
+        self._pool = None
+        super().close()
+
+
+class ConnectionLease:
+    """
+    One checkout of a pooled connection.
+
+    The data modules follow a `conn = get_db_connection() ... conn.close()`
+    pattern, so close() hands the connection back to its pool and every
+    other attribute is the connection's own. Each checkout gets its own
+    lease: a second close() of the same lease is a no-op, like sqlite3, even
+    if the connection has meanwhile been checked out again by someone else.
+    """
+
+    __slots__ = ("_conn", "_pool")
+
+    def __init__(self, conn, pool):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_pool", pool)
+
+    def _connection(self):
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return conn
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection(), name, value)
+
+    def __enter__(self):
+        self._connection().__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._connection().__exit__(*exc_info)
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, "_conn", None)
+        observer = _observer
+        if observer is not None:
+            observer.checked_in(conn)
+        self._pool.release(conn)
+
+
+class ConnectionPool:
+    """
+    Thread-aware pool of SQLite connections.
+
+    Each thread prefers the connection it used last (so repeated calls from
+    one request thread keep hitting the same warm page cache), falls back to
+    any idle connection, opens a new one while fewer than `size` are open,
+    and otherwise waits up to `timeout` seconds for a release.
+    """
+
+    def __init__(self, db_path: str = None, size: int = None, timeout: float = DEFAULT_POOL_TIMEOUT,
+                 profile=None, attach=None):
+        self.db_path = db_path or DB_PATH
+        self.size = size or DEFAULT_POOL_SIZE
+        self.timeout = timeout
+        self.pragmas = resolve_pragmas(profile or DB_PROFILE)
+        self.attach = dict(attach or {})  # schema name -> database file, on every connection
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "wait_time": 0.0,
+                       "discarded": 0, "timeouts": 0}
+
+    # -------------------- internals --------------------
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False,
+                               timeout=self.pragmas.get("busy_timeout", 5000) / 1000.0)
+        try:
+            apply_pragmas(conn, self.pragmas)
+            for schema, path in self.attach.items():
+                # Schema names come from code (e.g. "catalog"), not user input.
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        except sqlite3.Error:
+            conn._close_for_real()
+            raise
+        conn._pool = self
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # ignore whatever factory the last user set
+            cursor.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        """Close a connection for good. Caller must hold self._cond."""
+        self._open -= 1
+        self._stats["discarded"] += 1
+        try:
+            conn._close_for_real()
+        except sqlite3.Error:
+            pass
+
+    def _take_idle(self):
+        """Pop this thread's previous connection if idle, else any idle one."""
+        preferred = getattr(self._local, "conn", None)
+        if preferred is not None and preferred in self._idle:
+            self._idle.remove(preferred)
+            return preferred
+        return self._idle.pop()
+
+    # -------------------- public API --------------------
+
+    def acquire(self, row_factory=sqlite3.Row) -> ConnectionLease:
+        """Check out a healthy connection with the given row_factory."""
+        deadline = None
+        while True:
+            # Only bookkeeping happens under the lock; opening a connection
+            # (PRAGMAs may wait on busy_timeout) and health checks run
+            # outside it on a slot reserved for this thread.
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise sqlite3.ProgrammingError("Connection pool is closed")
+                    if self._idle:
+                        conn = self._take_idle()
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        self._stats["misses"] += 1
+                        conn = None
+                        break
+                    # Pool exhausted: wait for another thread to release.
+                    if deadline is None:
+                        deadline = time.monotonic() + self.timeout
+                        self._stats["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise sqlite3.OperationalError(
+                            f"Timed out after {self.timeout}s waiting for a pooled connection")
+                    started = time.monotonic()
+                    self._cond.wait(remaining)
+                    self._stats["wait_time"] += time.monotonic() - started
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except sqlite3.Error:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                break
+            if self._is_healthy(conn):
+                with self._cond:
+                    self._stats["hits"] += 1
+                break
+            with self._cond:
+                self._discard(conn)
+                self._cond.notify()
+
+        conn.row_factory = row_factory
+        self._local.conn = conn
+        return ConnectionLease(conn, self)
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, rolling back any open transaction."""
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            if conn in self._idle:
+                return
+            if self._closed or not healthy:
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Snapshot of pool counters (hits, misses, waits, wait_time, ...)."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update(size=self.size, open=self._open, idle=len(self._idle),
+                            in_use=self._open - len(self._idle))
+        total = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / total if total else 0.0
+        return snapshot
+
+
+# ==================== MODULE-LEVEL POOL ====================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the shared pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def configure_pool(db_path: str = None, size: int = None, timeout: float = None,
+                   profile=None) -> ConnectionPool:
+    """
+    Replace the shared pool, e.g. to point at another database file.
+
+    Args:
+        db_path (str): Database file; defaults to the current DB_PATH.
+        size (int): Maximum number of open connections.
+        timeout (float): Seconds to wait for a free connection.
+        profile (str | dict): "durable", "fast", "bulk-load" or a PRAGMA dict;
+            defaults to the current DB_PROFILE.
+
+    Returns:
+        ConnectionPool: The newly installed pool.
+    """
+    global _pool, DB_PATH, DB_PROFILE
+    with _pool_lock:
+        if db_path:
+            DB_PATH = db_path
+        if profile:
+            resolve_pragmas(profile)  # validate before swapping pools
+            DB_PROFILE = profile
+        old = _pool
+        _pool = ConnectionPool(DB_PATH, size=size,
+                               timeout=timeout if timeout is not None else DEFAULT_POOL_TIMEOUT,
+                               profile=DB_PROFILE)
+    if old is not None:
+        old.close()
+    return _pool
+
+
+_bound = threading.local()
+_observer = None
+
+
+def set_connection_observer(observer):
+    """
+    Install an object told about every pooled checkout and return, or None.
+
+    observer.checked_out(conn, wait_seconds) runs after a checkout and
+    observer.checked_in(conn) before the connection goes back to the pool
+    (see instrumentation.py). Connections bound with bind_connection() are
+    not reported.
+    """
+    global _observer
+    _observer = observer
+
+
+@contextlib.contextmanager
+def bind_connection(conn):
+    """
+    Make get_db_connection() return `conn` in this thread while active.
+
+    Used to run several data-module calls on one connection and one
+    transaction (see async_data.py); `conn` is expected to ignore close().
+    """
+    previous = getattr(_bound, "conn", None)
+    _bound.conn = conn
+    try:
+        yield conn
+    finally:
+        _bound.conn = previous
+
+
+def has_bound_connection() -> bool:
+    """True while bind_connection() is active in this thread (commits are the binder's)."""
+    return getattr(_bound, "conn", None) is not None
+
+
+_routed = threading.local()
+
+
+@contextlib.contextmanager
+def use_pool(pool):
+    """
+    Make get_db_connection() check out from `pool` in this thread while active.
+
+    `pool` is anything with acquire(row_factory): a ConnectionPool, or a
+    replicas.Replica, which resolves its current pool on each checkout.
+    Used to send reads to a replica (see replicas.py) and calls to a shard
+    (see sharding.py); bind_connection() still takes precedence.
+    """
+    previous = getattr(_routed, "pool", None)
+    _routed.pool = pool
+    try:
+        yield pool
+    finally:
+        _routed.pool = previous
+
+
+def get_db_connection(row_factory=sqlite3.Row):
+    """Check out a pooled connection; call close() on it to return it."""
+    bound = getattr(_bound, "conn", None)
+    if bound is not None:
+        bound.row_factory = row_factory
+        return bound
+    pool = getattr(_routed, "pool", None) or get_pool()
+    observer = _observer
+    if observer is None:
+        return pool.acquire(row_factory=row_factory)
+    started = time.perf_counter()
+    conn = pool.acquire(row_factory=row_factory)
+    observer.checked_out(conn._conn, time.perf_counter() - started)
+    return conn
+
+
+def pool_stats() -> dict:
+    """Hit/miss/wait statistics for the shared pool."""
+    return get_pool().stats()
+
+
+# ==================== WAL CHECKPOINTING ====================
+
+def checkpoint(mode: str = "PASSIVE") -> dict:
+    """
+    Copy WAL frames back into the database file.
+
+    Args:
+        mode (str): PASSIVE (never blocks), FULL, RESTART or TRUNCATE
+            (also resets the -wal file to zero bytes).
+
+    Returns:
+        dict: busy flag, WAL frames, and frames checkpointed.
+    """
+    mode = mode.upper()
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown checkpoint mode {mode!r}")
+    conn = get_db_connection(row_factory=None)
+    try:
+        busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        conn.close()
+    return {"busy": bool(busy), "log_frames": log_frames, "checkpointed": checkpointed}
+
+
+class Checkpointer(threading.Thread):
+    """Daemon thread that runs a PASSIVE checkpoint every `interval` seconds."""
+
+    def __init__(self, interval: float = 60.0, mode: str = "PASSIVE"):
+        super().__init__(name="sqlite-checkpointer", daemon=True)
+        self.interval = interval
+        self.mode = mode
+        self.last_result = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.last_result = checkpoint(self.mode)
+            except sqlite3.Error as e:
+                self.last_result = {"error": str(e)}
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_checkpointer = None
+
+
+def start_checkpointer(interval: float = 60.0, mode: str = "PASSIVE") -> Checkpointer:
+    """Start (or restart) the shared background checkpointer."""
+    global _checkpointer
+    stop_checkpointer()
+    _checkpointer = Checkpointer(interval, mode)
+    _checkpointer.start()
+    return _checkpointer
+
+
+def stop_checkpointer():
+    """Stop the shared background checkpointer, if running."""
+    global _checkpointer
+    if _checkpointer is not None:
+        _checkpointer.stop()
+        _checkpointer.join()
+        _checkpointer = None
+
+
+__all__ = [
+    'ConnectionPool',
+    'PooledConnection',
+    'ConnectionLease',
+    'get_pool',
+    'configure_pool',
+    'get_db_connection',
+    'bind_connection',
+    'has_bound_connection',
+    'use_pool',
+    'set_connection_observer',
+    'pool_stats',
+    'PROFILES',
+    'resolve_pragmas',
+    'apply_pragmas',
+    'checkpoint',
+    'Checkpointer',
+    'start_checkpointer',
+    'stop_checkpointer'
+]
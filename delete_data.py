@@ -1,10 +1,18 @@
 import sqlite3
 
-DB_PATH = "resume_analyzer.db"
+import db_connection
+from blob_store import release_blobs
+from query_cache import invalidate
+from instrumentation import instrument_module
+from sharding import shard_module
+
+def get_db_connection():
+    """Check out a pooled database connection."""
+    return db_connection.get_db_connection(row_factory=None)
 
 def user_exists(user_id):
     """Check if a user exists in the users table"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
     exists = cursor.fetchone() is not None
@@ -15,21 +23,25 @@ def delete_resumes_by_user_id(user_id):
     if not user_exists(user_id):
         print(f"❌ User with user_id={user_id} does not exist.")
         return
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM resumes WHERE user_id = ?", (user_id,))
+    file_hashes = [row[0] for row in cursor.execute(
+        "DELETE FROM resumes WHERE user_id = ? RETURNING file_hash", (user_id,)).fetchall()]
     conn.commit()
+    invalidate(f"resumes_of:{user_id}")
     conn.close()
+    release_blobs(file_hashes)
     print(f"✅ Deleted all resumes for user_id={user_id}")
 
 def delete_jobs_by_user_id(user_id):
     if not user_exists(user_id):
         print(f"❌ User with user_id={user_id} does not exist.")
         return
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM jobs WHERE recruiter_id = ?", (user_id,))
     conn.commit()
+    invalidate("table:jobs")
     conn.close()
     print(f"✅ Deleted all jobs for user_id={user_id}")
 
@@ -37,7 +49,7 @@ def delete_applications_by_user_id(user_id):
     if not user_exists(user_id):
         print(f"❌ User with user_id={user_id} does not exist.")
         return
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("""
         DELETE FROM applications
@@ -52,7 +64,7 @@ def delete_analysis_logs_by_user_id(user_id):
     if not user_exists(user_id):
         print(f"❌ User with user_id={user_id} does not exist.")
         return
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("""
         DELETE FROM analysis_logs
@@ -67,7 +79,7 @@ def delete_templates_by_user_id(user_id):
     if not user_exists(user_id):
         print(f"❌ User with user_id={user_id} does not exist.")
         return
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM templates WHERE uploaded_by = ?", (user_id,))
     conn.commit()
@@ -78,7 +90,7 @@ def delete_reference_by_user_id(user_id):
     if not user_exists(user_id):
         print(f"❌ User with user_id={user_id} does not exist.")
         return
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM reference WHERE uploaded_by = ?", (user_id,))
     conn.commit()
@@ -89,21 +101,108 @@ def delete_user_by_id(user_id):
     if not user_exists(user_id):
         print(f"❌ User with user_id={user_id} does not exist.")
         return
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
     conn.commit()
+    invalidate(f"user:{user_id}", "users:untagged")
     conn.close()
     print(f"✅ Deleted user with user_id={user_id}")
 
+# ==================== CASCADE PURGE ====================
+# Removes every row owned by or pointing at the given users in ONE
+# transaction on ONE connection, with foreign key enforcement switched on
+# for that connection. Child tables are deleted explicitly (and in
+# dependency order) so each table's row count can be reported, and so
+# templates/references are removed rather than SET NULL by the FK action.
+# Either everything for the batch is deleted or nothing is.
+
+PURGE_STEPS = [
+    ('applications', """
+        DELETE FROM applications
+        WHERE student_id IN (SELECT id FROM purge_ids)
+           OR job_id IN (SELECT id FROM jobs WHERE recruiter_id IN (SELECT id FROM purge_ids))
+           OR resume_id IN (SELECT id FROM resumes WHERE user_id IN (SELECT id FROM purge_ids))
+    """),
+    ('analysis_logs', """
+        DELETE FROM analysis_logs
+        WHERE resume_id IN (SELECT id FROM resumes WHERE user_id IN (SELECT id FROM purge_ids))
+           OR job_id IN (SELECT id FROM jobs WHERE recruiter_id IN (SELECT id FROM purge_ids))
+    """),
+    ('resumes', "DELETE FROM resumes WHERE user_id IN (SELECT id FROM purge_ids)"),
+    ('jobs', "DELETE FROM jobs WHERE recruiter_id IN (SELECT id FROM purge_ids)"),
+    ('templates', "DELETE FROM templates WHERE uploaded_by IN (SELECT id FROM purge_ids)"),
+    ('reference', "DELETE FROM reference WHERE uploaded_by IN (SELECT id FROM purge_ids)"),
+    ('users', "DELETE FROM users WHERE id IN (SELECT id FROM purge_ids)"),
+]
+# Stored files of the purged resumes; deleted after the commit unless shared.
+PURGED_FILES_SQL = ("SELECT DISTINCT file_hash FROM resumes "
+                    "WHERE user_id IN (SELECT id FROM purge_ids) AND file_hash IS NOT NULL")
+
+
+def purge_users(user_ids):
+    """
+    Delete all data for many users in a single transaction.
+
+    Args:
+        user_ids (iterable): IDs of the users to purge.
+
+    Returns:
+        dict: {"success", "counts": {table: rows deleted}, "purged_user_ids",
+        "missing_user_ids", "files_deleted"} or {"success": False, "message"}
+        on error, in which case nothing was deleted. Stored resume files no
+        other resume shares are removed after the commit.
+    """
+    try:
+        user_ids = sorted({int(user_id) for user_id in user_ids})
+    except (TypeError, ValueError) as e:
+        return {"success": False, "message": f"Invalid user id: {e}"}
+    conn = get_db_connection()
+    # Must be set outside a transaction; restored to the connection's own
+    # setting before it goes back to the pool.
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS purge_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM purge_ids")
+        conn.executemany(
+            "INSERT INTO purge_ids (id) SELECT id FROM users WHERE id = ?",
+            ((user_id,) for user_id in user_ids))
+        purged = [row[0] for row in conn.execute("SELECT id FROM purge_ids ORDER BY id")]
+        file_hashes = [row[0] for row in conn.execute(PURGED_FILES_SQL)]
+        counts = {}
+        for table, sql in PURGE_STEPS:
+            counts[table] = conn.execute(sql).rowcount
+        conn.execute("DELETE FROM purge_ids")
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {"success": False, "message": f"Database error purging users: {e}"}
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {int(foreign_keys)}")
+        conn.close()
+    invalidate("table:users", "table:resumes", "table:jobs")
+    missing = sorted(set(user_ids) - set(purged))
+    return {"success": True, "counts": counts, "files_deleted": release_blobs(file_hashes),
+            "purged_user_ids": purged, "missing_user_ids": missing}
+
+
 # Master function
 def delete_everything_by_user_id(user_id):
     print(f"🔎 Deleting all data related to user_id={user_id} ...")
-    delete_applications_by_user_id(user_id)
-    delete_analysis_logs_by_user_id(user_id)
-    delete_resumes_by_user_id(user_id)
-    delete_jobs_by_user_id(user_id)
-    delete_templates_by_user_id(user_id)
-    delete_reference_by_user_id(user_id)
-    delete_user_by_id(user_id)
+    result = purge_users([user_id])
+    if not result["success"]:
+        print(f"❌ {result['message']} (no data was deleted)")
+        return result
+    if not result["purged_user_ids"]:
+        print(f"❌ User with user_id={user_id} does not exist.")
+        return result
+    for table, count in result["counts"].items():
+        print(f"✅ Deleted {count} row(s) from {table} for user_id={user_id}")
     print("✅ All data deleted successfully for this user.")
+    return result
+
+
+shard_module(globals())
+instrument_module(globals())
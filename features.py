@@ -0,0 +1,319 @@
+# feature_operations.py
+#
+# Tokenizing, feature hashing and the persistent feature cache used by
+# scoring.py. Requires numpy and scipy for the array/matrix helpers.
+#
+# feature_cache holds, per resume and per job, the hashed term counts as
+# raw int32/float32 bytes plus a content hash of the source text and the
+# FEATURE_VERSION that produced them; entries of any other version are
+# treated as missing, so bumping it recomputes everything. Triggers
+# created by migration 5 delete an entry whenever its resume or job text
+# is updated or the row is deleted; the next load recomputes it.
+#
+# feature_stats keeps the document frequencies over every resume, so IDF
+# weights are the same whether one resume or all of them are scored. They
+# are recomputed only after a resume is added or a cache entry changes.
+#
+# Resume features are read from the catalog only, so the resume loaders
+# refuse to run while sharding (sharding.py) is on.
+
+import hashlib
+import json
+import re
+import zlib
+from collections import Counter
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # only needed for scoring
+    np = None
+    sparse = None
+
+from db_connection import get_db_connection
+from sharding import ensure_unsharded
+
+N_FEATURES = 2 ** 18
+# Bump when tokenizing or hashing changes so cached entries are recomputed.
+FEATURE_VERSION = 1
+
+# Keeps tech tokens such as c++, c# and node.js intact; the lookbehind
+# drops a trailing dot so sentence ends don't create separate tokens.
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*(?<!\.)")
+_hash_cache = {}
+
+
+# ==================== TOKENIZING & HASHING ====================
+
+def tokenize(text):
+    """Lower-case word tokens."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def split_skills(required_skills):
+    """Split a comma/semicolon separated skills string into normalized skills."""
+    if not required_skills:
+        return []
+    return [" ".join(tokenize(skill)) for skill in re.split(r"[,;\n]", required_skills) if skill.strip()]
+
+
+def feature_index(token):
+    """Stable hash of a token into [0, N_FEATURES); crc32 is stable across runs."""
+    index = _hash_cache.get(token)
+    if index is None:
+        index = zlib.crc32(token.encode("utf-8")) % N_FEATURES
+        if len(_hash_cache) < 1_000_000:
+            _hash_cache[token] = index
+    return index
+
+
+def term_counts(text):
+    """
+    Return (feature indices, counts) for a document as two numpy arrays.
+
+    Tokens are counted before hashing, so each distinct token is hashed
+    once per document. Hash collisions may repeat an index; the matrix
+    builder sums those.
+    """
+    counts = Counter(tokenize(text))
+    # dict.get via map() stays in C for tokens already hashed; only new
+    # tokens go through feature_index().
+    indices = list(map(_hash_cache.get, counts))
+    if None in indices:
+        indices = [feature_index(t) if i is None else i for t, i in zip(counts, indices)]
+    return (np.array(indices, dtype=np.int32),
+            np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+
+
+def skill_features(required_skills):
+    """Feature indices of every token in the required skills, deduplicated."""
+    tokens = [token for skill in split_skills(required_skills) for token in skill.split()]
+    return np.unique(np.fromiter((feature_index(t) for t in tokens), dtype=np.int32))
+
+
+def build_counts_matrix(features):
+    """Stack per-document (indices, counts) pairs into a CSR matrix of raw counts."""
+    indptr = np.zeros(len(features) + 1, dtype=np.int64)
+    for i, (indices, _) in enumerate(features):
+        indptr[i + 1] = indptr[i] + indices.size
+    indices = np.concatenate([f[0] for f in features]) if features else np.zeros(0, dtype=np.int32)
+    data = np.concatenate([f[1] for f in features]) if features else np.zeros(0, dtype=np.float32)
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(features), N_FEATURES))
+    matrix.sum_duplicates()
+    return matrix
+
+
+# ==================== FEATURE CACHE ====================
+
+def content_hash(*parts):
+    """SHA-1 over the feature version and the source text fields."""
+    digest = hashlib.sha1(f"v{FEATURE_VERSION}".encode())
+    for part in parts:
+        digest.update(b"\x00")
+        digest.update((part or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _job_text(title, description, required_skills):
+    return " ".join(filter(None, (title, required_skills, description)))
+
+
+def _from_cache(indices_blob, counts_blob):
+    return (np.frombuffer(indices_blob, dtype=np.int32),
+            np.frombuffer(counts_blob, dtype=np.float32))
+
+
+def _save_entries(conn, entries):
+    """Upsert computed cache rows and commit."""
+    if entries:
+        conn.executemany('''
+        INSERT OR REPLACE INTO feature_cache
+            (entity, entity_id, content_hash, indices, counts, skills, skill_indices, feature_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [entry + (FEATURE_VERSION,) for entry in entries])
+        conn.commit()
+
+
+def _id_filter(column, ids):
+    if ids is None:
+        return "", ()
+    return f" AND {column} IN ({','.join('?' * len(ids))})", tuple(ids)
+
+
+def load_resume_features(conn, resume_ids=None, verify=False):
+    """
+    Return (ids array, list of (indices, counts)) for resumes, ordered by id.
+
+    Cached entries are used as-is (triggers keep them current); missing ones
+    are computed from extracted_text and written back. With verify=True the
+    text is re-read and hashed for every row, catching edits made without
+    the triggers (e.g. by another tool writing the file directly).
+    """
+    id_filter, params = _id_filter("r.id", resume_ids)
+    cursor = conn.execute(f'''
+    SELECT r.id, fc.content_hash, fc.indices, fc.counts,
+           CASE WHEN fc.entity_id IS NULL OR ? THEN r.extracted_text END
+    FROM resumes r
+    LEFT JOIN feature_cache fc
+        ON fc.entity = 'resume' AND fc.entity_id = r.id AND fc.feature_version = ?
+    WHERE 1 = 1{id_filter}
+    ORDER BY r.id
+    ''', (int(verify), FEATURE_VERSION) + params)
+    ids, features, pending = [], [], []
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        for resume_id, cached_hash, indices_blob, counts_blob, text in rows:
+            ids.append(resume_id)
+            if cached_hash is not None and (not verify or cached_hash == content_hash(text)):
+                features.append(_from_cache(indices_blob, counts_blob))
+                continue
+            indices, counts = term_counts(text)
+            features.append((indices, counts))
+            pending.append(('resume', resume_id, content_hash(text),
+                            indices.tobytes(), counts.tobytes(), None, None))
+    _save_entries(conn, pending)
+    return np.array(ids, dtype=np.int64), features
+
+
+def load_job_features(conn, job_ids=None, open_only=True, verify=False):
+    """
+    Return (ids array, list of (indices, counts), list of skill index arrays) for jobs.
+
+    Uses and fills the cache the same way as load_resume_features().
+    """
+    id_filter, params = _id_filter("j.id", job_ids)
+    if open_only:
+        id_filter += " AND j.status = 'open'"
+    cursor = conn.execute(f'''
+    SELECT j.id, fc.content_hash, fc.indices, fc.counts, fc.skill_indices,
+           j.title, j.job_description, j.required_skills
+    FROM jobs j
+    LEFT JOIN feature_cache fc
+        ON fc.entity = 'job' AND fc.entity_id = j.id AND fc.feature_version = ?
+    WHERE 1 = 1{id_filter}
+    ORDER BY j.id
+    ''', (FEATURE_VERSION,) + params)
+    ids, features, skills, pending = [], [], [], []
+    for job_id, cached_hash, indices_blob, counts_blob, skills_blob, title, description, required in cursor:
+        ids.append(job_id)
+        if cached_hash is not None and (not verify or cached_hash == content_hash(title, description, required)):
+            features.append(_from_cache(indices_blob, counts_blob))
+            skills.append(np.frombuffer(skills_blob, dtype=np.int32))
+            continue
+        indices, counts = term_counts(_job_text(title, description, required))
+        skill_indices = skill_features(required)
+        features.append((indices, counts))
+        skills.append(skill_indices)
+        pending.append(('job', job_id, content_hash(title, description, required),
+                        indices.tobytes(), counts.tobytes(),
+                        json.dumps(split_skills(required)), skill_indices.tobytes()))
+    _save_entries(conn, pending)
+    return np.array(ids, dtype=np.int64), features, skills
+
+
+def load_document_frequencies(conn, counts=None):
+    """
+    Return (number of documents, df array) over the features of every resume.
+
+    Served from feature_stats while no resume or cache entry has changed
+    since they were computed; otherwise every resume's features are loaded
+    (filling the cache) and the result is stored. A full scoring run passes
+    its raw-count matrix of all resumes as `counts` to skip that reload.
+    """
+    generation, stats_generation, version, n_docs, indices_blob, counts_blob = conn.execute(
+        "SELECT generation, stats_generation, feature_version, n_docs, df_indices, df_counts "
+        "FROM feature_stats WHERE entity = 'resume'").fetchone()
+    df = np.zeros(N_FEATURES, dtype=np.float32)
+    if counts is None and stats_generation == generation and version == FEATURE_VERSION:
+        indices, values = _from_cache(indices_blob, counts_blob)
+        df[indices] = values
+        return n_docs, df
+    if counts is None:
+        _, features = load_resume_features(conn)
+        counts = build_counts_matrix(features)
+    df += np.bincount(counts.indices, minlength=N_FEATURES)
+    n_docs = counts.shape[0]
+    indices = np.flatnonzero(df).astype(np.int32)
+    # A change committed after this read makes the UPDATE a no-op.
+    generation = conn.execute("SELECT generation FROM feature_stats WHERE entity = 'resume'").fetchone()[0]
+    conn.execute('''
+    UPDATE feature_stats
+    SET stats_generation = generation, feature_version = ?, n_docs = ?, df_indices = ?, df_counts = ?
+    WHERE entity = 'resume' AND generation = ?
+    ''', (FEATURE_VERSION, n_docs, indices.tobytes(), df[indices].tobytes(), generation))
+    conn.commit()
+    return n_docs, df
+
+
+def refresh_feature_cache(verify=False):
+    """Compute every missing (or, with verify=True, stale) cache entry now."""
+    if np is None:
+        return {"success": False, "message": "The feature cache requires numpy and scipy"}
+    ensure_unsharded("refresh_feature_cache")
+    conn = get_db_connection(row_factory=None)
+    try:
+        resume_ids, _ = load_resume_features(conn, verify=verify)
+        job_ids, _, _ = load_job_features(conn, open_only=False, verify=verify)
+        return {"success": True, "resumes": int(resume_ids.size), "jobs": int(job_ids.size)}
+    finally:
+        conn.close()
+
+
+def load_feature_matrix(entity, ids=None):
+    """
+    Load cached features for 'resume' or 'job' as one CSR matrix.
+
+    Returns:
+        tuple: (ids array, scipy CSR matrix of raw term counts). The matrix's
+        data/indices are single contiguous arrays, ready for batch work.
+    """
+    if entity == 'resume':
+        ensure_unsharded("load_feature_matrix('resume')")
+    conn = get_db_connection(row_factory=None)
+    try:
+        if entity == 'resume':
+            row_ids, features = load_resume_features(conn, ids)
+        elif entity == 'job':
+            row_ids, features, _ = load_job_features(conn, ids, open_only=False)
+        else:
+            raise ValueError(f"Unknown entity {entity!r}; expected 'resume' or 'job'")
+    finally:
+        conn.close()
+    return row_ids, build_counts_matrix(features)
+
+
+def clear_feature_cache(entity=None):
+    """Drop cached features (all, or only 'resume' / 'job' entries)."""
+    if entity != 'job':
+        ensure_unsharded("clear_feature_cache")
+    conn = get_db_connection(row_factory=None)
+    try:
+        if entity is None:
+            cursor = conn.execute("DELETE FROM feature_cache")
+        else:
+            cursor = conn.execute("DELETE FROM feature_cache WHERE entity = ?", (entity,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+__all__ = [
+    'N_FEATURES',
+    'tokenize',
+    'split_skills',
+    'term_counts',
+    'skill_features',
+    'build_counts_matrix',
+    'content_hash',
+    'load_resume_features',
+    'load_job_features',
+    'load_document_frequencies',
+    'refresh_feature_cache',
+    'load_feature_matrix',
+    'clear_feature_cache'
+]
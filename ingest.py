@@ -0,0 +1,498 @@
+# ingest_operations.py
+#
+# Parallel ingestion of uploaded resume files: text extraction in a process
+# pool, one writer thread batch-inserting into resumes.
+#
+#     result = ingest_directory("uploads/", user_id=42)
+#     result = ingest_files([(42, "cv.pdf", pdf_bytes), (43, "cv.docx", "/tmp/cv.docx")])
+#
+#     python ingest.py uploads/ --user-id 42 --workers 8
+#
+# Pipeline:
+#     files -> [process pool: extract, normalize, skills, ats_score]
+#           -> bounded queue -> [writer thread: insert_resumes_bulk per batch]
+#
+# Extraction is CPU-bound, so it runs in worker processes (one per core by
+# default); inserts go through one writer so SQLite sees a single writer
+# and large transactions. Backpressure: at most `max_pending` files are
+# being extracted at once, and the queue to the writer holds at most
+# `queue_size` results, so a slow disk or a busy database stops new files
+# from being read instead of buffering them in memory.
+#
+# A file that cannot be read or parsed is reported in "errors" and the rest
+# carry on. If a worker process dies (e.g. a parser crash), the pool is
+# restarted and the files it had in flight are retried once. A file that
+# hangs its parser still holds one worker until it returns.
+#
+# Workers are started with "spawn", so scripts using this must guard their
+# entry point with `if __name__ == "__main__":`.
+#
+# Text is extracted from .txt/.md (UTF-8, falling back to cp1252), .docx
+# (standard library) and .pdf (needs pypdf). ats_score is a placeholder
+# heuristic (sections, contact details, skills, length) until a real ATS
+# model is wired in; scoring.py computes the job-specific scores.
+
+import concurrent.futures
+import io
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # only needed for PDF files
+    PdfReader = None
+
+import insertion
+from db_connection import get_db_connection
+from features import tokenize, split_skills
+
+SUPPORTED_EXTENSIONS = ('.txt', '.md', '.docx', '.pdf')
+MAX_FILE_BYTES = int(os.environ.get("RESUME_ANALYZER_INGEST_MAX_MB", 20)) * 1024 * 1024
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_QUEUE_SIZE = 1000
+WRITER_FLUSH_SECONDS = 0.5  # insert a partial batch after this long without new results
+MAX_ATTEMPTS = 2
+
+# Skills looked for in every resume, in addition to those required by jobs.
+DEFAULT_SKILLS = (
+    "python", "java", "javascript", "typescript", "c++", "c#", "go", "rust", "sql", "html", "css",
+    "react", "angular", "node.js", "django", "flask", "spring", "docker", "kubernetes", "aws",
+    "azure", "gcp", "linux", "git", "machine learning", "deep learning", "data analysis",
+    "pandas", "numpy", "tensorflow", "pytorch", "excel", "tableau", "power bi", "agile",
+    "scrum", "project management", "communication", "leadership",
+)
+SECTION_HEADINGS = ("experience", "education", "skills", "projects", "summary", "certifications")
+
+# Presence checks only; starting on a literal keeps the email scan fast on long texts.
+_EMAIL_RE = re.compile(r"@[\w-]+\.\w")
+_PHONE_RE = re.compile(r"\d[\d ()-]{7,}\d")
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+_SPACES_RE = re.compile(r"[ \t]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+# ==================== EXTRACTION (worker side) ====================
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+
+def _docx_text(data: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{_WORD_NS}t":
+                parts.append(node.text or "")
+            elif node.tag == f"{_WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag in (f"{_WORD_NS}br", f"{_WORD_NS}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _pdf_text(data: bytes) -> str:
+    if PdfReader is None:
+        raise RuntimeError("pypdf is required to extract text from PDF files")
+    reader = PdfReader(io.BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_text(filename: str, data: bytes) -> str:
+    """
+    Extract the raw text of an uploaded file.
+
+    Args:
+        filename (str): Used for its extension.
+        data (bytes): File contents.
+
+    Returns:
+        str: The text, not yet normalized.
+
+    Raises:
+        ValueError: The file type is not supported.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.txt', '.md'):
+        return _decode(data)
+    if extension == '.docx':
+        return _docx_text(data)
+    if extension == '.pdf':
+        return _pdf_text(data)
+    raise ValueError(f"Unsupported file type: {extension or filename}")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize, drop control characters and collapse runs of whitespace."""
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = _CONTROL_RE.sub("", text)
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _skill_index(skills):
+    """Normalized skills, plus the multi-word ones as token tuples keyed by first word."""
+    vocabulary = {" ".join(tokenize(skill)) for skill in skills} - {""}
+    phrases = {}
+    for skill in vocabulary:
+        words = tuple(skill.split(" "))
+        if len(words) > 1:
+            phrases.setdefault(words[0], []).append(words)
+    return vocabulary, phrases
+
+
+def find_skills(text: str, vocabulary) -> list:
+    """
+    Skills from `vocabulary` mentioned in the text.
+
+    Args:
+        text (str): Resume text.
+        vocabulary (iterable): Skill names, single or multi-word.
+
+    Returns:
+        list: Sorted normalized skill names found.
+    """
+    vocabulary, phrases = vocabulary if isinstance(vocabulary, tuple) else _skill_index(vocabulary)
+    tokens = tokenize(text)
+    found = vocabulary.intersection(tokens)
+    for start, token in enumerate(tokens):
+        for words in phrases.get(token, ()):
+            if tuple(tokens[start:start + len(words)]) == words:
+                found.add(" ".join(words))
+    return sorted(found)
+
+
+def ats_placeholder(text: str, skills) -> float:
+    """
+    Placeholder ATS score (0-100) until a real model is wired in.
+
+    Points for standard section headings (30), contact details (15),
+    recognised skills (40, capped at 10 skills) and a length of 200-1000
+    words (15).
+    """
+    lower = text.lower()
+    sections = sum(1 for heading in SECTION_HEADINGS if heading in lower)
+    contact = bool(_EMAIL_RE.search(text)) + bool(_PHONE_RE.search(text))
+    words = len(text.split())
+    length = 1.0 if 200 <= words <= 1000 else min(words / 200, 1000 / max(words, 1))
+    score = 30 * sections / len(SECTION_HEADINGS) + 7.5 * contact + 40 * min(len(skills), 10) / 10 + 15 * length
+    return round(score, 2)
+
+
+_vocabulary = None
+
+
+def _init_worker(vocabulary):
+    global _vocabulary
+    _vocabulary = _skill_index(vocabulary)
+
+
+def _process(index, filename, source):
+    """Worker: read (if a path), extract and analyse one file. Never raises."""
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+        else:
+            if os.path.getsize(source) > MAX_FILE_BYTES:
+                raise ValueError(f"File is larger than {MAX_FILE_BYTES // (1024 * 1024)} MB")
+            with open(source, "rb") as f:
+                data = f.read()
+        if len(data) > MAX_FILE_BYTES:
+            raise ValueError(f"File is larger than {MAX_FILE_BYTES // (1024 * 1024)} MB")
+        text = normalize_text(extract_text(filename, data))
+        skills = find_skills(text, _vocabulary)
+        return {"index": index, "text": text, "skills": skills, "ats_score": ats_placeholder(text, skills)}
+    except Exception as e:  # any parser error: report the file, keep the worker
+        return {"index": index, "message": f"{type(e).__name__}: {e}"}
+
+
+# ==================== PIPELINE (parent side) ====================
+
+def load_skill_vocabulary() -> list:
+    """DEFAULT_SKILLS plus every skill required by a job."""
+    conn = get_db_connection(row_factory=None)
+    try:
+        rows = conn.execute("SELECT required_skills FROM jobs WHERE required_skills IS NOT NULL").fetchall()
+    finally:
+        conn.close()
+    skills = set(DEFAULT_SKILLS)
+    for (required_skills,) in rows:
+        skills.update(split_skills(required_skills))
+    return sorted(skills)
+
+
+def _tasks(files, user_id):
+    """Yield (index, user_id, filename, source) for each input file."""
+    for index, item in enumerate(files):
+        if isinstance(item, dict):
+            owner, filename, source = item.get("user_id", user_id), item["filename"], item["file_data"]
+        elif isinstance(item, (tuple, list)):
+            owner, filename, source = item
+        else:
+            source = os.fspath(item)
+            owner, filename = user_id, os.path.basename(source)
+        if callable(owner):
+            owner = owner(source)
+        yield index, owner, filename, source
+
+
+class _Writer(threading.Thread):
+    """Drains the result queue into insert_resumes_bulk, one batch at a time."""
+
+    _DONE = object()
+
+    def __init__(self, batch_size, queue_size, on_result):
+        super().__init__(name="resume-ingest-writer", daemon=True)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.on_result = on_result
+        self.resume_ids = {}
+        self.errors = []
+
+    def run(self):
+        batch, done = [], False
+        while not done:
+            try:
+                item = self.queue.get(timeout=WRITER_FLUSH_SECONDS if batch else None)
+            except queue.Empty:
+                item = None
+            if item is self._DONE:
+                done = True
+            elif item is not None:
+                batch.append(item)
+            if batch and (done or item is None or len(batch) >= self.batch_size):
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # Keep draining: the producer would block on a dead writer.
+                    self._fail_unrecorded(batch, f"{type(e).__name__}: {e}")
+                batch = []
+
+    def _fail_unrecorded(self, batch, message):
+        recorded = set(self.resume_ids) | {error["index"] for error in self.errors}
+        for task, _ in batch:
+            if task[0] not in recorded:
+                self.fail(task, message)
+
+    def _write(self, batch):
+        files, records, written = [], [], []
+        for task, result in batch:
+            index, user_id, filename, source = task
+            try:
+                data = source if isinstance(source, (bytes, bytearray, memoryview)) else open(source, "rb")
+            except OSError as e:
+                self.fail(task, f"{type(e).__name__}: {e}")
+                continue
+            if data is not source:
+                files.append(data)
+            records.append((user_id, filename, data, result["text"], result["ats_score"]))
+            written.append((task, result))
+        try:
+            outcome = insertion.insert_resumes_bulk(records, batch_size=len(records) or 1) if records else None
+        except Exception as e:
+            outcome = {"resume_ids": [None] * len(records),
+                       "errors": [{"index": i, "message": str(e)} for i in range(len(records))]}
+        finally:
+            for f in files:
+                f.close()
+        if outcome is None:
+            return
+        messages = {error["index"]: error["message"] for error in outcome["errors"]}
+        for position, ((task, result), resume_id) in enumerate(zip(written, outcome["resume_ids"])):
+            if position in messages:
+                self.fail(task, messages[position])
+                continue
+            self.resume_ids[task[0]] = resume_id
+            if self.on_result is not None:
+                try:
+                    self.on_result({"index": task[0], "user_id": task[1], "filename": task[2],
+                                    "resume_id": resume_id, "ats_score": result["ats_score"],
+                                    "skills": result["skills"]})
+                except Exception as e:  # the resume is stored; report the callback's failure
+                    self.fail(task, f"on_result failed: {type(e).__name__}: {e}")
+
+    def fail(self, task, message):
+        self.errors.append({"index": task[0], "filename": task[2], "message": message})
+
+    def put(self, item):
+        """Queue an item, waiting while the writer is behind; raises if the writer has stopped."""
+        while True:
+            if not self.is_alive():
+                raise RuntimeError("The resume ingest writer thread stopped unexpectedly")
+            try:
+                self.queue.put(item, timeout=WRITER_FLUSH_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self):
+        try:
+            self.put(self._DONE)
+        except RuntimeError:
+            pass  # already stopped
+        self.join()
+
+
+def ingest_files(files, user_id=None, workers=None, batch_size=DEFAULT_BATCH_SIZE, max_pending=None,
+                 queue_size=DEFAULT_QUEUE_SIZE, vocabulary=None, on_result=None) -> dict:
+    """
+    Extract, analyse and insert many resume files in parallel.
+
+    Args:
+        files (iterable): File paths, (user_id, filename, data) tuples or
+            dicts with user_id, filename and file_data; data may be bytes
+            or a path. Consumed lazily, so a generator works.
+        user_id (int or callable): Owner of files given as bare paths, or
+            a function mapping the path to the owner.
+        workers (int): Extraction processes (default: one per core).
+        batch_size (int): Resumes per insert transaction.
+        max_pending (int): Files being extracted at once (default: 4 per worker).
+        queue_size (int): Extracted files waiting for the writer.
+        vocabulary (iterable): Skills to look for (default: load_skill_vocabulary()).
+        on_result (callable): Called from the writer thread with a dict
+            (index, user_id, filename, resume_id, ats_score, skills) for
+            each inserted resume.
+
+    Returns:
+        dict: {"success", "inserted", "failed", "resume_ids" (in input
+        order, None where a file failed), "errors" (index, filename,
+        message), "seconds"}.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    vocabulary = sorted(vocabulary) if vocabulary is not None else load_skill_vocabulary()
+    context = multiprocessing.get_context("spawn")
+
+    def new_pool():
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(vocabulary,))
+
+    writer = _Writer(batch_size, queue_size, on_result)
+    writer.start()
+    pool = new_pool()
+    pending = {}  # future -> (task, attempt)
+    retries = []
+    tasks = _tasks(files, user_id)
+    count = 0
+    try:
+        while True:
+            while len(pending) < max_pending:
+                if retries:
+                    task, attempt = retries.pop()
+                else:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    attempt, count = 1, count + 1
+                try:
+                    future = pool.submit(_process, task[0], task[2], task[3])
+                except BrokenProcessPool:
+                    retries.append((task, attempt))
+                    break
+                pending[future] = (task, attempt)
+            if not pending and not retries:
+                break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                task, attempt = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if attempt < MAX_ATTEMPTS:
+                        retries.append((task, attempt + 1))
+                    else:
+                        writer.fail(task, "Worker process crashed while extracting this file")
+                    continue
+                if "message" in result:
+                    writer.fail(task, result["message"])
+                else:
+                    writer.put((task, result))  # blocks while the writer is behind
+            if broken or (retries and not pending):
+                # A dead worker fails every future of the pool; start a new one.
+                for future, (task, attempt) in pending.items():
+                    retries.append((task, attempt))
+                pending.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        writer.finish()
+
+    errors = sorted(writer.errors, key=lambda error: error["index"])
+    resume_ids = [writer.resume_ids.get(index) for index in range(count)]
+    inserted = len(writer.resume_ids)
+    seconds = time.perf_counter() - started
+    print(f"✅ Ingested {inserted} of {count} resume file(s) in {seconds:.1f}s" if not errors else
+          f"❌ Ingested {inserted} of {count} resume file(s) in {seconds:.1f}s; {len(errors)} failed")
+    return {"success": not errors, "inserted": inserted, "failed": len(errors),
+            "resume_ids": resume_ids, "errors": errors, "seconds": seconds}
+
+
+def iter_directory(directory, recursive=True, extensions=SUPPORTED_EXTENSIONS):
+    """Yield the paths of supported files under a directory, in sorted order."""
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            if name.lower().endswith(extensions) and not name.startswith("."):
+                yield os.path.join(root, name)
+        if not recursive:
+            break
+
+
+def ingest_directory(directory, user_id, recursive=True, **options) -> dict:
+    """
+    Ingest every supported file under a directory (see ingest_files).
+
+    Args:
+        directory (str): Folder of uploaded files.
+        user_id (int or callable): Owner of the files, or a function
+            mapping each path to its owner (e.g. from a per-user subfolder).
+    """
+    return ingest_files(iter_directory(directory, recursive), user_id=user_id, **options)
+
+
+__all__ = [
+    'extract_text',
+    'normalize_text',
+    'find_skills',
+    'ats_placeholder',
+    'load_skill_vocabulary',
+    'ingest_files',
+    'iter_directory',
+    'ingest_directory',
+    'SUPPORTED_EXTENSIONS'
+]
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Ingest a directory of resume files.")
+    parser.add_argument("directory")
+    parser.add_argument("--user-id", type=int, required=True, help="owner of the uploaded files")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: cores)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--no-recursive", action="store_true")
+    args = parser.parse_args()
+    result = ingest_directory(args.directory, args.user_id, recursive=not args.no_recursive,
+                              workers=args.workers, batch_size=args.batch_size)
+    print(json.dumps({key: value for key, value in result.items() if key != "resume_ids"}, indent=2))
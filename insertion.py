@@ -1,32 +1,46 @@
 # insert_operations.py
 
+import io
+import os
 import sqlite3
-import hashlib
+import itertools
+import json
 
-# Database connection function (Necessary for all operations)
-def get_db_connection():
-    """Create and return a database connection"""
-    conn = sqlite3.connect('resume_analyzer.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+# Database connection function (Necessary for all operations).
+# Connections come from the shared pool; conn.close() returns them to it.
+from db_connection import get_db_connection
+from blob_store import CHUNK_SIZE, get_blob_store
+from query_cache import invalidate
+from instrumentation import instrument_module
+from sharding import shard_module
+from passwords import hash_password, hash_passwords
 
 # ==================== INSERT OPERATIONS ====================
 
 def insert_user(username, email, password, role, full_name):
     """Insert a new user into users table"""
+    # Hash the password (salted scrypt/PBKDF2, see passwords.py) before
+    # taking a connection: the KDF is slow and must not run inside a
+    # write transaction.
+    try:
+        password_hash = hash_password(password)
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}"}
+    return insert_user_hashed(username, email, password_hash, role, full_name)
+
+def insert_user_hashed(username, email, password_hash, role, full_name):
+    """Insert a new user whose password is already hashed (see passwords.hash_password)"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Hash the password
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        
         cursor.execute('''
         INSERT INTO users (username, email, password_hash, role, full_name)
         VALUES (?, ?, ?, ?, ?)
         ''', (username, email, password_hash, role, full_name))
         
         conn.commit()
+        invalidate(f"email:{email}")
         user_id = cursor.lastrowid
         return {"success": True, "user_id": user_id, "message": "User registered successfully!"}
     except sqlite3.IntegrityError:
@@ -37,17 +51,21 @@ def insert_user(username, email, password, role, full_name):
         conn.close()
 
 def insert_resume(user_id, filename, file_data, extracted_text=""):
-    """Insert a resume into resumes table"""
+    """Insert a resume; file_data (bytes or binary file object) goes to the blob store"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        # The file itself lives in the content-addressed blob store; the row
+        # only records its SHA-256, size and location.
+        stored = get_blob_store().put(file_data)
         cursor.execute('''
-        INSERT INTO resumes (user_id, filename, uploaded_file, extracted_text)
-        VALUES (?, ?, ?, ?)
-        ''', (user_id, filename, file_data, extracted_text))
+        INSERT INTO resumes (user_id, filename, file_path, file_hash, file_size, extracted_text)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, filename, stored["file_path"], stored["file_hash"], stored["file_size"], extracted_text))
         
         conn.commit()
+        invalidate(f"resumes_of:{user_id}")
         resume_id = cursor.lastrowid
         return {"success": True, "resume_id": resume_id, "message": "Resume uploaded successfully!"}
     except Exception as e:
@@ -55,6 +73,58 @@ def insert_resume(user_id, filename, file_data, extracted_text=""):
     finally:
         conn.close()
 
+def _sized_stream(file_data, size=None):
+    """Return (binary stream, byte count) for bytes or a seekable file object."""
+    if isinstance(file_data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(file_data), len(file_data)
+    if size is None:
+        if not file_data.seekable():
+            raise ValueError("size is required for non-seekable streams")
+        start = file_data.tell()
+        size = file_data.seek(0, os.SEEK_END) - start
+        file_data.seek(start)
+    return file_data, size
+
+def insert_resume_inline(user_id, filename, file_data, extracted_text="", size=None):
+    """
+    Insert a resume keeping the file inside the database (resumes.uploaded_file).
+
+    The row is created with a zeroblob of the file's size and the bytes are
+    then streamed in CHUNK_SIZE pieces through Connection.blobopen, so the
+    whole file is never bound as one parameter. file_data may be bytes or a
+    binary file object (size is needed if it is not seekable). Read it back
+    with select_data.open_resume_file(). Files go to the blob store with
+    insert_resume() unless a single-file database is wanted.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        stream, size = _sized_stream(file_data, size)
+        cursor.execute('''
+        INSERT INTO resumes (user_id, filename, uploaded_file, file_size, extracted_text)
+        VALUES (?, ?, zeroblob(?), ?, ?)
+        ''', (user_id, filename, size, size, extracted_text))
+        resume_id = cursor.lastrowid
+        
+        written = 0
+        with conn.blobopen('resumes', 'uploaded_file', resume_id) as blob:
+            while written < size:
+                chunk = stream.read(min(CHUNK_SIZE, size - written))
+                if not chunk:
+                    raise ValueError(f"stream ended after {written} of {size} bytes")
+                blob.write(chunk)
+                written += len(chunk)
+        
+        conn.commit()
+        invalidate(f"resumes_of:{user_id}")
+        return {"success": True, "resume_id": resume_id, "message": "Resume uploaded successfully!"}
+    except Exception as e:
+        conn.rollback()
+        return {"success": False, "message": f"Error uploading resume: {str(e)}"}
+    finally:
+        conn.close()
+
 def insert_job(recruiter_id, title, job_description, required_skills, min_experience=0):
     """Insert a job posting into jobs table"""
     conn = get_db_connection()
@@ -67,6 +137,7 @@ def insert_job(recruiter_id, title, job_description, required_skills, min_experi
         ''', (recruiter_id, title, job_description, required_skills, min_experience))
         
         conn.commit()
+        invalidate("table:jobs")
         job_id = cursor.lastrowid
         return {"success": True, "job_id": job_id, "message": "Job created successfully!"}
     except Exception as e:
@@ -135,12 +206,233 @@ def insert_new_reference(title: str, file_path: str, company: str, score: float,
         conn.close()
 
 
+# ==================== BULK INSERT OPERATIONS ====================
+# Each bulk function accepts any iterable (including generators) of records,
+# given either as dicts keyed like the single-row function's parameters or
+# as tuples in the same positional order. Rows are written with executemany
+# in chunks of `batch_size`, one transaction per chunk. If a chunk hits a
+# constraint error it is rolled back and replayed row by row in a fresh
+# transaction so only the offending rows fail.
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _normalize_record(record, fields, defaults):
+    """Turn a dict or tuple record into a tuple ordered like `fields`."""
+    if isinstance(record, dict):
+        return tuple(record[f] if f in record else defaults[f] for f in fields)
+    values = tuple(record)
+    if len(values) < len(fields):
+        values += tuple(defaults[f] for f in fields[len(values):])
+    return values
+
+
+def _next_sequence(cursor, table):
+    row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def _insert_chunk(conn, sql, table, chunk):
+    """
+    Insert one chunk in a single transaction.
+
+    Returns:
+        list: (row_id or None, error message or None) for each row in the chunk.
+    """
+    cursor = conn.cursor()
+    # IMMEDIATE takes the write lock up front, so AUTOINCREMENT ids assigned
+    # by executemany are consecutive and can be derived from sqlite_sequence.
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        before = _next_sequence(cursor, table)
+        try:
+            cursor.executemany(sql, chunk)
+            after = _next_sequence(cursor, table)
+            if after - before == len(chunk):
+                outcomes = [(before + i + 1, None) for i in range(len(chunk))]
+            else:
+                outcomes = [(None, None)] * len(chunk)
+        except sqlite3.IntegrityError:
+            # Undo the partial executemany by restarting the chunk's own
+            # transaction (cheaper than holding a SAVEPOINT open: inside
+            # one, statements that fire triggers pay for a statement journal).
+            conn.rollback()
+            cursor.execute("BEGIN IMMEDIATE")
+            outcomes = []
+            for params in chunk:
+                try:
+                    cursor.execute(sql, params)
+                    outcomes.append((cursor.lastrowid, None))
+                except sqlite3.IntegrityError as e:
+                    outcomes.append((None, str(e)))
+        conn.commit()
+        return outcomes
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _bulk_insert(table, fields, defaults, records, batch_size, id_key, prepare=None, columns=None,
+                 prepare_chunk=None):
+    """
+    Shared driver for the bulk insert functions below.
+
+    `fields` describes the incoming records; `columns` (default: fields)
+    names the table columns written, for when `prepare` reshapes a row.
+    `prepare_chunk`, if given, maps a whole chunk of rows at once.
+    A record that cannot be normalized or prepared (a missing field, an
+    unreadable file object) is reported in "errors"; the rest still go in.
+    """
+    columns = columns or fields
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    ids, errors = [], []
+    conn = get_db_connection()
+    try:
+        iterator = iter(records)
+        index = 0
+        while True:
+            raw = list(itertools.islice(iterator, batch_size))
+            if not raw:
+                break
+            chunk, rejected = [], {}
+            for position, record in enumerate(raw):
+                try:
+                    values = _normalize_record(record, fields, defaults)
+                    chunk.append(prepare(values) if prepare else values)
+                except Exception as e:
+                    rejected[position] = f"{type(e).__name__}: {e}"
+            if prepare_chunk and chunk:
+                chunk = prepare_chunk(chunk)
+            try:
+                outcomes = _insert_chunk(conn, sql, table, chunk) if chunk else []
+            except sqlite3.Error as e:
+                outcomes = [(None, str(e))] * len(chunk)
+            outcomes = iter(outcomes)
+            for position, record in enumerate(raw):
+                row_id, error = (None, rejected[position]) if position in rejected else next(outcomes)
+                ids.append(row_id)
+                if error:
+                    errors.append({"index": index, "record": record, "message": error})
+                index += 1
+    finally:
+        conn.close()
+        invalidate(f"table:{table}")
+    return {
+        "success": not errors,
+        "inserted": len(ids) - len(errors),
+        "failed": len(errors),
+        id_key: ids,
+        "errors": errors,
+    }
+
+
+def _hash_user_passwords(chunk):
+    # The KDF dominates; hash the whole chunk in parallel on the hashing pool.
+    hashes = hash_passwords(values[2] for values in chunk)
+    return [values[:2] + (password_hash,) + values[3:] for values, password_hash in zip(chunk, hashes)]
+
+
+def insert_users_bulk(records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert many users. Records are (username, email, password, role, full_name).
+
+    Returns:
+        dict: counts, "user_ids" aligned with the input (None where a row
+        failed) and "errors" listing each failed row, e.g. duplicate emails.
+    """
+    fields = ('username', 'email', 'password_hash', 'role', 'full_name')
+    defaults = {'full_name': None, 'role': None}
+    records = ({**r, 'password_hash': r['password']} if isinstance(r, dict) else r for r in records)
+    return _bulk_insert('users', fields, defaults, records, batch_size, 'user_ids',
+                        prepare_chunk=_hash_user_passwords)
+
+
+def _store_resume_file(values):
+    user_id, filename, file_data, extracted_text, ats_score = values
+    stored = get_blob_store().put(file_data)
+    return (user_id, filename, stored["file_path"], stored["file_hash"], stored["file_size"], extracted_text,
+            ats_score)
+
+
+def insert_resumes_bulk(records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert many resumes. Records are (user_id, filename, file_data, extracted_text, ats_score).
+
+    file_data may be bytes or a binary file object; ats_score is optional.
+    """
+    fields = ('user_id', 'filename', 'file_data', 'extracted_text', 'ats_score')
+    defaults = {'extracted_text': "", 'ats_score': None}
+    columns = ('user_id', 'filename', 'file_path', 'file_hash', 'file_size', 'extracted_text', 'ats_score')
+    return _bulk_insert('resumes', fields, defaults, records, batch_size, 'resume_ids',
+                        prepare=_store_resume_file, columns=columns)
+
+
+def insert_jobs_bulk(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert many jobs. Records are (recruiter_id, title, job_description, required_skills, min_experience)."""
+    fields = ('recruiter_id', 'title', 'job_description', 'required_skills', 'min_experience')
+    defaults = {'min_experience': 0}
+    return _bulk_insert('jobs', fields, defaults, records, batch_size, 'job_ids')
+
+
+def insert_applications_bulk(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert many applications. Records are (job_id, student_id, resume_id, similarity_score)."""
+    fields = ('job_id', 'student_id', 'resume_id', 'similarity_score')
+    defaults = {'similarity_score': 0.0}
+    return _bulk_insert('applications', fields, defaults, records, batch_size, 'application_ids')
+
+
+def insert_templates_bulk(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert many templates. Records are (title, file_path, ats_score, uploaded_by)."""
+    fields = ('title', 'file_path', 'ats_score', 'uploaded_by')
+    return _bulk_insert('templates', fields, {}, records, batch_size, 'template_ids')
+
+
+def insert_references_bulk(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert many reference documents. Records are (title, file_path, company, score, uploaded_by_id)."""
+    fields = ('title', 'file_path', 'company', 'score', 'uploaded_by')
+    records = ({**r, 'uploaded_by': r['uploaded_by_id']} if isinstance(r, dict) and 'uploaded_by_id' in r else r
+               for r in records)
+    return _bulk_insert('reference', fields, {}, records, batch_size, 'reference_ids')
+
+
+
+def _dump_analysis(values):
+    resume_id, job_id, analysis_results = values
+    if not isinstance(analysis_results, str):
+        analysis_results = json.dumps(analysis_results, separators=(',', ':'))
+    return (resume_id, job_id, analysis_results)
+
+
+def insert_analysis_logs_bulk(records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Append many analysis results. Records are (resume_id, job_id, analysis_results).
+
+    analysis_results may be a dict (stored as compact JSON) or a JSON string;
+    its "score" and "missing_skills" fields are indexed (see analysis_data.py).
+    """
+    fields = ('resume_id', 'job_id', 'analysis_results')
+    return _bulk_insert('analysis_logs', fields, {}, records, batch_size, 'log_ids', prepare=_dump_analysis)
+
+
 __all__ = [
     'get_db_connection', # Included for utility
     'insert_user',
+    'insert_user_hashed',
     'insert_resume',
+    'insert_resume_inline',
     'insert_job', 
     'insert_application',
     'insert_template',
-    'insert_new_reference'
-]
\ No newline at end of file
+    'insert_new_reference',
+    'insert_users_bulk',
+    'insert_resumes_bulk',
+    'insert_jobs_bulk',
+    'insert_applications_bulk',
+    'insert_templates_bulk',
+    'insert_references_bulk',
+    'insert_analysis_logs_bulk'
+]
+
+
+shard_module(globals())
+instrument_module(globals())
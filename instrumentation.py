@@ -0,0 +1,430 @@
+# instrumentation_operations.py
+#
+# Opt-in latency profiling for the data modules.
+#
+# Every public function of insertion.py, select_data.py, update_data.py,
+# delete_data.py, analysis_data.py and search_data.py is wrapped at import
+# time by instrument_module(). While instrumentation is off the wrapper
+# only checks a flag; while it is on it records, per function:
+#     latency histogram, calls, errors (exceptions or {"success": False}),
+#     rows returned (list results) and rows written (conn.total_changes,
+#     which includes rows changed by triggers such as the FTS index).
+# Pooled checkouts are timed too (connection-acquire histogram).
+#
+# A sample of calls (`sample_rate`, default 1%) is also traced statement by
+# statement with sqlite3's set_trace_callback and a progress handler:
+#     per-statement latency histogram and VM steps, keyed by the statement
+#     with its literals replaced by "?" (so no bound values are kept).
+# A statement's latency runs from its start to the next different statement
+# on the same connection or the connection's return to the pool, so it
+# includes fetching the rows, its triggers and, for executemany(), all
+# rows. Statements slower than `slow_query_ms` are kept in a ring buffer
+# with their EXPLAIN QUERY PLAN (one plan per statement every few minutes)
+# and printed.
+#
+# Turn it on with RESUME_ANALYZER_INSTRUMENT=1 (plus ..._SAMPLE_RATE and
+# ..._SLOW_QUERY_MS) or configure_instrumentation(enabled=True). Read the
+# numbers with metrics_snapshot() (JSON-ready dict) or prometheus_text().
+# Calls made by the async writer run on a bound connection and are timed
+# per function only.
+
+import collections
+import functools
+import inspect
+import os
+import random
+import re
+import threading
+import time
+
+import db_connection
+
+ENABLED = os.environ.get("RESUME_ANALYZER_INSTRUMENT", "0") == "1"
+SAMPLE_RATE = float(os.environ.get("RESUME_ANALYZER_INSTRUMENT_SAMPLE_RATE", 0.01))
+SLOW_QUERY_MS = float(os.environ.get("RESUME_ANALYZER_SLOW_QUERY_MS", 100))
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROGRESS_STEPS = 1000       # VM instructions between progress-handler calls
+MAX_STATEMENTS = 500        # distinct statements tracked; the rest count as "<other>"
+SLOW_LOG_SIZE = 100
+EXPLAIN_INTERVAL = 300.0    # seconds before the same statement is explained again
+
+_settings = {"enabled": False, "sample_rate": SAMPLE_RATE, "slow_query_ms": SLOW_QUERY_MS,
+             "print_slow": True}
+_local = threading.local()
+
+# Checkouts are timed by the pool observer instead.
+_NOT_INSTRUMENTED = {"get_db_connection"}
+
+# ==================== SQL NORMALIZATION ====================
+
+_LITERAL_RE = re.compile(r"""[xX]?'(?:[^']|'')*'|(?<![\w.$])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?""")
+_SPACE_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\bIN \(\?(?: ?, ?\?)+\)", re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """Replace literals with ? and collapse whitespace and IN (?, ?, ...) lists."""
+    sql = _SPACE_RE.sub(" ", _LITERAL_RE.sub("?", sql)).strip()
+    return _IN_LIST_RE.sub("IN (?, ...)", sql)
+
+
+# ==================== METRICS ====================
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus style)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None when empty)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {"count": self.count, "sum": self.total,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.counts))}
+
+
+def _function_entry():
+    return {"latency": Histogram(), "errors": 0, "sampled": 0, "rows_returned": 0, "rows_written": 0}
+
+
+def _statement_entry():
+    return {"latency": Histogram(), "vm_steps": 0}
+
+
+_lock = threading.Lock()
+_functions = collections.defaultdict(_function_entry)
+_statements = collections.defaultdict(_statement_entry)
+_acquire = Histogram()
+_slow = collections.deque(maxlen=SLOW_LOG_SIZE)
+_plans = {}  # statement -> (explained_at, plan)
+
+
+class _Call:
+    __slots__ = ("name", "sampled", "rows_written")
+
+    def __init__(self, name, sampled):
+        self.name = name
+        self.sampled = sampled
+        self.rows_written = 0
+
+
+# ==================== STATEMENT TRACING ====================
+
+class _Tracer:
+    """Times the statements run on one sampled checkout."""
+
+    def __init__(self, function):
+        self.function = function
+        self.current = None  # (statement, started)
+        self.steps = 0
+        self.slow = []
+
+    def statement(self, sql):
+        if sql.startswith("--"):
+            return  # run by a virtual table (FTS5) inside the current statement
+        statement = normalize_sql(sql)
+        if self.current is not None and self.current[0] == statement:
+            # sqlite3 reports the running statement again for each trigger
+            # it fires, and executemany() reports every row: count one run.
+            return
+        now = time.perf_counter()
+        self.finish(now)
+        self.current = (statement, now)
+
+    def progress(self):
+        self.steps += 1
+        return 0  # non-zero would interrupt the statement
+
+    def finish(self, now=None):
+        if self.current is None:
+            return
+        statement, started = self.current
+        elapsed = (now or time.perf_counter()) - started
+        steps, self.current, self.steps = self.steps * PROGRESS_STEPS, None, 0
+        with _lock:
+            if statement not in _statements and len(_statements) >= MAX_STATEMENTS:
+                statement = "<other>"
+            entry = _statements[statement]
+            entry["latency"].observe(elapsed)
+            entry["vm_steps"] += steps
+        if elapsed * 1000 >= _settings["slow_query_ms"]:
+            self.slow.append((statement, elapsed, steps))
+
+
+def _explain(conn, statement):
+    with _lock:
+        cached = _plans.get(statement)
+    if cached is not None and time.monotonic() - cached[0] < EXPLAIN_INTERVAL:
+        return cached[1]
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    try:
+        # Unbound parameters are NULL, which picks the same indexes.
+        rows = cursor.execute("EXPLAIN QUERY PLAN " + statement.replace("(?, ...)", "(?)"),
+                              [None] * statement.count("?")).fetchall()
+        plan = [row[3] for row in rows]
+    except Exception as e:  # e.g. "<other>", or SQL EXPLAIN cannot take
+        plan = [f"unavailable: {e}"]
+    with _lock:
+        _plans[statement] = (time.monotonic(), plan)
+    return plan
+
+
+class _Observer:
+    """db_connection hook: times checkouts and traces sampled connections."""
+
+    def checked_out(self, conn, wait):
+        if not _settings["enabled"]:
+            return
+        call = getattr(_local, "call", None)
+        sampled = call.sampled if call is not None else random.random() < _settings["sample_rate"]
+        tracer = None
+        if sampled:
+            tracer = _Tracer(call.name if call is not None else None)
+            conn.set_trace_callback(tracer.statement)
+            conn.set_progress_handler(tracer.progress, PROGRESS_STEPS)
+        conn._instrumentation = (call, conn.total_changes, tracer)
+        with _lock:
+            _acquire.observe(wait)
+
+    def checked_in(self, conn):
+        state = conn.__dict__.pop("_instrumentation", None)
+        if state is None:
+            return  # checked out before instrumentation was enabled, or closed twice
+        call, changes_before, tracer = state
+        if call is not None:
+            call.rows_written += conn.total_changes - changes_before
+        if tracer is None:
+            return
+        tracer.finish()
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+        for statement, elapsed, steps in tracer.slow:
+            entry = {"statement": statement, "ms": elapsed * 1000, "vm_steps": steps,
+                     "function": tracer.function, "at": time.time(), "plan": _explain(conn, statement)}
+            _slow.append(entry)
+            if _settings["print_slow"]:
+                print(f"❌ Slow query ({entry['ms']:.1f} ms) in {tracer.function or '?'}: {statement}\n"
+                      f"   plan: {' | '.join(entry['plan'])}")
+
+
+_observer = _Observer()
+
+
+# ==================== FUNCTION WRAPPERS ====================
+
+def _begin(name):
+    outer = getattr(_local, "call", None)
+    sampled = outer.sampled if outer is not None else random.random() < _settings["sample_rate"]
+    call = _local.call = _Call(name, sampled)
+    return outer, call, time.perf_counter()
+
+
+def _end(outer, call, started, failed, rows_returned=0):
+    elapsed = time.perf_counter() - started
+    _local.call = outer
+    if outer is not None:
+        outer.rows_written += call.rows_written
+    with _lock:
+        entry = _functions[call.name]
+        entry["latency"].observe(elapsed)
+        entry["errors"] += failed
+        entry["sampled"] += call.sampled
+        entry["rows_returned"] += rows_returned
+        entry["rows_written"] += call.rows_written
+
+
+def _timed_iteration(iterator, outer, call, started):
+    """Keep a call open until its generator is exhausted or closed."""
+    failed, rows = True, 0
+    _local.call = call
+    try:
+        for item in iterator:
+            rows += 1
+            _local.call = outer  # the consumer runs outside the call
+            yield item
+            _local.call = call
+        failed = False
+    except GeneratorExit:  # the consumer stopped early
+        failed = False
+        raise
+    finally:
+        _end(outer, call, started, failed, rows)
+
+
+def instrumented(func, name=None):
+    """Wrap a function so its calls are measured while instrumentation is on."""
+    name = name or f"{func.__module__}.{func.__name__}"
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not _settings["enabled"]:
+                return (yield from func(*args, **kwargs))
+            outer, call, started = _begin(name)
+            return (yield from _timed_iteration(func(*args, **kwargs), outer, call, started))
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _settings["enabled"]:
+            return func(*args, **kwargs)
+        outer, call, started = _begin(name)
+        failed, rows, streaming = True, 0, False
+        try:
+            result = func(*args, **kwargs)
+            if inspect.isgenerator(result):
+                # A plain function returning a generator (e.g. a streaming
+                # query routed by sharding.py): time the iteration too.
+                streaming = True
+                _local.call = outer
+                return _timed_iteration(result, outer, call, started)
+            failed = isinstance(result, dict) and result.get("success") is False
+            rows = len(result) if isinstance(result, list) else 0
+            return result
+        finally:
+            if not streaming:
+                _end(outer, call, started, failed, rows)
+    return wrapper
+
+
+def instrument_module(namespace, names=None):
+    """
+    Wrap a module's public functions in place (call at the end of the module).
+
+    Args:
+        namespace (dict): The module's globals().
+        names (iterable): Names to wrap; defaults to __all__, or to every
+            public function defined in the module. Names imported from
+            other modules are left alone.
+    """
+    module = namespace["__name__"]
+    if names is None:
+        names = namespace.get("__all__") or [n for n in namespace if not n.startswith("_")]
+    for name in names:
+        func = namespace.get(name)
+        if inspect.isfunction(func) and func.__module__ == module and name not in _NOT_INSTRUMENTED:
+            namespace[name] = instrumented(func)
+
+
+# ==================== CONFIGURATION AND EXPORT ====================
+
+def configure_instrumentation(enabled=None, sample_rate=None, slow_query_ms=None, print_slow=None):
+    """Switch instrumentation on/off or retune sampling and the slow-query threshold."""
+    for key, value in (("sample_rate", sample_rate), ("slow_query_ms", slow_query_ms),
+                       ("print_slow", print_slow)):
+        if value is not None:
+            _settings[key] = value
+    if enabled is not None:
+        _settings["enabled"] = enabled
+        if enabled:
+            # Stays installed once set, so connections checked out while
+            # enabled are still cleaned up when returned after disabling.
+            db_connection.set_connection_observer(_observer)
+    return dict(_settings)
+
+
+def reset_metrics():
+    with _lock:
+        _functions.clear()
+        _statements.clear()
+        _slow.clear()
+        _plans.clear()
+        _acquire.__init__()
+
+
+def slow_queries() -> list:
+    """Most recent slow statements, newest last."""
+    with _lock:
+        return list(_slow)
+
+
+def metrics_snapshot() -> dict:
+    """All metrics as plain dicts and numbers (json.dumps-able)."""
+    with _lock:
+        return {
+            "settings": dict(_settings),
+            "functions": {name: dict(e, latency=e["latency"].snapshot()) for name, e in _functions.items()},
+            "statements": {sql: dict(e, latency=e["latency"].snapshot()) for sql, e in _statements.items()},
+            "connection_acquire": _acquire.snapshot(),
+            "slow_queries": list(_slow),
+        }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _histogram_lines(metric, labels, histogram):
+    lines, cumulative = [], 0
+    for bound, n in zip([str(b) for b in BUCKETS] + ["+Inf"], histogram.counts):
+        cumulative += n
+        lines.append(f'{metric}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {histogram.total}")
+    lines.append(f"{metric}_count{suffix} {histogram.count}")
+    return lines
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        lines.append("# TYPE resume_db_function_duration_seconds histogram")
+        for name, e in sorted(_functions.items()):
+            lines += _histogram_lines("resume_db_function_duration_seconds",
+                                      f'function="{_label(name)}"', e["latency"])
+        for counter in ("errors", "sampled", "rows_returned", "rows_written"):
+            lines.append(f"# TYPE resume_db_function_{counter}_total counter")
+            lines += [f'resume_db_function_{counter}_total{{function="{_label(name)}"}} {e[counter]}'
+                      for name, e in sorted(_functions.items())]
+        lines.append("# TYPE resume_db_statement_duration_seconds histogram")
+        for sql, e in sorted(_statements.items()):
+            lines += _histogram_lines("resume_db_statement_duration_seconds",
+                                      f'statement="{_label(sql)}"', e["latency"])
+        lines.append("# TYPE resume_db_statement_vm_steps_total counter")
+        lines += [f'resume_db_statement_vm_steps_total{{statement="{_label(sql)}"}} {e["vm_steps"]}'
+                  for sql, e in sorted(_statements.items())]
+        lines.append("# TYPE resume_db_connection_acquire_seconds histogram")
+        lines += _histogram_lines("resume_db_connection_acquire_seconds", "", _acquire)
+    return "\n".join(lines) + "\n"
+
+
+configure_instrumentation(enabled=ENABLED)
+
+
+__all__ = [
+    'instrumented',
+    'instrument_module',
+    'normalize_sql',
+    'configure_instrumentation',
+    'reset_metrics',
+    'slow_queries',
+    'metrics_snapshot',
+    'prometheus_text'
+]
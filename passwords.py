@@ -0,0 +1,246 @@
+# password_operations.py
+#
+# Salted, cost-tunable password hashing for users.password_hash.
+#
+# Hashes are stored as self-describing strings, so the cost can be raised
+# later without breaking existing rows:
+#     scrypt$<n>$<r>$<p>$<salt b64>$<hash b64>
+#     pbkdf2_sha256$<iterations>$<salt b64>$<hash b64>
+# Rows written before this module existed hold a bare unsalted sha256 hex
+# digest; login_user() still accepts those and rewrites them in the current
+# format on the next successful login.
+#
+# A KDF is slow on purpose, so hashing and verification run on a bounded
+# worker pool (hashlib's scrypt and pbkdf2_hmac release the GIL, so threads
+# use every core; a process pool can be chosen instead). At most
+# `max_pending` hashes wait for a worker; callers beyond that block, which
+# keeps a login storm from queueing unbounded CPU work.
+#
+# Successful verifications are remembered for a short TTL, keyed on user
+# id, so repeated logins skip the KDF. An entry only matches if the
+# password_hash stored in the row is unchanged, so a password change
+# invalidates it immediately.
+
+import base64
+import concurrent.futures
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+import time
+
+ALGORITHM = os.environ.get("RESUME_ANALYZER_PASSWORD_ALGORITHM", "scrypt")
+SCRYPT_PARAMS = {
+    "n": int(os.environ.get("RESUME_ANALYZER_SCRYPT_N", 2 ** 14)),
+    "r": 8,
+    "p": 1,
+}
+PBKDF2_ITERATIONS = int(os.environ.get("RESUME_ANALYZER_PBKDF2_ITERATIONS", 600000))
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+HASH_WORKERS = int(os.environ.get("RESUME_ANALYZER_HASH_WORKERS", os.cpu_count() or 1))
+HASH_POOL_KIND = os.environ.get("RESUME_ANALYZER_HASH_POOL", "thread")  # or "process"
+AUTH_CACHE_TTL = float(os.environ.get("RESUME_ANALYZER_AUTH_CACHE_TTL", 300))  # seconds; 0 disables
+
+_LEGACY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+# ==================== HASH FORMAT ====================
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _kdf(password, algorithm, params, salt):
+    if algorithm == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=2 * 128 * r * n + 1024 * 1024, dklen=HASH_BYTES)
+    if algorithm == "pbkdf2_sha256":
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=HASH_BYTES)
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+
+def _current_params():
+    if ALGORITHM == "scrypt":
+        return (SCRYPT_PARAMS["n"], SCRYPT_PARAMS["r"], SCRYPT_PARAMS["p"])
+    return (PBKDF2_ITERATIONS,)
+
+
+def _hash_now(password):
+    """Hash with the current settings (runs on a worker)."""
+    params = _current_params()
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _kdf(password, ALGORITHM, params, salt)
+    return "$".join([ALGORITHM, *map(str, params), _b64(salt), _b64(digest)])
+
+
+def _verify_now(password, encoded):
+    """Check a password against a stored hash (runs on a worker)."""
+    if is_legacy_hash(encoded):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+    try:
+        algorithm, *fields = encoded.split("$")
+        *params, salt, digest = fields
+        expected = base64.b64decode(digest)
+        actual = _kdf(password, algorithm, tuple(int(v) for v in params), base64.b64decode(salt))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def is_legacy_hash(encoded) -> bool:
+    """True for the old unsalted sha256 hex digests."""
+    return bool(encoded) and _LEGACY_RE.match(encoded) is not None
+
+
+def needs_rehash(encoded) -> bool:
+    """True if the stored hash is legacy or uses other than the current settings."""
+    if is_legacy_hash(encoded):
+        return True
+    algorithm, *fields = encoded.split("$")
+    return algorithm != ALGORITHM or tuple(int(v) for v in fields[:-2]) != _current_params()
+
+
+# ==================== WORKER POOL ====================
+
+class _HashPool:
+    """Fixed-size executor with a bound on queued hashes."""
+
+    def __init__(self, workers=HASH_WORKERS, kind=HASH_POOL_KIND, max_pending=None):
+        executor = (concurrent.futures.ProcessPoolExecutor if kind == "process"
+                    else concurrent.futures.ThreadPoolExecutor)
+        self.workers = workers
+        self.kind = kind
+        self._executor = executor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+
+    def submit(self, func, *args):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    def map(self, func, *iterables):
+        futures = [self.submit(func, *args) for args in zip(*iterables)]
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hash_pool() -> _HashPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _HashPool()
+    return _pool
+
+
+def configure_hash_pool(workers=None, kind=None, max_pending=None):
+    """Replace the shared hashing pool (e.g. to switch to processes)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, _HashPool(workers or HASH_WORKERS, kind or HASH_POOL_KIND, max_pending)
+    if old is not None:
+        old.shutdown()
+    return _pool
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with the current algorithm and cost settings."""
+    return get_hash_pool().run(_hash_now, password)
+
+
+def hash_passwords(passwords) -> list:
+    """Hash many passwords in parallel on the worker pool (keeps input order)."""
+    return get_hash_pool().map(_hash_now, list(passwords))
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Check a password against a stored hash (new format or legacy sha256)."""
+    if not encoded:
+        return False
+    return get_hash_pool().run(_verify_now, password, encoded)
+
+
+# ==================== VERIFIED-SESSION CACHE ====================
+# user_id -> (expires_at, stored password_hash, keyed digest of the password).
+# The digest uses a random per-process key, so the cache never holds
+# anything that could be checked offline.
+
+_cache_key = secrets.token_bytes(32)
+_auth_cache = {}
+_auth_cache_lock = threading.Lock()
+_auth_stats = {"hits": 0, "misses": 0}
+
+
+def _cache_digest(password):
+    return hmac.new(_cache_key, password.encode(), hashlib.sha256).digest()
+
+
+def check_auth_cache(user_id, password, stored_hash) -> bool:
+    """True if this user id verified this password against this stored hash recently."""
+    if AUTH_CACHE_TTL <= 0:
+        return False
+    with _auth_cache_lock:
+        entry = _auth_cache.get(user_id)
+        if entry is not None and entry[0] < time.monotonic():
+            del _auth_cache[user_id]
+            entry = None
+        hit = (entry is not None and entry[1] == stored_hash
+               and hmac.compare_digest(entry[2], _cache_digest(password)))
+        _auth_stats["hits" if hit else "misses"] += 1
+    return hit
+
+
+def remember_auth(user_id, password, stored_hash):
+    if AUTH_CACHE_TTL <= 0:
+        return
+    with _auth_cache_lock:
+        _auth_cache[user_id] = (time.monotonic() + AUTH_CACHE_TTL, stored_hash, _cache_digest(password))
+
+
+def clear_auth_cache(user_id=None):
+    """Forget cached verifications for one user, or for everyone."""
+    with _auth_cache_lock:
+        if user_id is None:
+            _auth_cache.clear()
+        else:
+            _auth_cache.pop(user_id, None)
+
+
+def auth_cache_stats() -> dict:
+    with _auth_cache_lock:
+        return dict(_auth_stats, size=len(_auth_cache), ttl=AUTH_CACHE_TTL)
+
+
+__all__ = [
+    'hash_password',
+    'hash_passwords',
+    'verify_password',
+    'is_legacy_hash',
+    'needs_rehash',
+    'get_hash_pool',
+    'configure_hash_pool',
+    'check_auth_cache',
+    'remember_auth',
+    'clear_auth_cache',
+    'auth_cache_stats'
+]
@@ -0,0 +1,198 @@
+# query_cache_operations.py
+#
+# In-process read-through cache for the hot lookups in select_data.py
+# (get_user_by_email, get_all_jobs, get_user_resumes).
+#
+# Entries are evicted least-recently-used once `max_entries` is reached and
+# expire `ttl` seconds after they were loaded. Every entry carries tags
+# naming the rows it was built from:
+#     "table:<name>"        any row of a table
+#     "email:<email>"       the user with that email (cached even if absent)
+#     "user:<id>"           the user with that id
+#     "resumes_of:<id>"     the resumes of that user
+# and the write functions in insertion.py, update_data.py and delete_data.py
+# call invalidate() with the tags they touched after committing.
+#
+# A read that started before an invalidation is not stored, so a slow
+# reader cannot put back data that a concurrent write has just replaced.
+# Writers that commit later than their invalidate() call (the async
+# writer's group commit) wrap the batch in deferred_invalidation().
+#
+# Reads that must not be cached (e.g. from a stale replica, see replicas.py)
+# run inside bypass_cache().
+#
+# Disable with RESUME_ANALYZER_QUERY_CACHE=0 or configure_query_cache(enabled=False),
+# e.g. in tests that read straight after writing through another process.
+
+import collections
+import contextlib
+import os
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESUME_ANALYZER_QUERY_CACHE_SIZE", 1024))
+DEFAULT_TTL = float(os.environ.get("RESUME_ANALYZER_QUERY_CACHE_TTL", 30))  # seconds
+ENABLED = os.environ.get("RESUME_ANALYZER_QUERY_CACHE", "1") != "0"
+
+
+def _copy(value):
+    # Callers get their own dicts, so mutating a result never corrupts the cache.
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class QueryCache:
+    """Size-bounded LRU with per-entry TTL and tag-based invalidation."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, enabled=ENABLED):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = collections.OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = collections.defaultdict(set)  # tag -> keys
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def read_through(self, key, loader, tags=()):
+        """
+        Return the cached value for `key`, or call loader() and cache its result.
+
+        Args:
+            key (tuple): Hashable cache key.
+            loader (callable): Runs the query on a miss.
+            tags (iterable | callable): Tags for the entry, or a function of
+                the loaded value returning them.
+        """
+        if not self.enabled or getattr(_bypass, "active", False):
+            return loader()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return _copy(entry[1])
+                self._drop(key)
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        value = loader()
+        entry_tags = tuple(tags(value) if callable(tags) else tags)
+        with self._lock:
+            if generation == self._generation:
+                self._drop(key)
+                self._entries[key] = (time.monotonic() + self.ttl, value, entry_tags)
+                for tag in entry_tags:
+                    self._tags[tag].add(key)
+                while len(self._entries) > self.max_entries:
+                    self._drop(next(iter(self._entries)))
+                    self._stats["evictions"] += 1
+        return _copy(value)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for tag in entry[2]:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tags[tag]
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the tags."""
+        deferred = getattr(_deferred, "tags", None)
+        if deferred is not None:
+            deferred.update(tags)
+            return
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(self._stats, size=len(self._entries), max_entries=self.max_entries,
+                        ttl=self.ttl, enabled=self.enabled,
+                        hit_rate=self._stats["hits"] / lookups if lookups else 0.0)
+
+
+_cache = QueryCache()
+_deferred = threading.local()
+_bypass = threading.local()
+
+
+def get_query_cache() -> QueryCache:
+    return _cache
+
+
+def configure_query_cache(max_entries=None, ttl=None, enabled=None):
+    """Resize, retune or switch the shared cache on/off (clears it)."""
+    if max_entries is not None:
+        _cache.max_entries = max_entries
+    if ttl is not None:
+        _cache.ttl = ttl
+    if enabled is not None:
+        _cache.enabled = enabled
+    _cache.clear()
+    return _cache
+
+
+def invalidate(*tags):
+    """Invalidate tags in the shared cache (called by the write functions)."""
+    _cache.invalidate(*tags)
+
+
+@contextlib.contextmanager
+def deferred_invalidation():
+    """Collect invalidations made in this thread and apply them on exit (after the commit)."""
+    outer = getattr(_deferred, "tags", None)
+    _deferred.tags = set() if outer is None else outer
+    try:
+        yield
+    finally:
+        if outer is None:
+            tags, _deferred.tags = _deferred.tags, None
+            if tags:
+                _cache.invalidate(*tags)
+
+
+@contextlib.contextmanager
+def bypass_cache():
+    """Read straight from the database in this thread, without storing results."""
+    outer = getattr(_bypass, "active", False)
+    _bypass.active = True
+    try:
+        yield
+    finally:
+        _bypass.active = outer
+
+
+def query_cache_stats() -> dict:
+    return _cache.stats()
+
+
+__all__ = [
+    'QueryCache',
+    'get_query_cache',
+    'configure_query_cache',
+    'invalidate',
+    'deferred_invalidation',
+    'bypass_cache',
+    'query_cache_stats'
+]
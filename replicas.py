@@ -0,0 +1,292 @@
+# replica_operations.py
+#
+# Read-only snapshot replicas of the primary database, so heavy reporting
+# (scans of applications and analysis_logs) does not compete with uploads
+# on resume_analyzer.db.
+#
+# A replica is a separate file refreshed with the sqlite3 backup API. Each
+# refresh copies a consistent snapshot of the primary (one read
+# transaction; in WAL mode writers carry on meanwhile) into a temporary
+# file next to the replica and atomically renames it into place, then
+# swaps in a fresh connection pool. Queries already running finish on the
+# old file, so readers never wait for a refresh; their next checkout goes
+# to the new one.
+#
+#     add_replica("reports.db")              # first snapshot now
+#     start_replica_refresher(interval=60)   # then every minute
+#
+#     with stale_reads(max_staleness=120):   # up to 2 minutes old is fine
+#         report = get_top_applicants(job_id, limit=100)
+#
+# Inside stale_reads() every get_db_connection() in that thread is served
+# by the freshest replica within max_staleness (or the primary if none
+# is), and the query cache is bypassed so stale rows are never cached for
+# other readers. Replica connections are query_only: a write attempted
+# inside the block fails instead of being lost, so keep writes outside.
+# Renaming over an open file needs POSIX semantics.
+
+import contextlib
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db_connection
+from query_cache import bypass_cache
+
+REPLICA_PATHS = [p for p in os.environ.get("RESUME_ANALYZER_REPLICAS", "").split(os.pathsep) if p]
+DEFAULT_MAX_STALENESS = float(os.environ.get("RESUME_ANALYZER_REPLICA_MAX_STALENESS", 300))  # seconds
+DEFAULT_REFRESH_INTERVAL = 60.0
+
+# PRAGMAs for replica connections: read-only, large cache, no journal.
+REPLICA_PRAGMAS = {
+    "busy_timeout": 5000,
+    "query_only": 1,
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+class Replica:
+    """One snapshot file of the primary plus a read-only pool over it."""
+
+    def __init__(self, path, pool_size=None):
+        self.path = os.path.abspath(path)
+        self.pool_size = pool_size
+        self.pool = None
+        self.snapshot_at = None  # wall-clock time the current snapshot was started
+        self.last_duration = None
+        self.refreshes = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @property
+    def staleness(self) -> float:
+        """Seconds since the current snapshot was taken (inf before the first one)."""
+        return float("inf") if self.snapshot_at is None else time.time() - self.snapshot_at
+
+    def refresh(self, pages=-1) -> dict:
+        """
+        Copy a fresh snapshot of the primary into this replica.
+
+        Args:
+            pages (int): Pages per backup step. -1 copies everything in one
+                step and one read transaction; a positive value yields the
+                source between steps, but the copy restarts whenever
+                another connection writes to the primary.
+
+        Returns:
+            dict: {"success", "seconds", "pages"} or {"success": False, "message"}.
+        """
+        with self._lock:
+            started = time.time()
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                            suffix=".tmp", dir=os.path.dirname(self.path))
+            os.close(fd)
+            # Straight from the primary pool, even when called inside stale_reads().
+            source = db_connection.get_pool().acquire(row_factory=None)
+            target = sqlite3.connect(tmp_path)
+            try:
+                source.backup(target, pages=pages)
+                pages_copied = target.execute("PRAGMA page_count").fetchone()[0]
+                # The copy inherits WAL mode; a read-only replica needs no journal.
+                target.execute("PRAGMA journal_mode = DELETE").fetchall()
+                target.close()
+                os.replace(tmp_path, self.path)
+            except (sqlite3.Error, OSError) as e:
+                target.close()
+                os.unlink(tmp_path)
+                self.last_error = str(e)
+                print(f"❌ Error refreshing replica {self.path}: {e}")
+                return {"success": False, "message": f"Error refreshing replica: {e}"}
+            finally:
+                source.close()
+
+            old, self.pool = self.pool, db_connection.ConnectionPool(
+                self.path, size=self.pool_size, profile=REPLICA_PRAGMAS)
+            if old is not None:
+                old.close()  # connections in use finish on the old file
+            self.snapshot_at = started
+            self.last_duration = time.time() - started
+            self.refreshes += 1
+            self.last_error = None
+            return {"success": True, "seconds": self.last_duration, "pages": pages_copied}
+
+    def acquire(self, row_factory=sqlite3.Row):
+        """
+        Check out a connection to the current snapshot.
+
+        The pool is looked up on every checkout, so a stale_reads() block
+        that outlives a refresh moves on to the new snapshot instead of the
+        closed pool. Once the replica is closed, reads go to the primary.
+        """
+        while True:
+            pool = self.pool
+            if pool is None:
+                return db_connection.get_pool().acquire(row_factory=row_factory)
+            try:
+                return pool.acquire(row_factory=row_factory)
+            except sqlite3.ProgrammingError:
+                if self.pool is pool:
+                    raise
+                # Refreshed between the lookup and the checkout; try the new pool.
+
+    def close(self):
+        with self._lock:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+            self.snapshot_at = None
+
+    def stats(self) -> dict:
+        return {"path": self.path, "staleness": self.staleness, "refreshes": self.refreshes,
+                "last_duration": self.last_duration, "last_error": self.last_error,
+                "pool": self.pool.stats() if self.pool is not None else None}
+
+
+# ==================== REPLICA SET ====================
+
+_replicas = []
+_replicas_lock = threading.Lock()
+_round_robin = itertools.count()
+_routing = {"replica_reads": 0, "primary_fallbacks": 0}
+
+
+def add_replica(path, pool_size=None, refresh=True) -> Replica:
+    """Register a replica file (taking its first snapshot unless refresh=False)."""
+    replica = Replica(path, pool_size)
+    if refresh:
+        replica.refresh()
+    with _replicas_lock:
+        _replicas.append(replica)
+    return replica
+
+
+def remove_replicas():
+    """Forget every replica and close their pools (files are left on disk)."""
+    stop_replica_refresher()
+    with _replicas_lock:
+        removed, _replicas[:] = list(_replicas), []
+    for replica in removed:
+        replica.close()
+
+
+def get_replicas() -> list:
+    with _replicas_lock:
+        return list(_replicas)
+
+
+def refresh_replicas() -> list:
+    """Refresh every replica in turn; returns their results."""
+    return [replica.refresh() for replica in get_replicas()]
+
+
+def pick_replica(max_staleness=DEFAULT_MAX_STALENESS):
+    """A replica no older than max_staleness seconds (rotating among them), or None."""
+    fresh = [r for r in get_replicas() if r.pool is not None and r.staleness <= max_staleness]
+    if not fresh:
+        return None
+    return fresh[next(_round_robin) % len(fresh)]
+
+
+@contextlib.contextmanager
+def stale_reads(max_staleness=DEFAULT_MAX_STALENESS):
+    """
+    Serve this thread's reads from a replica at most max_staleness seconds old.
+
+    Falls back to the primary when no replica is fresh enough. Yields the
+    Replica used, or None for the primary.
+    """
+    replica = pick_replica(max_staleness)
+    with _replicas_lock:
+        _routing["replica_reads" if replica is not None else "primary_fallbacks"] += 1
+    if replica is None:
+        yield None
+        return
+    with db_connection.use_pool(replica), bypass_cache():
+        yield replica
+
+
+def read_from_replica(func, *args, max_staleness=DEFAULT_MAX_STALENESS, **kwargs):
+    """Call a read function (e.g. select_data.get_top_applicants) inside stale_reads()."""
+    with stale_reads(max_staleness):
+        return func(*args, **kwargs)
+
+
+def replica_stats() -> dict:
+    with _replicas_lock:
+        routing = dict(_routing)
+    return dict(routing, replicas=[replica.stats() for replica in get_replicas()])
+
+
+# ==================== SCHEDULED REFRESH ====================
+
+class ReplicaRefresher(threading.Thread):
+    """Daemon thread that refreshes every replica every `interval` seconds."""
+
+    def __init__(self, interval: float = DEFAULT_REFRESH_INTERVAL):
+        super().__init__(name="sqlite-replica-refresher", daemon=True)
+        self.interval = interval
+        self.last_results = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.last_results = refresh_replicas()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_refresher = None
+
+
+def start_replica_refresher(interval: float = DEFAULT_REFRESH_INTERVAL) -> ReplicaRefresher:
+    """Start (or restart) the shared background refresher."""
+    global _refresher
+    stop_replica_refresher()
+    _refresher = ReplicaRefresher(interval)
+    _refresher.start()
+    return _refresher
+
+
+def stop_replica_refresher():
+    """Stop the shared background refresher, if running."""
+    global _refresher
+    if _refresher is not None:
+        _refresher.stop()
+        _refresher.join()
+        _refresher = None
+
+
+def configure_replicas(paths=None, interval=DEFAULT_REFRESH_INTERVAL):
+    """
+    Replace the replica set with `paths` (default: RESUME_ANALYZER_REPLICAS)
+    and refresh them every `interval` seconds (0 = only on demand).
+    """
+    remove_replicas()
+    for path in paths if paths is not None else REPLICA_PATHS:
+        add_replica(path)
+    if interval:
+        start_replica_refresher(interval)
+    return get_replicas()
+
+
+__all__ = [
+    'Replica',
+    'add_replica',
+    'remove_replicas',
+    'get_replicas',
+    'refresh_replicas',
+    'pick_replica',
+    'stale_reads',
+    'read_from_replica',
+    'replica_stats',
+    'ReplicaRefresher',
+    'start_replica_refresher',
+    'stop_replica_refresher',
+    'configure_replicas'
+]
@@ -0,0 +1,232 @@
+# scoring_operations.py
+#
+# Resume <-> job similarity scoring. Requires numpy and scipy:
+#     pip install numpy scipy
+#
+# Text is tokenized and hashed into a fixed-size feature space by
+# features.py (which also caches the results) and weighted with TF-IDF,
+# with document frequencies over every resume (cached in feature_stats) so
+# scores from one-resume, subset and full runs are on the same scale.
+# Similarities for many resumes against many jobs are then one sparse
+# matrix product per chunk of resumes, and the results are written back
+# to applications.similarity_score, resumes.similarity_score and
+# resumes.skill_match_pct in one transaction.
+
+import json
+import sqlite3
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # scoring is optional; the rest of the package works without it
+    np = None
+    sparse = None
+
+from db_connection import get_db_connection
+from query_cache import invalidate
+from sharding import ensure_unsharded
+from features import (tokenize, split_skills, build_counts_matrix, load_resume_features,
+                      load_job_features, load_document_frequencies)
+
+RESUME_CHUNK_SIZE = 10000
+_MISSING_DEPS = {"success": False, "message": "Scoring requires numpy and scipy (pip install numpy scipy)"}
+
+
+# ==================== TF-IDF ====================
+
+def _tfidf(counts, idf):
+    """Sublinear TF (1 + log tf) times IDF, L2-normalized per row."""
+    matrix = counts.copy()
+    matrix.data = (1.0 + np.log(matrix.data)) * idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags((1.0 / norms).astype(np.float32)) @ matrix
+
+
+def _idf(n_docs, df):
+    """Smoothed inverse document frequency from corpus document frequencies."""
+    return (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+
+
+# ==================== SCORING ====================
+
+def _score(resume_counts, job_counts, job_skills, idf):
+    """
+    Yield (row_offset, similarity chunk, skill-match chunk) over resume chunks.
+
+    Only feature columns used by at least one job can contribute to a dot
+    product, so resumes are sliced down to those columns first. Both sides
+    stay sparse: the work is proportional to the resume non-zeros times
+    the jobs sharing each term, not to rows x columns x jobs.
+    """
+    resumes = _tfidf(resume_counts, idf)
+    jobs = _tfidf(job_counts, idf)
+
+    columns = np.unique(np.concatenate([jobs.indices] + list(job_skills)))
+    jobs_t = jobs[:, columns].T.tocsr().astype(np.float32)
+
+    # Binary job-skill matrix over the same columns for skill match counts.
+    skill_rows = np.concatenate([np.searchsorted(columns, f) for f in job_skills])
+    skill_cols = np.repeat(np.arange(len(job_skills)), [f.size for f in job_skills])
+    skill_matrix = sparse.csr_matrix(
+        (np.ones(skill_rows.size, dtype=np.float32), (skill_rows, skill_cols)),
+        shape=(columns.size, len(job_skills)))
+    skill_totals = np.maximum(np.array([f.size for f in job_skills], dtype=np.float32), 1.0)
+
+    resumes = resumes[:, columns].tocsr()
+    for start in range(0, resumes.shape[0], RESUME_CHUNK_SIZE):
+        chunk = resumes[start:start + RESUME_CHUNK_SIZE]
+        similarity = (chunk @ jobs_t).toarray()
+        present = chunk.copy()
+        present.data[:] = 1.0
+        skill_pct = (present @ skill_matrix).toarray() / skill_totals * 100.0
+        yield start, similarity, skill_pct
+
+
+def _select_applications(conn, resume_ids, job_ids):
+    """(id, job_id, resume_id) of the applications for the given resumes/jobs (None: any)."""
+    sql = "SELECT id, job_id, resume_id FROM applications"
+    if job_ids is not None and (resume_ids is None or len(job_ids) <= len(resume_ids)):
+        return conn.execute(sql + " WHERE job_id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(job_ids.tolist()),))
+    if resume_ids is not None:
+        return conn.execute(sql + " WHERE resume_id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(resume_ids.tolist()),))
+    return conn.execute(sql)
+
+
+def score_resumes_against_jobs(resume_ids=None, job_ids=None, open_only=True, top_n=10, write=True):
+    """
+    Score resumes against jobs in batched matrix operations.
+
+    Args:
+        resume_ids (list): Resumes to score; None means all.
+        job_ids (list): Jobs to score against; None means all (open) jobs.
+        open_only (bool): Restrict to jobs with status 'open'.
+        top_n (int): How many best resumes to report per job.
+        write (bool): Write scores back to the database.
+
+    Writes:
+        applications.similarity_score for every (job, resume) application;
+        resumes.similarity_score / skill_match_pct from each resume's best job
+        (when job_ids limits the jobs, only where it beats the stored match).
+
+    Returns:
+        dict: success flag, counts, and "top_matches" {job_id: [(resume_id, score), ...]}.
+
+    Raises:
+        RuntimeError: Sharding is on.
+    """
+    if np is None:
+        return dict(_MISSING_DEPS)
+    # Resumes and applications in shards would be missed; see sharding.py.
+    ensure_unsharded("Scoring")
+    conn = get_db_connection(row_factory=None)
+    try:
+        resume_id_arr, resume_features = load_resume_features(conn, resume_ids)
+        job_id_arr, job_features, job_skills = load_job_features(conn, job_ids, open_only)
+        if resume_id_arr.size == 0 or job_id_arr.size == 0:
+            return {"success": True, "resumes_scored": 0, "jobs_scored": 0,
+                    "applications_updated": 0, "top_matches": {}}
+
+        resume_pos = {int(r): i for i, r in enumerate(resume_id_arr)}
+        job_pos = {int(j): i for i, j in enumerate(job_id_arr)}
+        applications = [(app_id, resume_pos[resume_id], job_pos[job_id])
+                        for app_id, job_id, resume_id in _select_applications(
+                            conn, resume_id_arr if resume_ids is not None else None,
+                            job_id_arr if job_ids is not None else None)
+                        if resume_id in resume_pos and job_id in job_pos]
+        applications.sort(key=lambda a: a[1])
+
+        best_score = np.zeros(resume_id_arr.size, dtype=np.float32)
+        best_skill = np.zeros(resume_id_arr.size, dtype=np.float32)
+        app_scores = []
+        top_scores = np.full((top_n, job_id_arr.size), -1.0, dtype=np.float32)
+        top_rows = np.zeros((top_n, job_id_arr.size), dtype=np.int64)
+        app_cursor = 0
+
+        resume_counts = build_counts_matrix(resume_features)
+        # A full run already holds every resume; otherwise use the corpus statistics.
+        idf = _idf(*load_document_frequencies(conn, resume_counts if resume_ids is None else None))
+        for start, similarity, skill_pct in _score(resume_counts, build_counts_matrix(job_features),
+                                                   job_skills, idf):
+            rows = np.arange(similarity.shape[0])
+            best_job = similarity.argmax(axis=1)
+            best_score[start:start + rows.size] = similarity[rows, best_job]
+            best_skill[start:start + rows.size] = skill_pct[rows, best_job]
+
+            while app_cursor < len(applications) and applications[app_cursor][1] < start + rows.size:
+                app_id, r, j = applications[app_cursor]
+                app_scores.append((float(similarity[r - start, j]), app_id))
+                app_cursor += 1
+
+            # Merge this chunk's best rows per job into the running top-N.
+            k = min(top_n, rows.size)
+            chunk_top = np.argpartition(-similarity, k - 1, axis=0)[:k]
+            merged_scores = np.vstack([top_scores, np.take_along_axis(similarity, chunk_top, axis=0)])
+            merged_rows = np.vstack([top_rows, chunk_top + start])
+            keep = np.argsort(-merged_scores, axis=0)[:top_n]
+            top_scores = np.take_along_axis(merged_scores, keep, axis=0)
+            top_rows = np.take_along_axis(merged_rows, keep, axis=0)
+
+        if write:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("UPDATE applications SET similarity_score = ? WHERE id = ?", app_scores)
+            best = zip(best_score.astype(float).tolist(), best_skill.astype(float).tolist(),
+                       resume_id_arr.tolist())
+            if job_ids is None:
+                conn.executemany(
+                    "UPDATE resumes SET similarity_score = ?, skill_match_pct = ? WHERE id = ?", best)
+            else:
+                # Only some jobs were scored: a resume's best job may be one of
+                # the others, so keep whichever match is better.
+                conn.executemany('''
+                    UPDATE resumes
+                    SET skill_match_pct = CASE WHEN similarity_score IS NULL OR ?1 > similarity_score
+                                               THEN ?2 ELSE skill_match_pct END,
+                        similarity_score = MAX(COALESCE(similarity_score, ?1), ?1)
+                    WHERE id = ?3
+                    ''', best)
+            conn.commit()
+            invalidate("table:resumes")
+
+        top_matches = {}
+        for j, job_id in enumerate(job_id_arr.tolist()):
+            top_matches[job_id] = [(int(resume_id_arr[r]), float(s))
+                                   for r, s in zip(top_rows[:, j], top_scores[:, j]) if s >= 0]
+        return {"success": True, "resumes_scored": int(resume_id_arr.size),
+                "jobs_scored": int(job_id_arr.size), "applications_updated": len(app_scores),
+                "top_matches": top_matches}
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {"success": False, "message": f"Database error while scoring: {e}"}
+    finally:
+        conn.close()
+
+
+def score_job(job_id, top_n=10, write=True):
+    """Score one job against every resume; returns its best matching resumes."""
+    result = score_resumes_against_jobs(job_ids=[job_id], open_only=False, top_n=top_n, write=write)
+    if result["success"]:
+        result["matches"] = result.pop("top_matches").get(job_id, [])
+    return result
+
+
+def score_resume(resume_id, write=True):
+    """Score one resume against every open job; returns jobs ranked by similarity."""
+    if np is None:
+        return dict(_MISSING_DEPS)
+    result = score_resumes_against_jobs(resume_ids=[resume_id], top_n=1, write=write)
+    if result["success"]:
+        ranked = [(job_id, matches[0][1]) for job_id, matches in result.pop("top_matches").items() if matches]
+        result["matches"] = sorted(ranked, key=lambda m: -m[1])
+    return result
+
+
+__all__ = [
+    'tokenize',
+    'split_skills',
+    'score_resumes_against_jobs',
+    'score_job',
+    'score_resume'
+]
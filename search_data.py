@@ -0,0 +1,124 @@
+# search_operations.py
+
+import sqlite3
+
+from db_connection import get_db_connection
+from instrumentation import instrument_module
+from sharding import shard_module
+
+# ==================== FULL-TEXT SEARCH (FTS5) ====================
+# resumes_fts and jobs_fts are created by migration 4 in create_tables.py
+# and kept in sync with their base tables by triggers. Results are ranked
+# with bm25(); lower scores are better matches, so they sort ascending.
+
+DEFAULT_SEARCH_LIMIT = 20
+
+
+def build_match_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every whitespace-separated term is quoted, so input such as "c++" or
+    "node.js" is searched literally instead of being parsed as FTS syntax.
+    All terms must match (implicit AND).
+    """
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"' for term in terms if term)
+
+
+def search_resumes(query: str, limit: int = DEFAULT_SEARCH_LIMIT, raw: bool = False) -> list:
+    """
+    Rank resumes by how well extracted_text matches the query.
+
+    Args:
+        query (str): Free text, or an FTS5 expression if raw=True.
+        limit (int): Maximum number of results.
+        raw (bool): Pass the query to MATCH unchanged (AND/OR/NEAR, prefix*).
+
+    Returns:
+        list: dicts with resume_id, user_id, filename, score and snippet.
+    """
+    match = query if raw else build_match_query(query)
+    if not match:
+        return []
+    conn = get_db_connection()
+    try:
+        rows = conn.execute('''
+        SELECT r.id AS resume_id, r.user_id, r.filename,
+               bm25(resumes_fts) AS score,
+               snippet(resumes_fts, 0, '[', ']', '…', 12) AS snippet
+        FROM resumes_fts
+        JOIN resumes r ON r.id = resumes_fts.rowid
+        WHERE resumes_fts MATCH ?
+        ORDER BY score
+        LIMIT ?
+        ''', (match, limit)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.OperationalError as e:
+        print(f"Search error: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def search_jobs(query: str, limit: int = DEFAULT_SEARCH_LIMIT, open_only: bool = True, raw: bool = False) -> list:
+    """
+    Rank jobs by how well title, description and required skills match.
+
+    Title matches weigh most, then required skills, then the description.
+
+    Returns:
+        list: dicts with job_id, title, status, score and snippet.
+    """
+    match = query if raw else build_match_query(query)
+    if not match:
+        return []
+    status_filter = "AND j.status = 'open'" if open_only else ""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f'''
+        SELECT j.id AS job_id, j.title, j.status,
+               bm25(jobs_fts, 10.0, 1.0, 5.0) AS score,
+               snippet(jobs_fts, -1, '[', ']', '…', 12) AS snippet
+        FROM jobs_fts
+        JOIN jobs j ON j.id = jobs_fts.rowid
+        WHERE jobs_fts MATCH ? {status_filter}
+        ORDER BY score
+        LIMIT ?
+        ''', (match, limit)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.OperationalError as e:
+        print(f"Search error: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def rebuild_search_index() -> bool:
+    """Rebuild both FTS indexes from their base tables, then merge segments."""
+    conn = get_db_connection(row_factory=None)
+    try:
+        for table in ('resumes_fts', 'jobs_fts'):
+            conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+            conn.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+        conn.commit()
+        print("✅ Search indexes rebuilt.")
+        return True
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Database error rebuilding search indexes: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+__all__ = [
+    'build_match_query',
+    'search_resumes',
+    'search_jobs',
+    'rebuild_search_index'
+]
+
+
+shard_module(globals())
+instrument_module(globals())
@@ -1,75 +1,497 @@
 # select_operations.py
 
+import functools
+import io
 import sqlite3
-import hashlib
+from collections import namedtuple
+
+# Connections come from the shared pool in db_connection; conn.close()
+# returns them to the pool instead of closing the underlying handle.
+from db_connection import get_db_connection
+from blob_store import CHUNK_SIZE, get_blob_store
+from create_tables import LEADERBOARD_SIZE
+from query_cache import get_query_cache, invalidate
+from instrumentation import instrument_module
+from sharding import shard_module
+from passwords import (verify_password, needs_rehash, hash_password,
+                       check_auth_cache, remember_auth)
+
+# ==================== COLUMN PROJECTION ====================
+# List views only need a handful of columns. Passing `columns=` to the
+# select functions fetches just those; the list_* variants go further and
+# build lightweight namedtuple rows (no per-row dict, no __dict__).
+
+USER_PUBLIC_COLUMNS = ('id', 'username', 'email', 'role', 'full_name', 'created_at', 'last_login')
+RESUME_SUMMARY_COLUMNS = ('id', 'user_id', 'filename', 'file_size', 'ats_score', 'final_score', 'upload_at')
+JOB_SUMMARY_COLUMNS = ('id', 'recruiter_id', 'title', 'required_skills', 'min_experience', 'posted_on', 'status')
+
+_table_columns = {}
+
+
+def _known_columns(table, refresh=False):
+    if refresh or table not in _table_columns:
+        conn = get_db_connection()
+        try:
+            _table_columns[table] = {row["name"] for row in conn.execute(f'PRAGMA table_info({table})')}
+        finally:
+            conn.close()
+    return _table_columns[table]
+
+
+def _projection(table, columns):
+    """Validate a column list against the table schema and build the SELECT list."""
+    if columns is None:
+        return '*'
+    columns = tuple(columns)
+    unknown = set(columns) - _known_columns(table)
+    if unknown:
+        unknown = set(columns) - _known_columns(table, refresh=True)
+    if unknown or not columns:
+        raise ValueError(f"Unknown column(s) for {table}: {sorted(unknown)}")
+    return ', '.join(columns)
+
+
+@functools.lru_cache(maxsize=64)
+def row_type(name, columns):
+    """Return a (cached) namedtuple class for the given column tuple."""
+    return namedtuple(name, columns)
+
+
+def _namedtuple_factory(name, columns):
+    make = row_type(name, tuple(columns))._make
+    return lambda cursor, row: make(row)
 
-# NOTE: We can import get_db_connection from insert_operations, but it's often 
-# simpler for small projects to keep utility functions defined in both files 
-# if they are logically separate modules.
-def get_db_connection():
-    """Create and return a database connection"""
-    conn = sqlite3.connect('resume_analyzer.db')
-    conn.row_factory = sqlite3.Row
-    return conn
 
 # ==================== SELECT OPERATIONS (GET DATA) ====================
 
 def login_user(email, password):
     """Login user by verifying credentials"""
+    # Resolve the column list before checking out: on a cold cache it needs a connection itself.
+    select_list = _projection("users", USER_PUBLIC_COLUMNS)
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Hash the provided password
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
-    
-    # SELECT operation
-    cursor.execute('SELECT * FROM users WHERE email = ? AND password_hash = ?', 
-                    (email, password_hash))
+    # Look the user up by email; the salted hash is checked in Python
+    cursor.execute(f'SELECT {select_list}, password_hash FROM users WHERE email = ?', (email,))
     user = cursor.fetchone()
-    conn.close()
+    conn.close()  # don't hold a pooled connection during the KDF
     
-    if user:
-        return {"success": True, "user": dict(user)}
-    else:
+    if user is None:
         return {"success": False, "message": "Invalid email or password"}
+    
+    user = dict(user)
+    stored_hash = user.pop("password_hash")  # never returned to the caller
+    if not check_auth_cache(user["id"], password, stored_hash):
+        if not verify_password(password, stored_hash):
+            return {"success": False, "message": "Invalid email or password"}
+        if needs_rehash(stored_hash):
+            stored_hash = _rehash_password(user["id"], stored_hash, password)
+        remember_auth(user["id"], password, stored_hash)
+    return {"success": True, "user": user}
 
-def get_user_resumes(user_id):
-    """Get all resumes for a specific user"""
+def _rehash_password(user_id, old_hash, password):
+    """Upgrade a legacy sha256 (or outdated-cost) hash after a successful login."""
+    new_hash = hash_password(password)
+    conn = get_db_connection()
+    try:
+        # Compare-and-set: skip if the password changed concurrently
+        cursor = conn.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                              (new_hash, user_id, old_hash))
+        conn.commit()
+        invalidate(f"user:{user_id}")
+        return new_hash if cursor.rowcount else old_hash
+    except sqlite3.Error:
+        conn.rollback()
+        return old_hash  # the login itself still succeeds; retry on the next one
+    finally:
+        conn.close()
+
+# These three run on nearly every page load, so they read through the
+# in-process cache in query_cache.py; writes invalidate the affected tags.
+
+def get_user_resumes(user_id, columns=None):
+    """Get all resumes for a specific user (optionally only the given columns)"""
+    key = ("user_resumes", user_id, tuple(columns) if columns else None)
+    return get_query_cache().read_through(key, lambda: _select_user_resumes(user_id, columns),
+                                          tags=("table:resumes", f"resumes_of:{user_id}"))
+
+def _select_user_resumes(user_id, columns):
+    select_list = _projection("resumes", columns)
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # SELECT operation
-    cursor.execute('SELECT * FROM resumes WHERE user_id = ? ORDER BY upload_at DESC', (user_id,))
+    cursor.execute(f'SELECT {select_list} FROM resumes WHERE user_id = ? ORDER BY upload_at DESC', (user_id,))
     resumes = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return resumes
 
-def get_all_jobs():
-    """Get all available jobs"""
+def get_all_jobs(columns=None):
+    """Get all available jobs (optionally only the given columns)"""
+    key = ("open_jobs", tuple(columns) if columns else None)
+    return get_query_cache().read_through(key, lambda: _select_open_jobs(columns), tags=("table:jobs",))
+
+def _select_open_jobs(columns):
+    select_list = _projection("jobs", columns)
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # SELECT operation
-    cursor.execute('SELECT * FROM jobs WHERE status = "open" ORDER BY posted_on DESC')
+    cursor.execute(f'SELECT {select_list} FROM jobs WHERE status = "open" ORDER BY posted_on DESC')
     jobs = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return jobs
 
-def get_user_by_email(email):
-    """Get user by email"""
+def get_user_by_email(email, columns=None):
+    """Get user by email (optionally only the given columns)"""
+    key = ("user_by_email", email, tuple(columns) if columns else None)
+    return get_query_cache().read_through(key, lambda: _select_user_by_email(email, columns),
+                                          tags=lambda user: _user_tags(email, user))
+
+def _user_tags(email, user):
+    tags = ["table:users", f"email:{email}"]
+    if user and "id" in user:
+        tags.append(f"user:{user['id']}")
+    elif user:
+        tags.append("users:untagged")  # projection without id: only table-wide writes can find it
+    return tags
+
+def _select_user_by_email(email, columns):
+    select_list = _projection("users", columns)
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # SELECT operation
-    cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+    cursor.execute(f'SELECT {select_list} FROM users WHERE email = ?', (email,))
     user = cursor.fetchone()
     conn.close()
     return dict(user) if user else None
 
+# ==================== SUMMARY (LIST VIEW) QUERIES ====================
+
+def list_user_resumes(user_id, columns=RESUME_SUMMARY_COLUMNS):
+    """List a user's resumes as ResumeSummary namedtuples, newest first"""
+    select_list = _projection("resumes", columns)
+    conn = get_db_connection(row_factory=_namedtuple_factory('ResumeSummary', columns))
+    try:
+        return conn.execute(f'SELECT {select_list} FROM resumes WHERE user_id = ? ORDER BY upload_at DESC',
+                            (user_id,)).fetchall()
+    finally:
+        conn.close()
+
+def list_open_jobs(columns=JOB_SUMMARY_COLUMNS):
+    """List open jobs as JobSummary namedtuples, newest first"""
+    select_list = _projection("jobs", columns)
+    conn = get_db_connection(row_factory=_namedtuple_factory('JobSummary', columns))
+    try:
+        return conn.execute(f'SELECT {select_list} FROM jobs WHERE status = "open" ORDER BY posted_on DESC').fetchall()
+    finally:
+        conn.close()
+
+def get_user_summary_by_email(email, columns=USER_PUBLIC_COLUMNS):
+    """Get a user as a UserSummary namedtuple without the password hash"""
+    select_list = _projection("users", columns)
+    conn = get_db_connection(row_factory=_namedtuple_factory('UserSummary', columns))
+    try:
+        return conn.execute(f'SELECT {select_list} FROM users WHERE email = ?', (email,)).fetchone()
+    finally:
+        conn.close()
+
+# ==================== KEYSET PAGINATION & STREAMING ====================
+# Pages are addressed by the (timestamp, id) of the last row already seen
+# rather than by OFFSET, so page N is an index seek just like page 1. The
+# iter_* generators stream a whole result set with fetchmany, keeping at
+# most `chunk_size` rows in memory.
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _keyset_page(sql_base, params, order_column, after, limit, columns, table):
+    """Run one keyset-paginated query; `after` is the previous page's next_cursor."""
+    select_list = _projection(table, columns)
+    extra_columns = ""
+    if columns is not None:
+        # The cursor needs the sort key even when the caller did not ask for it.
+        extra_columns = f", {order_column} AS _cursor_ts, id AS _cursor_id"
+    sql = f"SELECT {select_list}{extra_columns} FROM {sql_base}"
+    if after is not None:
+        sql += f" AND ({order_column}, id) < (?, ?)"
+        params = params + tuple(after)
+    sql += f" ORDER BY {order_column} DESC, id DESC LIMIT ?"
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(sql, params + (limit,)).fetchall()
+    finally:
+        conn.close()
+    items, next_cursor = [], None
+    for row in rows:
+        item = dict(row)
+        if columns is not None:
+            next_cursor = (item.pop("_cursor_ts"), item.pop("_cursor_id"))
+        else:
+            next_cursor = (item[order_column], item["id"])
+        items.append(item)
+    if len(rows) < limit:
+        next_cursor = None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_jobs_page(limit=DEFAULT_PAGE_SIZE, after=None, columns=None):
+    """
+    Get one page of open jobs, newest first.
+
+    Args:
+        limit (int): Maximum number of jobs in the page.
+        after (tuple): next_cursor from the previous page, or None for page 1.
+        columns (list): Optional column projection.
+
+    Returns:
+        dict: {"items": [...], "next_cursor": (posted_on, id) or None}
+    """
+    return _keyset_page('jobs WHERE status = "open"', (), "posted_on", after, limit, columns, "jobs")
+
+
+def get_user_resumes_page(user_id, limit=DEFAULT_PAGE_SIZE, after=None, columns=None):
+    """
+    Get one page of a user's resumes, newest first.
+
+    Returns:
+        dict: {"items": [...], "next_cursor": (upload_at, id) or None}
+    """
+    return _keyset_page("resumes WHERE user_id = ?", (user_id,), "upload_at", after, limit, columns, "resumes")
+
+
+def _stream(sql, params, chunk_size, row_factory):
+    conn = get_db_connection(row_factory=row_factory)
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def iter_all_jobs(columns=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield every open job (newest first) as a dict, fetching chunk_size rows at a time."""
+    sql = f'SELECT {_projection("jobs", columns)} FROM jobs WHERE status = "open" ORDER BY posted_on DESC, id DESC'
+    for row in _stream(sql, (), chunk_size, sqlite3.Row):
+        yield dict(row)
+
+
+def iter_user_resumes(user_id, columns=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a user's resumes (newest first) as dicts, fetching chunk_size rows at a time."""
+    sql = f'SELECT {_projection("resumes", columns)} FROM resumes WHERE user_id = ? ORDER BY upload_at DESC, id DESC'
+    for row in _stream(sql, (user_id,), chunk_size, sqlite3.Row):
+        yield dict(row)
+
+
+def _resume_file_location(resume_id):
+    conn = get_db_connection()
+    try:
+        return conn.execute(
+            'SELECT file_hash, uploaded_file IS NOT NULL AS inline FROM resumes WHERE id = ?',
+            (resume_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+class ResumeBlobFile(io.RawIOBase):
+    """
+    Seekable read-only file over an inline resumes.uploaded_file value.
+
+    Reads go through Connection.blobopen, so only the requested bytes are
+    loaded. It holds a pooled connection (and a WAL read snapshot) until
+    closed; use it as a context manager.
+    """
+
+    def __init__(self, resume_id):
+        super().__init__()
+        self._conn = get_db_connection()
+        try:
+            self._blob = self._conn.blobopen('resumes', 'uploaded_file', resume_id, readonly=True)
+        except sqlite3.Error:
+            self._conn.close()
+            raise
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._blob.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._blob.seek(offset, whence)
+        return self._blob.tell()
+
+    def tell(self):
+        return self._blob.tell()
+
+    def __len__(self):
+        return len(self._blob)
+
+    def close(self):
+        if not self.closed:
+            self._blob.close()
+            self._conn.close()
+        super().close()
+
+
+def open_resume_file(resume_id):
+    """
+    Open a resume's uploaded file for streaming reads.
+
+    Returns:
+        A binary file object, or None if the resume does not exist.
+    """
+    row = _resume_file_location(resume_id)
+    if row is None:
+        return None
+    if row["file_hash"]:
+        return get_blob_store().open(row["file_hash"])
+    if row["inline"]:
+        # Stored inside the database (legacy rows, insert_resume_inline).
+        return io.BufferedReader(ResumeBlobFile(resume_id), buffer_size=64 * 1024)
+    return None
+
+
+def iter_resume_file(resume_id, chunk_size=CHUNK_SIZE):
+    """Yield a resume's file in chunks (e.g. for a streaming download response)."""
+    f = open_resume_file(resume_id)
+    if f is None:
+        return
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def get_resume_file_view(resume_id):
+    """Return a read-only memoryview (mmap-backed when possible) of a resume's file."""
+    row = _resume_file_location(resume_id)
+    if row is None:
+        return None
+    if row["file_hash"]:
+        return get_blob_store().view(row["file_hash"])
+    f = open_resume_file(resume_id)
+    if f is None:
+        return None
+    with f:
+        return memoryview(f.read()).toreadonly()
+
+
+# ==================== RANKED APPLICANTS ====================
+# job_leaderboard keeps each job's best LEADERBOARD_SIZE applications and
+# job_application_counts its per-status totals; both are maintained by
+# triggers (migration 6), so these reads touch O(limit) rows, never the
+# whole applications table.
+
+APPLICANT_COLUMNS = (
+    'a.id AS application_id, a.student_id, a.resume_id, a.similarity_score, a.status, a.applied_on, '
+    'r.filename, r.ats_score, r.skill_match_pct, r.final_score'
+)
+
+
+def get_top_applicants(job_id, limit=10, status=None):
+    """
+    Get a job's highest-scoring applicants with a summary of their resume.
+
+    Args:
+        job_id (int): The job to rank applicants for.
+        limit (int): How many applicants to return.
+        status (str): Only applications with this status (e.g. 'submitted').
+
+    Returns:
+        list: dicts ordered by similarity_score, best first. Unscored
+        applications are not ranked.
+    """
+    conn = get_db_connection()
+    try:
+        if status is None and limit <= LEADERBOARD_SIZE:
+            rows = conn.execute(f'''
+            SELECT {APPLICANT_COLUMNS}
+            FROM job_leaderboard lb
+            JOIN applications a ON a.id = lb.application_id
+            LEFT JOIN resumes r ON r.id = a.resume_id
+            WHERE lb.job_id = ?
+            ORDER BY lb.score DESC, lb.application_id
+            LIMIT ?
+            ''', (job_id, limit)).fetchall()
+        else:
+            # Filtered or deeper than the leaderboard: walk idx_applications_job.
+            status_filter = "AND a.status = ?" if status is not None else ""
+            params = (job_id, status, limit) if status is not None else (job_id, limit)
+            rows = conn.execute(f'''
+            SELECT {APPLICANT_COLUMNS}
+            FROM applications a
+            LEFT JOIN resumes r ON r.id = a.resume_id
+            WHERE a.job_id = ? {status_filter} AND a.similarity_score IS NOT NULL
+            ORDER BY a.similarity_score DESC, a.id
+            LIMIT ?
+            ''', params).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def get_application_counts(job_id, statuses=None):
+    """
+    Count a job's applications by status.
+
+    Args:
+        job_id (int): The job.
+        statuses (iterable): Only report these statuses.
+
+    Returns:
+        dict: {status: count, ..., "total": count of the reported statuses}.
+    """
+    conn = get_db_connection()
+    try:
+        rows = conn.execute('SELECT status, n FROM job_application_counts WHERE job_id = ?', (job_id,)).fetchall()
+    finally:
+        conn.close()
+    counts = {row["status"]: row["n"] for row in rows}
+    if statuses is not None:
+        counts = {status: counts.get(status, 0) for status in statuses}
+    counts["total"] = sum(counts.values())
+    return counts
+
+
 __all__ = [
     'get_db_connection', # Included for utility
     'login_user', 
     'get_user_resumes',
     'get_all_jobs',
-    'get_user_by_email'
-]
\ No newline at end of file
+    'get_user_by_email',
+    'list_user_resumes',
+    'list_open_jobs',
+    'get_user_summary_by_email',
+    'get_jobs_page',
+    'get_user_resumes_page',
+    'iter_all_jobs',
+    'iter_user_resumes',
+    'row_type',
+    'USER_PUBLIC_COLUMNS',
+    'RESUME_SUMMARY_COLUMNS',
+    'JOB_SUMMARY_COLUMNS',
+    'open_resume_file',
+    'get_resume_file_view',
+    'iter_resume_file',
+    'ResumeBlobFile',
+    'get_top_applicants',
+    'get_application_counts'
+]
+
+
+shard_module(globals())
+instrument_module(globals())
@@ -0,0 +1,599 @@
+# sharding_operations.py
+#
+# Optional sharded storage: resumes, applications and analysis_logs (with
+# their FTS index, leaderboard and analysis side tables) are split across N
+# database files by a hash of the owning user id; users, jobs, templates and
+# reference stay in the catalog, which is the usual resume_analyzer.db.
+#
+#     enable_sharding(8)      # or RESUME_ANALYZER_SHARDS=8
+#
+# The shard count and files are recorded in the catalog's shard_map table,
+# so later runs reopen the same layout (the count cannot change once data
+# is written). Shard k's AUTOINCREMENT sequences start at
+# (k + 1) << SHARD_ID_BITS, above every catalog id, so every resume,
+# application and analysis log id names its own shard (or the catalog) and
+# lookups by id go straight to one file. Each shard connection ATTACHes the
+# catalog as "catalog"; shards have no users or jobs tables of their own,
+# so queries that join them (e.g. applications of a recruiter's jobs) read
+# the catalog's.
+#
+# The public functions of the data modules route themselves (see ROUTES):
+#     * by user:   insert_resume, get_user_resumes, delete_resumes_by_user_id, ...
+#                  run on the shard of their user_id / student_id;
+#     * by row:    open_resume_file, update_resume_score, ... on the shard of the id;
+#     * split:     bulk inserts and bulk updates group their rows per shard;
+#     * fan-out:   get_top_applicants, get_application_counts, search_resumes,
+#                  analysis queries and retention run on every shard in
+#                  parallel on a thread pool and merge the results;
+#     * catalog:   everything else, unchanged.
+# Rows already in the catalog's own resumes/applications/analysis_logs tables
+# stay reachable by id (their ids fall outside every shard) but not by user
+# or in fan-out queries; enable sharding on a fresh database.
+#
+# Blob garbage collection (blob_store.py) checks the references in the
+# catalog and every shard.
+#
+# Limits: a write spanning a shard and the catalog (purge_users) commits per
+# file, not atomically; re-running it finishes an interrupted purge. bm25
+# scores in search_resumes come from each shard's own statistics. Deleting
+# a job does not clear its leaderboard rows in the shards. The async writer
+# (async_data.py) gives up group commit and runs each write alone. Modules
+# that read the sharded tables straight from the catalog raise RuntimeError
+# (see ensure_unsharded()): scoring.py, the resume loaders of features.py,
+# write-behind updates of resumes/applications and data_transfer.py for the
+# sharded tables.
+
+import collections
+import concurrent.futures
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+
+import db_connection
+
+SHARDS = int(os.environ.get("RESUME_ANALYZER_SHARDS", 0))
+SHARD_DIR = os.environ.get("RESUME_ANALYZER_SHARD_DIR")
+SHARD_ID_BITS = 40  # ids per shard: 2**40
+_LOCAL_ID = (1 << SHARD_ID_BITS) - 1
+SHARDED_TABLES = ('resumes', 'applications', 'analysis_logs')
+# Catalog tables removed from a new shard (dropping jobs drops its triggers).
+CATALOG_ONLY_TABLES = ('jobs_fts', 'jobs', 'users', 'templates', 'reference')
+
+_local = threading.local()
+
+
+class ShardSet:
+    """The open shards: one connection pool per file, plus a fan-out thread pool."""
+
+    def __init__(self, catalog_path, shard_paths, pool_size=None):
+        self.catalog_path = os.path.abspath(catalog_path)
+        self.paths = list(shard_paths)
+        self.pools = [db_connection.ConnectionPool(path, size=pool_size, attach={"catalog": self.catalog_path})
+                      for path in self.paths]
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(self.paths), thread_name_prefix="shard")
+
+    def __len__(self):
+        return len(self.paths)
+
+    def for_user(self, user_id) -> int:
+        """Shard holding a user's resumes, applications and analysis logs."""
+        # Fibonacci hashing spreads sequential ids evenly.
+        return (((int(user_id) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % len(self.paths)
+
+    def for_row(self, row_id) -> int:
+        """Shard holding a resume, application or analysis log id."""
+        shard = (int(row_id) >> SHARD_ID_BITS) - 1
+        if not 0 <= shard < len(self.paths):
+            raise ValueError(f"id {row_id} does not belong to any of the {len(self.paths)} shards")
+        return shard
+
+    def locate(self, row_id):
+        """Like for_row(), but None for ids from before sharding (left in the catalog)."""
+        try:
+            return self.for_row(row_id)
+        except ValueError:
+            return None
+
+    def run(self, shard, func, *args, **kwargs):
+        """Call func with this thread's connections checked out from one shard (None: the catalog)."""
+        outer = getattr(_local, "shard", None), getattr(_local, "routed", False)
+        _local.shard, _local.routed = shard, True
+        try:
+            with db_connection.use_pool(None if shard is None else self.pools[shard]):
+                return func(*args, **kwargs)
+        finally:
+            _local.shard, _local.routed = outer
+
+    def iterate(self, shard, func, *args, **kwargs):
+        """Like run() for generator functions; the routing only covers each step."""
+        iterator = self.run(shard, func, *args, **kwargs)
+        try:
+            while True:
+                try:
+                    item = self.run(shard, next, iterator)
+                except StopIteration:
+                    return
+                yield item
+        finally:
+            self.run(shard, iterator.close)
+
+    def call(self, shard, func, *args, **kwargs):
+        if inspect.isgeneratorfunction(func):
+            return self.iterate(shard, func, *args, **kwargs)
+        return self.run(shard, func, *args, **kwargs)
+
+    def submit(self, shard, func, *args, **kwargs) -> concurrent.futures.Future:
+        """Start func on one shard on the thread pool (inline when already routed)."""
+        if getattr(_local, "routed", False):
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(self.run(shard, func, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._executor.submit(self.run, shard, func, *args, **kwargs)
+
+    def fan_out(self, func, *args, shards=None, **kwargs) -> list:
+        """Call func on every shard (or the given ones) in parallel; results in shard order."""
+        shards = range(len(self.paths)) if shards is None else shards
+        if getattr(_local, "routed", False):
+            # Already on a fan-out worker: run inline rather than wait on our own pool.
+            return [self.run(shard, func, *args, **kwargs) for shard in shards]
+        futures = [self._executor.submit(self.run, shard, func, *args, **kwargs) for shard in shards]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for pool in self.pools:
+            pool.close()
+
+
+# ==================== SHARD FILES ====================
+
+def _create_shard(path, shard):
+    """Create a shard file: the full schema minus the catalog tables, with offset ids."""
+    from create_tables import create_database_tables
+
+    bootstrap = db_connection.ConnectionPool(path, size=1)
+    try:
+        with db_connection.use_pool(bootstrap):
+            create_database_tables()
+        conn = bootstrap.acquire(row_factory=None)
+        try:
+            for table in CATALOG_ONLY_TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for table in SHARDED_TABLES:
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                             (table, (shard + 1) << SHARD_ID_BITS))
+            conn.commit()
+        finally:
+            conn.close()
+    finally:
+        bootstrap.close()
+
+
+def _shard_map(shards, directory):
+    """Read the catalog's shard layout, creating it (and the files) on first use."""
+    conn = db_connection.get_pool().acquire(row_factory=None)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS shard_map (shard INTEGER PRIMARY KEY, path TEXT NOT NULL)")
+        conn.commit()
+        paths = [row[0] for row in conn.execute("SELECT path FROM shard_map ORDER BY shard")]
+        if paths:
+            if shards and shards != len(paths):
+                raise ValueError(f"The database already has {len(paths)} shards; cannot reshard to {shards}")
+            return paths
+        if not shards:
+            return []
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.abspath(os.path.join(directory, f"shard_{k:03d}.db")) for k in range(shards)]
+        for k, path in enumerate(paths):
+            _create_shard(path, k)
+        conn.executemany("INSERT INTO shard_map (shard, path) VALUES (?, ?)", enumerate(paths))
+        conn.commit()
+        return paths
+    finally:
+        conn.close()
+
+
+_shards = None
+_shards_lock = threading.Lock()
+_auto_checked = False
+
+
+def _enable_locked(shards, directory, pool_size):
+    """Build the ShardSet and publish it as _shards; the caller holds _shards_lock."""
+    global _shards
+    directory = directory or SHARD_DIR or os.path.splitext(os.path.abspath(db_connection.DB_PATH))[0] + "_shards"
+    paths = _shard_map(shards, directory)
+    if not paths:
+        raise ValueError("Number of shards is required to set up sharding")
+    shard_set = ShardSet(db_connection.DB_PATH, paths, pool_size)
+    old, _shards = _shards, shard_set
+    print(f"✅ Sharded storage on: {len(paths)} shard(s)")
+    return old, shard_set
+
+
+def enable_sharding(shards=None, directory=None, pool_size=None) -> ShardSet:
+    """
+    Turn on sharded storage for the current database (the catalog).
+
+    Args:
+        shards (int): Number of shard files. Required the first time;
+            afterwards the layout stored in the catalog is reused.
+        directory (str): Where new shard files go; defaults to
+            RESUME_ANALYZER_SHARD_DIR or "<database name>_shards/".
+        pool_size (int): Connections per shard pool.
+
+    Returns:
+        ShardSet: The active shards.
+    """
+    with _shards_lock:
+        old, shard_set = _enable_locked(shards, directory, pool_size)
+    if old is not None:
+        old.close()
+    return shard_set
+
+
+def disable_sharding():
+    """Route everything to the catalog again (shard files are left as they are)."""
+    global _shards
+    with _shards_lock:
+        old, _shards = _shards, None
+    if old is not None:
+        old.close()
+
+
+def get_shards():
+    """The active ShardSet, or None when sharding is off."""
+    global _auto_checked
+    shard_set = _shards
+    if shard_set is not None or not SHARDS or _auto_checked:
+        return shard_set
+    # First use with RESUME_ANALYZER_SHARDS set: every caller waits here
+    # until the shards are open rather than seeing None in the meantime.
+    with _shards_lock:
+        if _shards is None and not _auto_checked:
+            _enable_locked(SHARDS, None, None)
+        _auto_checked = True
+        return _shards
+
+
+def ensure_unsharded(operation):
+    """Raise RuntimeError if sharding is on; for code that only sees the catalog's tables."""
+    if get_shards() is not None:
+        raise RuntimeError(f"{operation} does not support sharded storage")
+
+
+# ==================== ROUTES ====================
+# A route is a function (shards, func, arguments) -> result, where func is
+# the original, unrouted function and arguments its bound arguments.
+
+def _invoke(func, arguments, **overrides):
+    arguments = dict(arguments, **overrides)
+    return func(**arguments)
+
+
+def _by_user(param):
+    def route(shards, func, arguments):
+        return shards.call(shards.for_user(arguments[param]), func, **arguments)
+    return route
+
+
+def _by_row(param):
+    def route(shards, func, arguments):
+        return shards.call(shards.locate(arguments[param]), func, **arguments)
+    return route
+
+
+def _fan_out(combine):
+    def route(shards, func, arguments):
+        return combine(shards.fan_out(func, **arguments), arguments)
+    return route
+
+
+def _record_value(record, field, position):
+    return record[field] if isinstance(record, dict) else record[position]
+
+
+def _shard_order(shard):
+    return -1 if shard is None else shard
+
+
+def _split_records(field, position, by_row=False):
+    """
+    Bulk inserts: stream records into per-shard chunks, insert each chunk,
+    realign the results.
+
+    A chunk goes to its shard once it holds batch_size records, with at most
+    one chunk per shard in flight, so memory stays bounded for generators
+    (and the file data they carry) of any length.
+    """
+    def route(shards, func, arguments):
+        batch_size = arguments["batch_size"]
+        pending = {}  # shard -> ([input index], [record])
+        in_flight = collections.deque()  # (input indices, future)
+        ids, errors, id_key = [], [], None
+
+        def collect():
+            nonlocal id_key
+            indices, future = in_flight.popleft()
+            result = future.result()
+            id_key = next(k for k in result if k.endswith("_ids"))
+            for local, row_id in enumerate(result[id_key]):
+                ids[indices[local]] = row_id
+            errors.extend(dict(error, index=indices[error["index"]]) for error in result["errors"])
+
+        def send(shard):
+            indices, chunk = pending.pop(shard)
+            if len(in_flight) >= len(shards):
+                collect()
+            in_flight.append((indices, shards.submit(shard, func, **dict(arguments, records=chunk))))
+
+        for index, record in enumerate(arguments["records"]):
+            key = _record_value(record, field, position)
+            shard = shards.locate(key) if by_row else shards.for_user(key)
+            indices, chunk = pending.setdefault(shard, ([], []))
+            indices.append(index)
+            chunk.append(record)
+            ids.append(None)
+            if len(chunk) >= batch_size:
+                send(shard)
+        if not ids:
+            return _on_catalog(func, **dict(arguments, records=[]))
+        for shard in sorted(pending, key=_shard_order):
+            send(shard)
+        while in_flight:
+            collect()
+
+        errors.sort(key=lambda error: error["index"])
+        return {"success": not errors, "inserted": len(ids) - len(errors), "failed": len(errors),
+                id_key: ids, "errors": errors}
+    return route
+
+
+def _split_pairs(param):
+    """Bulk updates: group {id: value} pairs per shard; merge the updated ids."""
+    def route(shards, func, arguments):
+        values = arguments[param]
+        items = values.items() if isinstance(values, dict) else values
+        groups = {}
+        try:
+            for row_id, value in items:
+                groups.setdefault(shards.locate(int(row_id)), []).append((row_id, value))
+        except (TypeError, ValueError) as e:
+            print(f"Invalid id in bulk update: {e}")
+            return None
+        order = sorted(groups, key=_shard_order)
+        results = shards.fan_out(lambda: func(**dict(arguments, **{param: groups[_local.shard]})), shards=order)
+        if any(result is None for result in results):
+            return None
+        return sorted(row_id for result in results for row_id in result)
+    return route
+
+
+def _merge_sorted(key, limit_param="limit", reverse=False):
+    def combine(results, arguments):
+        rows = sorted((row for result in results for row in result), key=key, reverse=reverse)
+        limit = arguments.get(limit_param)
+        return rows[:limit] if limit is not None else rows
+    return combine
+
+
+def _sum_counts(results, arguments):
+    counts = {}
+    for result in results:
+        for status, n in result.items():
+            counts[status] = counts.get(status, 0) + n
+    return counts
+
+
+def _sum_fields(results, arguments):
+    if any(not result.get("success", True) for result in results):
+        return next(result for result in results if not result.get("success", True))
+    merged = {"success": True}
+    for result in results:
+        for key, value in result.items():
+            if key != "success" and isinstance(value, (int, float)):
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _ignore(results, arguments):
+    return None
+
+
+def _top_missing_skills(results, arguments):
+    totals = {}
+    for result in results:
+        for skill, n in result:
+            totals[skill] = totals.get(skill, 0) + n
+    return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:arguments["limit"]]
+
+
+def _merge_rollups(results, arguments):
+    merged = {}
+    for result in results:
+        for row in result:
+            key = (row["job_id"], row["day"])
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            total = merged[key]
+            for field in ("n", "scored", "score_sum"):
+                total[field] += row[field]
+            for field, pick in (("score_min", min), ("score_max", max)):
+                present = [v for v in (total[field], row[field]) if v is not None]
+                total[field] = pick(present) if present else None
+    rollups = [merged[key] for key in sorted(merged)]
+    for rollup in rollups:
+        rollup["avg_score"] = rollup["score_sum"] / rollup["scored"] if rollup["scored"] else None
+    return rollups
+
+
+def _analysis_logs(shards, func, arguments):
+    if arguments["resume_id"] is not None:
+        return shards.call(shards.locate(arguments["resume_id"]), func, **arguments)
+    if arguments["order_by"] == "score":
+        key = lambda log: (log["score"] is not None, log["score"] or 0, log["analyzed_at"])
+    else:
+        key = lambda log: (log["analyzed_at"], log["id"] & _LOCAL_ID)
+    return _merge_sorted(key, reverse=True)(shards.fan_out(func, **arguments), arguments)
+
+
+def _purge_shard(user_ids):
+    import delete_data  # delete_data imports this module
+
+    conn = db_connection.get_db_connection(row_factory=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS purge_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM purge_ids")
+        # users resolves to the attached catalog: shards have no users table.
+        conn.executemany("INSERT INTO purge_ids (id) SELECT id FROM users WHERE id = ?",
+                         ((user_id,) for user_id in user_ids))
+        file_hashes = [row[0] for row in conn.execute(delete_data.PURGED_FILES_SQL)]
+        counts = {table: conn.execute(sql).rowcount
+                  for table, sql in delete_data.PURGE_STEPS if table in SHARDED_TABLES}
+        conn.execute("DELETE FROM purge_ids")
+        conn.commit()
+        return counts, file_hashes
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _purge_users(shards, func, arguments):
+    import delete_data
+
+    # Shards first: the catalog still knows which users to purge, and a
+    # failure leaves the users in place so the purge can be re-run.
+    try:
+        user_ids = sorted({int(user_id) for user_id in arguments["user_ids"]})
+    except (TypeError, ValueError) as e:
+        return {"success": False, "message": f"Invalid user id: {e}"}
+    try:
+        shard_results = shards.fan_out(_purge_shard, user_ids)
+    except sqlite3.Error as e:
+        return {"success": False, "message": f"Database error purging users: {e}"}
+    result = _on_catalog(func, user_ids)
+    # The shard deletes are committed whatever the catalog did.
+    files_deleted = delete_data.release_blobs(
+        [file_hash for _, file_hashes in shard_results for file_hash in file_hashes])
+    if result["success"]:
+        result["files_deleted"] += files_deleted
+        for counts, _ in shard_results:
+            for table, n in counts.items():
+                result["counts"][table] = result["counts"].get(table, 0) + n
+    return result
+
+
+def _on_catalog(func, *args, **kwargs):
+    with db_connection.use_pool(None):
+        return func(*args, **kwargs)
+
+
+def _rebuild_resume_index():
+    conn = db_connection.get_db_connection(row_factory=None)
+    try:
+        conn.execute("INSERT INTO resumes_fts (resumes_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO resumes_fts (resumes_fts) VALUES ('optimize')")
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Database error rebuilding search indexes: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def _rebuild_search_index(shards, func, arguments):
+    return all(shards.fan_out(_rebuild_resume_index)) and _on_catalog(func)
+
+
+_by_score = _merge_sorted(lambda row: (-row["similarity_score"], row["application_id"] & _LOCAL_ID))
+_by_rank = _merge_sorted(lambda row: row["score"])
+
+ROUTES = {
+    "insertion.insert_resume": _by_user("user_id"),
+    "insertion.insert_resume_inline": _by_user("user_id"),
+    "insertion.insert_application": _by_user("student_id"),
+    "insertion.insert_resumes_bulk": _split_records("user_id", 0),
+    "insertion.insert_applications_bulk": _split_records("student_id", 1),
+    "insertion.insert_analysis_logs_bulk": _split_records("resume_id", 0, by_row=True),
+
+    "select_data.get_user_resumes": _by_user("user_id"),
+    "select_data.list_user_resumes": _by_user("user_id"),
+    "select_data.get_user_resumes_page": _by_user("user_id"),
+    "select_data.iter_user_resumes": _by_user("user_id"),
+    "select_data.open_resume_file": _by_row("resume_id"),
+    "select_data.get_resume_file_view": _by_row("resume_id"),
+    "select_data.iter_resume_file": _by_row("resume_id"),
+    "select_data.get_top_applicants": _fan_out(_by_score),
+    "select_data.get_application_counts": _fan_out(_sum_counts),
+
+    "update_data.update_resume_score": _by_row("resume_id"),
+    "update_data.update_application_status": _by_row("application_id"),
+    "update_data.update_resume_scores_bulk": _split_pairs("scores"),
+    "update_data.update_application_statuses_bulk": _split_pairs("statuses"),
+    "update_data.update_application_scores_bulk": _split_pairs("scores"),
+
+    "delete_data.delete_resumes_by_user_id": _by_user("user_id"),
+    "delete_data.delete_applications_by_user_id": _fan_out(_ignore),
+    "delete_data.delete_analysis_logs_by_user_id": _fan_out(_ignore),
+    "delete_data.purge_users": _purge_users,
+
+    "analysis_data.get_analysis_logs": _analysis_logs,
+    "analysis_data.top_missing_skills": _fan_out(_top_missing_skills),
+    "analysis_data.get_analysis_rollups": _fan_out(_merge_rollups),
+    "analysis_data.compress_old_payloads": _fan_out(_sum_fields),
+    "analysis_data.rollup_old_logs": _fan_out(_sum_fields),
+    "analysis_data.reclaim_space": _fan_out(lambda results, arguments: sum(results)),
+
+    "search_data.search_resumes": _fan_out(_by_rank),
+    "search_data.rebuild_search_index": _rebuild_search_index,
+}
+
+
+def sharded(func, route, name=None):
+    """Wrap a function so it follows `route` while sharding is on."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        shards = get_shards()
+        if shards is None or getattr(_local, "routed", False):
+            # Off, or already running on a shard chosen by an outer call.
+            return func(*args, **kwargs)
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        return route(shards, func, arguments.arguments)
+    return wrapper
+
+
+def shard_module(namespace):
+    """Install the ROUTES of a data module on its functions (call at the end of the module)."""
+    module = namespace["__name__"]
+    for key, route in ROUTES.items():
+        owner, name = key.split(".")
+        if owner == module:
+            namespace[name] = sharded(namespace[name], route)
+
+
+__all__ = [
+    'ShardSet',
+    'enable_sharding',
+    'disable_sharding',
+    'get_shards',
+    'ensure_unsharded',
+    'shard_module',
+    'ROUTES',
+    'SHARD_ID_BITS'
+]
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blob_store
+import db_connection
+import insertion
+import query_cache
+import sharding
+from create_tables import create_database_tables
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A new, empty database and blob store under tmp_path for one test."""
+    sharding.disable_sharding()
+    db_connection.configure_pool(db_path=str(tmp_path / "resume_analyzer.db"))
+    blob_store.configure_blob_store(root=str(tmp_path / "resume_blobs"))
+    query_cache.get_query_cache().clear()
+    create_database_tables()
+    yield tmp_path
+    sharding.disable_sharding()
+    query_cache.get_query_cache().clear()
+    db_connection.get_pool().close()
+
+
+@pytest.fixture
+def shards(database):
+    """Two shards next to the test database."""
+    return sharding.enable_sharding(2, directory=str(database / "shards"))
+
+
+def add_user(name, role="student"):
+    """Insert a user with a placeholder hash (skips the KDF); returns the id."""
+    result = insertion.insert_user_hashed(name, f"{name}@example.com", "x", role, name.title())
+    assert result["success"], result
+    return result["user_id"]
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import async_data
+import db_connection
+import select_data
+from conftest import add_user
+
+
+@pytest.fixture
+def async_database(database):
+    db = async_data.AsyncDatabase(read_workers=2)
+    yield db
+    db.close()
+
+
+def test_concurrent_single_row_writes_are_coalesced(async_database):
+    recruiter_id = add_user("rita", role="recruiter")
+
+    async def post_jobs():
+        return await asyncio.gather(*(
+            async_database.write(async_data.insertion.insert_job, recruiter_id, f"Job {i}", "desc", "python")
+            for i in range(20)))
+
+    results = asyncio.run(post_jobs())
+
+    assert all(result["success"] for result in results)
+    assert len({result["job_id"] for result in results}) == 20
+    stats = async_database.stats()
+    assert stats["coalesced_writes"] == 20
+    assert stats["write_batches"] < 20
+    assert len(select_data.get_all_jobs()) == 20
+
+
+def test_failing_call_only_undoes_its_own_savepoint(async_database):
+    recruiter_id = add_user("rita", role="recruiter")
+
+    def boom():
+        conn = db_connection.get_db_connection()
+        conn.execute("INSERT INTO jobs (recruiter_id, title) VALUES (?, 'lost')", (recruiter_id,))
+        raise ValueError("boom")
+
+    async def mixed():
+        return await asyncio.gather(
+            async_database.write(async_data.insertion.insert_job, recruiter_id, "kept", "desc", "python"),
+            async_database.write(boom),
+            return_exceptions=True)
+
+    kept, failed = asyncio.run(mixed())
+
+    assert kept["success"]
+    assert isinstance(failed, ValueError)
+    assert [job["title"] for job in select_data.get_all_jobs()] == ["kept"]
+
+
+def test_async_insert_user_hashes_before_queueing(database):
+    async def register_and_login():
+        user = await async_data.insert_user("dana", "dana@example.com", "s3cret-pass", "student", "Dana")
+        login = await async_data.login_user("dana@example.com", "s3cret-pass")
+        return user, login
+
+    try:
+        user, login = asyncio.run(register_and_login())
+    finally:
+        async_data.close_async_database()
+
+    assert user["success"]
+    assert login["success"]
+
+
+def test_write_after_close_raises(async_database):
+    async_database.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        asyncio.run(async_database.write(add_user, "late"))
+
+
+def test_connect_failure_fails_pending_and_later_writes(database):
+    db_connection.configure_pool(db_path=str(database / "missing" / "resume_analyzer.db"))
+    db = async_data.AsyncDatabase(read_workers=1)
+    try:
+        with pytest.raises(RuntimeError, match="writer stopped"):
+            asyncio.run(asyncio.wait_for(db.write(add_user, "never"), timeout=10))
+        with pytest.raises(RuntimeError, match="writer stopped"):
+            asyncio.run(db.write(add_user, "never"))
+    finally:
+        db.close()
@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+import db_connection
+import features
+import insertion
+import scoring
+from conftest import add_user
+
+TEXTS = [
+    "python developer with django and sql experience",
+    "java engineer, spring and sql",
+    "data scientist: python, pandas, numpy and machine learning",
+]
+
+
+@pytest.fixture
+def corpus(database):
+    student_id = add_user("sam")
+    recruiter_id = add_user("rita", role="recruiter")
+    resume_ids = [insertion.insert_resume(student_id, f"r{i}.pdf", text.encode(), text)["resume_id"]
+                  for i, text in enumerate(TEXTS)]
+    job_id = insertion.insert_job(recruiter_id, "Python developer", "build apis", "python, sql")["job_id"]
+    return resume_ids, job_id
+
+
+def _cached_versions():
+    conn = db_connection.get_db_connection(row_factory=None)
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT feature_version FROM feature_cache WHERE entity = 'resume' ORDER BY entity_id")]
+    finally:
+        conn.close()
+
+
+def _frequencies():
+    conn = db_connection.get_db_connection(row_factory=None)
+    try:
+        return features.load_document_frequencies(conn)
+    finally:
+        conn.close()
+
+
+def test_feature_version_bump_recomputes_cache(corpus, monkeypatch):
+    features.refresh_feature_cache()
+    assert _cached_versions() == [features.FEATURE_VERSION] * len(TEXTS)
+
+    monkeypatch.setattr(features, "FEATURE_VERSION", features.FEATURE_VERSION + 1)
+    _, rows = features.load_feature_matrix("resume")
+
+    assert rows.shape[0] == len(TEXTS)
+    assert _cached_versions() == [features.FEATURE_VERSION] * len(TEXTS)
+
+
+def test_document_frequencies_are_cached_until_a_resume_is_added(corpus):
+    n_docs, df = _frequencies()
+    assert n_docs == len(TEXTS)
+    python = features.feature_index("python")
+    assert df[python] == 2
+
+    conn = db_connection.get_db_connection(row_factory=None)
+    try:
+        generation, stats_generation = conn.execute(
+            "SELECT generation, stats_generation FROM feature_stats WHERE entity = 'resume'").fetchone()
+    finally:
+        conn.close()
+    assert generation == stats_generation
+    assert _frequencies()[1][python] == 2  # served from feature_stats
+
+    insertion.insert_resume(add_user("pat"), "p.pdf", b"python", "python and go")
+    n_docs, df = _frequencies()
+    assert n_docs == len(TEXTS) + 1
+    assert df[python] == 3
+
+
+def test_single_resume_score_matches_full_run(corpus):
+    resume_ids, job_id = corpus
+    full = scoring.score_resumes_against_jobs(write=False)["top_matches"][job_id]
+    single = scoring.score_resumes_against_jobs(resume_ids=[resume_ids[0]], write=False)["top_matches"][job_id]
+
+    assert single == [match for match in full if match[0] == resume_ids[0]]
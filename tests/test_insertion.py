@@ -0,0 +1,50 @@
+import io
+
+import insertion
+from conftest import add_user
+
+
+class _Unreadable(io.RawIOBase):
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        raise OSError("disk gone")
+
+
+def test_bulk_insert_reports_bad_records_and_keeps_the_rest(database):
+    user_id = add_user("alice")
+    records = [
+        (user_id, "a.pdf", b"first", "python"),
+        (user_id, "b.pdf", _Unreadable(), "java"),   # prepare() fails
+        {"user_id": user_id, "filename": "c.pdf"},    # file_data missing
+        (user_id, "d.pdf", b"fourth", "sql"),
+    ]
+    result = insertion.insert_resumes_bulk(records, batch_size=2)
+
+    assert result["inserted"] == 2
+    assert result["failed"] == 2
+    assert not result["success"]
+    ids = result["resume_ids"]
+    assert ids[0] is not None and ids[3] is not None
+    assert ids[1] is None and ids[2] is None
+    assert [error["index"] for error in result["errors"]] == [1, 2]
+    assert result["errors"][0]["message"].startswith("OSError")
+
+
+def test_bulk_insert_chunk_of_only_bad_records(database):
+    result = insertion.insert_jobs_bulk([{"title": "no recruiter"}], batch_size=1)
+    assert result["inserted"] == 0
+    assert result["job_ids"] == [None]
+    assert result["errors"][0]["index"] == 0
+
+
+def test_bulk_insert_integrity_errors_are_per_row(database):
+    add_user("bob")
+    result = insertion.insert_users_bulk([
+        ("carol", "carol@example.com", "pw-carol", "student", "Carol"),
+        ("bob2", "bob@example.com", "pw-bob", "student", "Bob"),  # duplicate email
+    ])
+    assert result["inserted"] == 1
+    assert result["user_ids"][0] is not None and result["user_ids"][1] is None
+    assert result["errors"][0]["index"] == 1
@@ -0,0 +1,75 @@
+import threading
+
+import insertion
+import select_data
+import sharding
+import update_data
+from conftest import add_user
+
+
+def test_shard_ids_are_above_catalog_ids(shards):
+    user_id = add_user("alice")
+    resume_id = insertion.insert_resume(user_id, "a.pdf", b"data", "text")["resume_id"]
+
+    assert resume_id >> sharding.SHARD_ID_BITS >= 1
+    assert shards.for_row(resume_id) == shards.for_user(user_id)
+    assert shards.locate(42) is None  # a pre-sharding catalog id
+    assert [r["id"] for r in select_data.get_user_resumes(user_id)] == [resume_id]
+
+
+def test_lazy_bulk_insert_keeps_input_order(shards):
+    user_ids = [add_user(f"user{i}") for i in range(6)]
+    assert len({shards.for_user(u) for u in user_ids}) == 2
+    owners = [user_ids[i % len(user_ids)] for i in range(25)]
+
+    def records():
+        for i, user_id in enumerate(owners):
+            yield (user_id, f"r{i}.pdf", f"file {i}".encode(), f"text {i}")
+
+    result = insertion.insert_resumes_bulk(records(), batch_size=4)
+
+    assert result["inserted"] == len(owners)
+    ids = result["resume_ids"]
+    assert len(ids) == len(owners)
+    for user_id, resume_id in zip(owners, ids):
+        assert shards.for_row(resume_id) == shards.for_user(user_id)
+    for user_id in user_ids:
+        stored = sorted(r["id"] for r in select_data.get_user_resumes(user_id))
+        assert stored == sorted(r for u, r in zip(owners, ids) if u == user_id)
+
+
+def test_bulk_update_routes_per_shard_and_rejects_bad_ids(shards):
+    resume_ids = [insertion.insert_resume(add_user(f"user{i}"), "r.pdf", b"x", "t")["resume_id"]
+                  for i in range(4)]
+
+    updated = update_data.update_resume_scores_bulk({resume_id: 0.5 for resume_id in resume_ids})
+    assert updated == sorted(resume_ids)
+
+    assert update_data.update_resume_scores_bulk({"not-an-id": 0.1}) is None
+    assert update_data.update_resume_scores_bulk([(None, 0.1)]) is None
+
+
+def test_bulk_update_rejects_bad_ids_unsharded(database):
+    assert update_data.update_resume_scores_bulk({"not-an-id": 0.1}) is None
+
+
+def test_env_configured_sharding_is_set_up_once(database, monkeypatch):
+    monkeypatch.setattr(sharding, "SHARDS", 2)
+    monkeypatch.setattr(sharding, "SHARD_DIR", str(database / "shards"))
+    monkeypatch.setattr(sharding, "_auto_checked", False)
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def first_use():
+        barrier.wait()
+        seen.append(sharding.get_shards())
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seen) == 8
+    assert None not in seen
+    assert len({id(shard_set) for shard_set in seen}) == 1
@@ -1,11 +1,15 @@
 import sqlite3
 import datetime
 
+import db_connection
+from query_cache import invalidate
+from instrumentation import instrument_module
+from sharding import shard_module
+
 def get_db_connection():
-    """Create and return a database connection."""
+    """Check out a pooled database connection."""
     # We do not set row_factory here as these functions only execute updates.
-    conn = sqlite3.connect('resume_analyzer.db')
-    return conn
+    return db_connection.get_db_connection(row_factory=None)
 
 # ==================== SIMPLE EXPLICIT UPDATE FUNCTIONS ====================
 # These functions are explicit and focus on a single, common update for the table.
@@ -34,6 +38,7 @@ def update_user_role(user_id: int, new_role: str) -> bool:
         # Values are explicitly passed in the order they appear in the SQL query
         cursor.execute(sql, (new_role, user_id))
         conn.commit()
+        invalidate(f"user:{user_id}", "users:untagged")
         if cursor.rowcount == 0:
             print(f"Info: User ID {user_id} not found.")
             return False
@@ -67,6 +72,7 @@ def update_resume_score(resume_id: int, new_final_score: float) -> bool:
         # Values are explicitly passed in order (new_final_score, resume_id)
         cursor.execute(sql, (new_final_score, resume_id))
         conn.commit()
+        invalidate("table:resumes")
         if cursor.rowcount == 0:
             print(f"Info: Resume ID {resume_id} not found.")
             return False
@@ -99,6 +105,7 @@ def update_job_status(job_id: int, new_status: str) -> bool:
     try:
         cursor.execute(sql, (new_status, job_id))
         conn.commit()
+        invalidate("table:jobs")  # e.g. drops the cached open-jobs list
         if cursor.rowcount == 0:
             print(f"Info: Job ID {job_id} not found.")
             return False
@@ -206,6 +213,133 @@ def update_reference_score(reference_id: int, new_score: float) -> bool:
     finally:
         conn.close()
 
+# ==================== SET-BASED BULK UPDATE FUNCTIONS ====================
+# These apply many updates in one statement and one transaction. Per-row
+# values are staged in a TEMP table and applied with a single
+# UPDATE ... FROM ... RETURNING, so the database is visited once no matter
+# how many rows change. Each returns the sorted list of ids that were
+# actually updated, or None on a database error or an id that is not an
+# integer.
+
+def _iter_pairs(values):
+    """Yield (id, value) pairs from a dict or an iterable of pairs."""
+    items = values.items() if isinstance(values, dict) else values
+    for row_id, value in items:
+        # numpy scalars (e.g. from a freshly computed score array) -> Python
+        yield int(row_id), value.item() if hasattr(value, "item") else value
+
+
+def _bulk_set(table: str, column: str, values) -> list | None:
+    """Set table.column per id from `values` in one statement."""
+    conn = get_db_connection()
+    try:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_values (id INTEGER PRIMARY KEY, value)")
+        conn.execute("DELETE FROM bulk_values")
+        conn.executemany("INSERT OR REPLACE INTO bulk_values (id, value) VALUES (?, ?)", _iter_pairs(values))
+        rows = conn.execute(f"""
+            UPDATE {table} SET {column} = bulk_values.value
+            FROM bulk_values
+            WHERE {table}.id = bulk_values.id
+            RETURNING {table}.id
+        """).fetchall()
+        conn.execute("DELETE FROM bulk_values")
+        conn.commit()
+        invalidate(f"table:{table}")
+        updated = sorted(row[0] for row in rows)
+        print(f"Success: Updated {column} on {len(updated)} {table} row(s).")
+        return updated
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Database error bulk updating {table}.{column}: {e}")
+        return None
+    except (TypeError, ValueError) as e:  # raised by _iter_pairs for a bad id or pair
+        conn.rollback()
+        print(f"Invalid id in bulk update of {table}.{column}: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def _set_where(table: str, column: str, value, where: str, params: tuple) -> list | None:
+    """Set table.column = value on every row matching a predicate."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(
+            f"UPDATE {table} SET {column} = ? WHERE {where} RETURNING id", (value,) + params).fetchall()
+        conn.commit()
+        invalidate(f"table:{table}")
+        updated = sorted(row[0] for row in rows)
+        print(f"Success: Set {table}.{column} to {value!r} on {len(updated)} row(s).")
+        return updated
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Database error updating {table}.{column}: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def update_resume_scores_bulk(scores) -> list | None:
+    """
+    Updates 'final_score' for many resumes at once.
+
+    Args:
+        scores: {resume_id: new_final_score} or an iterable of (resume_id, score) pairs.
+
+    Returns:
+        list | None: IDs of the resumes that were updated, or None on error.
+    """
+    return _bulk_set('resumes', 'final_score', scores)
+
+
+def update_application_statuses_bulk(statuses) -> list | None:
+    """Updates 'status' for many applications: {application_id: new_status} or pairs."""
+    return _bulk_set('applications', 'status', statuses)
+
+
+def update_application_scores_bulk(scores) -> list | None:
+    """Updates 'similarity_score' for many applications: {application_id: score} or pairs."""
+    return _bulk_set('applications', 'similarity_score', scores)
+
+
+def update_template_scores_bulk(scores) -> list | None:
+    """Updates 'ats_score' for many templates: {template_id: score} or pairs."""
+    return _bulk_set('templates', 'ats_score', scores)
+
+
+def update_reference_scores_bulk(scores) -> list | None:
+    """Updates 'score' for many reference documents: {reference_id: score} or pairs."""
+    return _bulk_set('reference', 'score', scores)
+
+
+def update_job_statuses_bulk(job_ids, new_status: str) -> list | None:
+    """Sets the same 'status' on every job in job_ids."""
+    return _bulk_set('jobs', 'status', ((job_id, new_status) for job_id in job_ids))
+
+
+def close_jobs_by_recruiter(recruiter_id: int, new_status: str = 'closed') -> list | None:
+    """Closes every open job posted by a recruiter. Returns the affected job IDs."""
+    return _set_where('jobs', 'status', new_status, "recruiter_id = ? AND status = 'open'", (recruiter_id,))
+
+
+def close_jobs_posted_before(cutoff, new_status: str = 'closed') -> list | None:
+    """
+    Closes every open job posted before `cutoff`.
+
+    Args:
+        cutoff (datetime | str): A datetime (naive means UTC), or a 'YYYY-MM-DD HH:MM:SS' string
+            in the same UTC format SQLite uses for posted_on.
+
+    Returns:
+        list | None: IDs of the jobs that were closed, or None on error.
+    """
+    if isinstance(cutoff, datetime.datetime):
+        if cutoff.tzinfo is not None:
+            cutoff = cutoff.astimezone(datetime.timezone.utc)
+        cutoff = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+    return _set_where('jobs', 'status', new_status, "status = 'open' AND posted_on < ?", (cutoff,))
+
+
 # The exported public interface for this module
 __all__ = [
     'update_user_role',
@@ -213,5 +347,17 @@ __all__ = [
     'update_job_status',
     'update_application_status',
     'update_template_score',
-    'update_reference_score'
+    'update_reference_score',
+    'update_resume_scores_bulk',
+    'update_application_statuses_bulk',
+    'update_application_scores_bulk',
+    'update_template_scores_bulk',
+    'update_reference_scores_bulk',
+    'update_job_statuses_bulk',
+    'close_jobs_by_recruiter',
+    'close_jobs_posted_before'
 ]
+
+
+shard_module(globals())
+instrument_module(globals())
@@ -0,0 +1,219 @@
+# write_behind_operations.py
+#
+# Optional write-behind queue for high-frequency status and score updates.
+#
+#     from write_behind import get_write_behind_queue
+#     wb = get_write_behind_queue()
+#     for resume_id, score in rescored:
+#         wb.update_resume_score(resume_id, score)
+#     wb.flush()   # or let the size/time thresholds do it
+#
+# Updates are buffered in memory. Repeated writes to the same row and
+# column coalesce, so only the last value is written. The buffer is flushed
+# as one transaction (one executemany per column) when it holds
+# `flush_size` rows, when `flush_interval` seconds have passed since the
+# oldest buffered update, or on flush()/close().
+#
+# Crash semantics:
+#   * An update is durable only once a flush containing it has committed.
+#     Buffered updates are lost if the process dies before that (kill -9,
+#     power loss). A normal interpreter exit flushes via atexit.
+#   * Each flush is atomic: either every buffered update in it is applied
+#     or none is. On failure the updates go back into the buffer (unless a
+#     newer value for the same row arrived meanwhile) and the error is
+#     returned; the next flush retries them.
+#   * Readers see the old value until the flush commits. Use the direct
+#     functions in update_data.py when a caller must read its own write.
+#
+# Flushes write to the catalog only, so with sharding on (sharding.py)
+# updates of resumes and applications raise; use update_data.py instead.
+
+import atexit
+import sqlite3
+import threading
+import time
+
+from db_connection import get_db_connection
+from query_cache import invalidate
+from sharding import SHARDED_TABLES, ensure_unsharded
+
+DEFAULT_FLUSH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+
+# (table, column) pairs the queue may write; the SQL is built from these.
+UPDATABLE_COLUMNS = {
+    ('applications', 'status'),
+    ('resumes', 'final_score'),
+    ('resumes', 'ats_score'),
+    ('resumes', 'similarity_score'),
+    ('resumes', 'skill_match_pct'),
+    ('applications', 'similarity_score'),
+    ('jobs', 'status'),
+    ('templates', 'ats_score'),
+    ('reference', 'score'),
+}
+
+
+class WriteBehindQueue:
+    """Coalescing buffer of single-column updates, flushed in group commits."""
+
+    def __init__(self, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer = {}  # (table, column, row_id) -> value; last write wins
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._stats = {"enqueued": 0, "coalesced": 0, "flushes": 0, "rows_written": 0, "failed_flushes": 0}
+        self._wakeup = threading.Event()
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._timer_loop, name="write-behind", daemon=True)
+            self._timer.start()
+
+    # -------------------- enqueueing --------------------
+
+    def enqueue(self, table, column, row_id, value):
+        """Buffer `UPDATE table SET column = value WHERE id = row_id`."""
+        if (table, column) not in UPDATABLE_COLUMNS:
+            raise ValueError(f"{table}.{column} is not updatable through the write-behind queue")
+        if table in SHARDED_TABLES:
+            # Flushes write to the catalog; sharded rows live elsewhere.
+            ensure_unsharded(f"Write-behind updates of {table}")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            key = (table, column, row_id)
+            if key in self._buffer:
+                self._stats["coalesced"] += 1
+            self._buffer[key] = value
+            self._stats["enqueued"] += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._buffer) >= self.flush_size
+        if full:
+            self.flush()
+
+    def update_application_status(self, application_id: int, new_status: str):
+        self.enqueue('applications', 'status', application_id, new_status)
+
+    def update_resume_score(self, resume_id: int, new_final_score: float):
+        self.enqueue('resumes', 'final_score', resume_id, new_final_score)
+
+    def update_job_status(self, job_id: int, new_status: str):
+        self.enqueue('jobs', 'status', job_id, new_status)
+
+    def update_template_score(self, template_id: int, new_ats_score: float):
+        self.enqueue('templates', 'ats_score', template_id, new_ats_score)
+
+    def update_reference_score(self, reference_id: int, new_score: float):
+        self.enqueue('reference', 'score', reference_id, new_score)
+
+    # -------------------- flushing --------------------
+
+    def flush(self) -> dict:
+        """
+        Write every buffered update in one transaction.
+
+        Returns:
+            dict: {"success", "flushed": buffered updates written,
+            "rows_updated": rows that matched an id} or an error message.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._buffer = self._buffer, {}
+                self._oldest = None
+            if not pending:
+                return {"success": True, "flushed": 0, "rows_updated": 0}
+
+            grouped = {}
+            for (table, column, row_id), value in pending.items():
+                grouped.setdefault((table, column), []).append((value, row_id))
+
+            conn = get_db_connection(row_factory=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                rows_updated = 0
+                for (table, column), params in grouped.items():
+                    cursor = conn.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", params)
+                    rows_updated += cursor.rowcount
+                conn.commit()
+                invalidate(*{f"table:{table}" for table, _ in grouped})
+            except sqlite3.Error as e:
+                conn.rollback()
+                self._requeue(pending)
+                self._stats["failed_flushes"] += 1
+                return {"success": False, "message": f"Database error flushing write-behind queue: {e}"}
+            finally:
+                conn.close()
+
+            self._stats["flushes"] += 1
+            self._stats["rows_written"] += len(pending)
+            return {"success": True, "flushed": len(pending), "rows_updated": rows_updated}
+
+    def _requeue(self, pending):
+        with self._lock:
+            for key, value in pending.items():
+                self._buffer.setdefault(key, value)  # keep any newer value
+            if self._buffer and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _timer_loop(self):
+        while not self._wakeup.wait(self.flush_interval / 4):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                self.flush()
+
+    def pending(self) -> int:
+        """Number of buffered (row, column) updates not yet flushed."""
+        with self._lock:
+            return len(self._buffer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, pending=len(self._buffer))
+
+    def close(self) -> dict:
+        """Flush what is buffered and stop accepting updates."""
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
+        if self._timer is not None:
+            self._timer.join()
+        return self.flush()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    """Return the shared write-behind queue, creating it on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteBehindQueue()
+    return _queue
+
+
+@atexit.register
+def close_write_behind_queue():
+    """Flush and close the shared queue (also runs at interpreter exit)."""
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            result = _queue.close()
+            _queue = None
+            return result
+    return None
+
+
+__all__ = [
+    'WriteBehindQueue',
+    'get_write_behind_queue',
+    'close_write_behind_queue',
+    'UPDATABLE_COLUMNS'
+]